@@ -0,0 +1,107 @@
+import logging
+
+from celery import shared_task
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import PermissionEvent
+
+logger = logging.getLogger(__name__)
+
+# seconds to wait for further changes before draining, edits in a row are drained together
+PERMISSION_EVENT_DELAY = 10
+PERMISSION_EVENT_BATCH_SIZE = 100
+PERMISSION_EVENT_MAX_ATTEMPTS = 5
+PERMISSION_EVENT_LOCK_TIMEOUT = 60 * 60
+
+
+def publish_permission_event(event_type, **payload):
+    """
+    Record a permission change in the tenant outbox, written in the
+    caller's transaction and drained by the worker once committed.
+    """
+    event = PermissionEvent.objects.create(event_type=event_type, payload=payload)
+    transaction.on_commit(lambda: drain_permission_events.apply_async(countdown=PERMISSION_EVENT_DELAY))
+    return event
+
+
+def pending_permission_events():
+    return PermissionEvent.objects.filter(processed_at__isnull=True, attempts__lt=PERMISSION_EVENT_MAX_ATTEMPTS)
+
+
+def process_permission_event(event, consumers):
+    """
+    Run the consumers of event which haven't handled it yet, in order.
+    Each consumer commits together with its handled_by mark, a failing
+    one stops the later consumers and the event is retried on a later drain.
+    Returns True once every consumer handled the event.
+    """
+    # identical events waiting behind this one, their changes are committed
+    # so they are covered when every consumer handles this one
+    duplicate_ids = list(
+        pending_permission_events()
+        .filter(event_type=event.event_type, payload=event.payload, id__gt=event.id, handled_by=[])
+        .values_list('id', flat=True)
+    )
+    names = []
+    for name, event_types, consumer in consumers:
+        names.append(name)
+        if name in event.handled_by:
+            continue
+        try:
+            with transaction.atomic():
+                if event.event_type in event_types:
+                    consumer(event)
+                event.handled_by.append(name)
+                event.save(update_fields=['handled_by', 'modified_at'])
+        except Exception as e:
+            if name in event.handled_by:
+                event.handled_by.remove(name)
+            logger.exception('permission event %s failed in %s', event.id, name)
+            event.attempts += 1
+            event.last_error = '{}: {}'.format(name, e)
+            event.save(update_fields=['attempts', 'last_error', 'modified_at'])
+            return False
+    processed_at = timezone.now()
+    event.processed_at = processed_at
+    event.save(update_fields=['processed_at', 'modified_at'])
+    if duplicate_ids:
+        PermissionEvent.objects.filter(id__in=duplicate_ids).update(
+            handled_by=names, processed_at=processed_at, modified_at=processed_at
+        )
+    return True
+
+
+def process_permission_events():
+    """
+    Drain the pending events of the current tenant in id order, every
+    event is tried once per drain.
+    """
+    from projects.permission_events import PERMISSION_EVENT_CONSUMERS
+
+    processed = 0
+    last_id = 0
+    while True:
+        events = list(pending_permission_events().filter(id__gt=last_id).order_by('id')[:PERMISSION_EVENT_BATCH_SIZE])
+        if not events:
+            return processed
+        for event in events:
+            last_id = event.id
+            # skip events covered by an identical one earlier in this drain
+            event.refresh_from_db(fields=['processed_at', 'handled_by'])
+            if event.processed_at is None and process_permission_event(event, PERMISSION_EVENT_CONSUMERS):
+                processed += 1
+
+
+@shared_task
+def drain_permission_events():
+    lock_key = 'permission_events_drain:{}'.format(connection.schema_name)
+    if not cache.add(lock_key, True, PERMISSION_EVENT_LOCK_TIMEOUT):
+        # another worker is draining the tenant, come back once it's done
+        drain_permission_events.apply_async(countdown=PERMISSION_EVENT_DELAY)
+        return
+    try:
+        return process_permission_events()
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.17 on 2021-12-23 10:12
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0039_auto_20211104_0414'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PermissionEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Created At')),
+                ('modified_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modified At')),
+                ('event_type', models.CharField(choices=[('group_permissions', 'Group Permissions Changed'), ('user_group', 'User Group Changed'), ('workgroup_member_added', 'Workgroup Member Added'), ('workgroup_member_removed', 'Workgroup Member Removed')], db_index=True, max_length=40, verbose_name='Event Type')),
+                ('payload', django.contrib.postgres.fields.jsonb.JSONField(default=dict, verbose_name='Payload')),
+                ('handled_by', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=40), blank=True, default=list, size=None, verbose_name='Handled By')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Last Error')),
+                ('processed_at', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Processed At')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
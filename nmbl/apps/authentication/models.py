@@ -3,6 +3,7 @@ import uuid
 
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.fields import ArrayField, JSONField
 from django.db import models, connection
 from django.db.models import F
 from django.db.models.signals import post_save
@@ -40,6 +41,13 @@ PERMISSION_CATEGORY_CHOICES = (
     ('projecttemplate', _("Project template"))
 )
 
+PERMISSION_EVENT_TYPE_CHOICES = (
+    ('group_permissions', _("Group Permissions Changed")),
+    ('user_group', _("User Group Changed")),
+    ('workgroup_member_added', _("Workgroup Member Added")),
+    ('workgroup_member_removed', _("Workgroup Member Removed"))
+)
+
 CROP_SETTINGS = {'size': (170, 170), 'crop': 'smart'}
 THUMB_CROP_SETTINGS = {'size': (50, 50), 'crop': 'smart'}
 
@@ -261,6 +269,29 @@ class GroupAndPermission(BaseModel):
         unique_together = ["group", "permission", "company"]
 
 
+class PermissionEvent(BaseModel):
+    """
+    Outbox of permission, group and workgroup membership changes of the
+    tenant, drained by the worker through the permission event consumers.
+    """
+    event_type = models.CharField(max_length=40, db_index=True,
+                                  choices=PERMISSION_EVENT_TYPE_CHOICES,
+                                  verbose_name=_('Event Type'))
+    payload = JSONField(default=dict, verbose_name=_('Payload'))
+    # consumers which already processed the event
+    handled_by = ArrayField(models.CharField(max_length=40), default=list,
+                            blank=True, verbose_name=_('Handled By'))
+    attempts = models.PositiveIntegerField(default=0,
+                                           verbose_name=_('Attempts'))
+    last_error = models.TextField(blank=True, default='',
+                                  verbose_name=_('Last Error'))
+    processed_at = models.DateTimeField(null=True, blank=True, db_index=True,
+                                        verbose_name=_('Processed At'))
+
+    def __str__(self):
+        return '{} {}'.format(self.event_type, self.payload)
+
+
 from notifications.models import NotificationType
 
 
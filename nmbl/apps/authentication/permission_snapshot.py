@@ -0,0 +1,109 @@
+import time
+
+from django.core.cache import cache
+
+PERMISSION_SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+
+class PermissionSnapshot(object):
+    """
+    Resolved set of permission slugs a group has inside a company.
+    """
+
+    def __init__(self, group_id=None, company_id=None, slugs=()):
+        self.group_id = group_id
+        self.company_id = company_id
+        self.slugs = frozenset(slugs)
+        self._compiled = {}
+
+    def has(self, slug):
+        return slug in self.slugs
+
+    def has_any(self, *slugs):
+        return any(slug in self.slugs for slug in slugs)
+
+    def __contains__(self, slug):
+        return slug in self.slugs
+
+    def __iter__(self):
+        return iter(self.slugs)
+
+    def compiled(self, key, build):
+        """
+        Return build(snapshot), built once per snapshot and key.
+        """
+        if key not in self._compiled:
+            self._compiled[key] = build(self)
+        return self._compiled[key]
+
+
+def _pk(obj):
+    return getattr(obj, 'pk', obj)
+
+
+def _version_key(group_id):
+    return 'permission_snapshot_version:{}'.format(group_id)
+
+
+def _snapshot_version(group_id):
+    key = _version_key(group_id)
+    version = cache.get(key)
+    if version is None:
+        # start from the clock so an evicted version never reuses an old key
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def load_permission_snapshot(group, company):
+    """
+    Return the permission snapshot of group within company,
+    from redis when available otherwise from GroupAndPermission.
+    """
+    from authentication.models import GroupAndPermission
+
+    group_id = _pk(group)
+    company_id = _pk(company)
+    if not group_id or not company_id:
+        return PermissionSnapshot(group_id, company_id)
+    key = 'permission_snapshot:{}:{}:{}'.format(group_id, company_id, _snapshot_version(group_id))
+    slugs = cache.get(key)
+    if slugs is None:
+        slugs = list(
+            GroupAndPermission.objects.filter(
+                group_id=group_id, company_id=company_id, has_permission=True, permission__slug__isnull=False
+            ).values_list('permission__slug', flat=True)
+        )
+        cache.set(key, slugs, PERMISSION_SNAPSHOT_TIMEOUT)
+    return PermissionSnapshot(group_id, company_id, slugs)
+
+
+def permission_snapshot(group, company):
+    """
+    Same as load_permission_snapshot but memoised on the group instance,
+    request.user.group is loaded once per request so is the snapshot.
+    """
+    if group is None or not hasattr(group, 'pk'):
+        return load_permission_snapshot(group, company)
+    snapshots = group.__dict__.setdefault('_permission_snapshots', {})
+    company_id = _pk(company)
+    if company_id not in snapshots:
+        snapshots[company_id] = load_permission_snapshot(group, company)
+    return snapshots[company_id]
+
+
+def get_permission_snapshot(user):
+    return permission_snapshot(getattr(user, 'group', None), getattr(user, 'company', None))
+
+
+def invalidate_permission_snapshot(group):
+    group_id = _pk(group)
+    if not group_id:
+        return
+    key = _version_key(group_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+    if hasattr(group, 'pk'):
+        group.__dict__.pop('_permission_snapshots', None)
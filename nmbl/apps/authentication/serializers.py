@@ -476,8 +476,8 @@ class PermissionManagerUpdateSerializer(serializers.ModelSerializer):
                 group=instance, company=instance.organization,
                 has_permission=True, permission__slug='workflow_workflow-view'
             ).delete()
-        from projects.tasks import permission_group_update
-        permission_group_update(instance)
+        from projects.tasks import schedule_permission_group_update
+        schedule_permission_group_update(instance)
         return instance
 
 
@@ -3,12 +3,17 @@ from __future__ import absolute_import, unicode_literals
 
 from authentication.adapters import get_invitations_adapter
 from celery import shared_task
+from customers.models import Client
 from django.apps import apps
 from django.db.models import Q
+from django_tenants.utils import schema_context
 from projects.models import (TaskRank, WorkflowRank, ProjectRank, Task,
                              Workflow, Project)
+from projects.ranking import bulk_create_rank_sets
 
-from .models import Group, GroupAndPermission, Organization
+from .events import drain_permission_events
+from .models import Group, Organization, User
+from .permission_snapshot import permission_snapshot
 
 
 @shared_task
@@ -49,14 +54,11 @@ def create_customize_groups():
             # create 42 permission objects in DefaultPermission
 
 
-def user_rank(user, company):
+def user_rank(user, company, progress=None):
     group = user.group
+    rank_sets = []
     # get User related task and create rank
-    if GroupAndPermission.objects.filter(
-            group=user.group, company=user.company,
-            permission__permission_category='task',
-            has_permission=True,
-            permission__slug='task_task-view-all').exists():
+    if permission_snapshot(user.group, user.company).has('task_task-view-all'):
         q_obj = Q()
         q_obj.add(Q(is_private=True, organization=company) &
                   Q(Q(assigned_to=user) |
@@ -64,71 +66,64 @@ def user_rank(user, company):
                     Q(assigned_to_group__group_members=user)), Q.OR)
         q_obj.add(Q(is_private=False, organization=company), Q.OR)
         task_queryset = Task.objects.filter(q_obj).distinct()
-        if not GroupAndPermission.objects.filter(
-                group=group, company=company,
-                permission__permission_category='task',
-                permission__slug='task_view-archived',
-                has_permission=True).exists():
+        if not permission_snapshot(group, company).has('task_view-archived'):
             task_queryset = task_queryset.exclude(status__in=[3, 4])
-        for completed_task in task_queryset.filter(status__in=[3, 4]):
-            TaskRank.objects.create(user=user, task=completed_task, rank=0)
-        for task in task_queryset.exclude(status__in=[3, 4]):
-            user_task_last_rank = TaskRank.objects.filter(
-                user=user, is_active=True).order_by('-rank').first()
-            if not user_task_last_rank:
-                TaskRank.objects.create(user=user, task=task, rank=1)
-            else:
-                TaskRank.objects.create(user=user, task=task,
-                                        rank=int(user_task_last_rank.rank) + 1)
+        tasks = list(task_queryset.values_list('id', 'status'))
+        rank_sets.append((
+            TaskRank, [(user.id, task_id) for task_id, status in tasks],
+            [task_id for task_id, status in tasks if status in [3, 4]]))
     # get user related project and create rank
-    if GroupAndPermission.objects.filter(
-            group=user.group, company=user.company,
-            permission__permission_category='project',
-            has_permission=True,
-            permission__slug='project_project-view-all').exists():
+    if permission_snapshot(user.group, user.company).has('project_project-view-all'):
         project_queryset = Project.objects.filter(
             organization=company)
-        if not GroupAndPermission.objects.filter(
-                group=group, company=company,
-                permission__permission_category='project',
-                permission__slug='project_view-archived',
-                has_permission=True).exists():
+        if not permission_snapshot(group, company).has('project_view-archived'):
             project_queryset = project_queryset.exclude(status__in=[2, 3])
-        for project in project_queryset:
-            user_project_last_rank = ProjectRank.objects.filter(
-                user=user, is_active=True
-            ).order_by('-rank').first()
-            if not user_project_last_rank:
-                ProjectRank.objects.create(user=user,
-                                           project=project, rank=1)
-            else:
-                ProjectRank.objects.create(
-                    user=user, project=project,
-                    rank=int(user_project_last_rank.rank) + 1)
+        rank_sets.append((
+            ProjectRank, [(user.id, project_id) for project_id in
+                          project_queryset.values_list('id', flat=True)], []))
     # get user related workflow and create rank
-    if GroupAndPermission.objects.filter(
-            group=user.group, company=user.company,
-            permission__permission_category='workflow',
-            has_permission=True,
-            permission__slug='workflow_workflow-view-all').exists():
+    if permission_snapshot(user.group, user.company).has('workflow_workflow-view-all'):
         workflow_queryset = Workflow.objects.filter(
             organization=company)
-        if not GroupAndPermission.objects.filter(
-                group=group, company=company,
-                permission__permission_category='workflow',
-                permission__slug='workflow_view-archived',
-                has_permission=True).exists():
+        if not permission_snapshot(group, company).has('workflow_view-archived'):
             workflow_queryset = workflow_queryset.exclude(status__in=[2, 3])
-        for workflow in workflow_queryset:
-            user_workflow_last_rank = WorkflowRank.objects.filter(
-                user=user, is_active=True).order_by('-rank').first()
-            if not user_workflow_last_rank:
-                WorkflowRank.objects.create(
-                    user=user, workflow=workflow, rank=1)
-            else:
-                WorkflowRank.objects.create(
-                    user=user, workflow=workflow,
-                    rank=int(user_workflow_last_rank.rank) + 1)
+        rank_sets.append((
+            WorkflowRank, [(user.id, workflow_id) for workflow_id in
+                           workflow_queryset.values_list('id', flat=True)], []))
+    return bulk_create_rank_sets(rank_sets, progress=progress)
+
+
+@shared_task(bind=True)
+def build_user_ranks(self, user_id):
+    """
+    Create the task, project and workflow ranks of a new user,
+    progress is reported as PROGRESS state with done/total rows.
+    """
+    user = User.objects.select_related('group', 'company').filter(
+        id=user_id).first()
+    if not user or not user.company:
+        return 0
+
+    def progress(done, total):
+        self.update_state(state='PROGRESS',
+                          meta={'done': done, 'total': total})
+
+    user_rank(user, user.company, progress=progress)
+    return user.id
+
+
+@shared_task
+def drain_all_permission_events():
+    """
+    Drain the permission events of every tenant, picks up the events
+    left pending by a failed consumer or a stopped worker.
+    """
+    with schema_context('public'):
+        schema_names = list(
+            Client.objects.values_list('schema_name', flat=True))
+    for schema_name in schema_names:
+        with schema_context(schema_name):
+            drain_permission_events.delay()
 
 
 def user_rank_update(user):
@@ -141,19 +136,9 @@ def user_rank_update(user):
     for model in models:
         view_all_slug = model + '_' + model + '-view-all'
         view_mine_slug = model + '_' + model + '-view'
-        if GroupAndPermission.objects.filter(
-                group=group, company=company,
-                permission__permission_category=model,
-                permission__slug=view_all_slug,
-                has_permission=True
-        ).exists():
+        if permission_snapshot(group, company).has(view_all_slug):
             pass
-        elif GroupAndPermission.objects.filter(
-                group=group, company=company,
-                permission__permission_category=model,
-                permission__slug=view_mine_slug,
-                has_permission=True
-        ).exists():
+        elif permission_snapshot(group, company).has(view_mine_slug):
             pass
         else:
             rank_model_str = model_rank_dict.get(model)
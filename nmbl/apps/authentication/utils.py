@@ -32,24 +32,15 @@ def check_group_org_name_exists(group_name, org_name):
 
 
 def has_user_permission(request, permission):
-    from authentication.models import GroupAndPermission
+    from authentication.permission_snapshot import get_permission_snapshot
     try:
-        user_company = request.user.company
-        user_group = request.user.group
-
-        obj = GroupAndPermission.objects.filter(group=user_group,
-                                                company=user_company)
-        has_permission = False
-        for per in obj:
-            if per.permission.slug == permission or \
-                    (per.permission.slug.split("_")[1]).lower() == "all" \
-                    and per.permission.slug.split("_")[0] == \
-                    permission.split("_")[0]:
-                has_permission = True
-                break
-            else:
-                has_permission = False
-        return has_permission
+        category = permission.split("_")[0]
+        for slug in get_permission_snapshot(request.user):
+            if slug == permission or \
+                    (slug.split("_")[1]).lower() == "all" \
+                    and slug.split("_")[0] == category:
+                return True
+        return False
     except Exception as e:
         print(str(e))
         return False
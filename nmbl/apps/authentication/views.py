@@ -28,6 +28,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from notifications.models import UserNotificationSetting, NotificationType
 from projects.models import WorkGroupMember
 from projects.serializers import ItemTitleRenameSerializer
+from projects.tasks import permission_group_update_status
 from rest_framework import filters, mixins, status, viewsets
 from rest_framework.authentication import TokenAuthentication, \
     SessionAuthentication
@@ -1343,6 +1344,20 @@ class PermissionManagerViewSet(viewsets.ModelViewSet):
         return Response({"detail": "Role removed Successfully."},
                         status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get', ])
+    def permission_update_status(self, request, pk=None):
+        """
+        Extra action to get the state of the rank update queued
+        by the last permission change of a Group.
+
+        * state is one of idle, queued, running, done or failed,
+          while running done/total gives the count of synced users.
+        """
+        queryset = self.get_queryset()
+        instance = get_object_or_404(queryset, pk=pk)
+        return Response(permission_group_update_status(instance.id),
+                        status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['patch', ])
     def group_rename(self, request, pk=None):
         """
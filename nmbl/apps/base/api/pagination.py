@@ -0,0 +1,167 @@
+"""
+Limit/offset pagination with an opt-in keyset (cursor) mode.
+
+Passing ``cursor`` (empty for the first page) pages on the queryset's
+ordering plus ``id`` instead of an offset, so every page costs the same
+however deep it is. The next page is linked by ``next`` and the total
+is left out unless ``count=exact`` or ``count=estimate`` is passed,
+the estimate being the planner's row estimate instead of a COUNT(*).
+"""
+import base64
+import datetime
+import json
+from collections import OrderedDict
+
+from django.db import connection
+from django.db.models import F, OrderBy, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _ordering_keys(queryset):
+    """
+    (field, descending, nulls_last) of the queryset ordering with id
+    appended as tie breaker, -id when the queryset isn't ordered.
+    """
+    keys = []
+    for ordering in queryset.query.order_by:
+        if isinstance(ordering, str):
+            descending = ordering.startswith('-')
+            field = ordering.lstrip('-')
+            keys.append((field, descending, not descending))
+        elif isinstance(ordering, OrderBy) and isinstance(ordering.expression, F):
+            nulls_last = ordering.nulls_last or not (ordering.nulls_first or ordering.descending)
+            keys.append((ordering.expression.name, ordering.descending, nulls_last))
+        else:
+            return None
+    keys = [('id' if field == 'pk' else field, descending, nulls_last) for field, descending, nulls_last in keys]
+    if not any(field == 'id' for field, descending, nulls_last in keys):
+        descending = keys[-1][1] if keys else True
+        keys.append(('id', descending, not descending))
+    return keys
+
+
+def _after_q(keys, values):
+    """
+    Rows ordered after values, one OR term per key on the equal prefix.
+    """
+    q_obj = Q(pk__in=[])
+    prefix = Q()
+    for (field, descending, nulls_last), value in zip(keys, values):
+        if value is None:
+            after = Q(**{field + '__isnull': False}) if not nulls_last else None
+            equal = Q(**{field + '__isnull': True})
+        else:
+            after = Q(**{field + ('__lt' if descending else '__gt'): value})
+            if nulls_last:
+                after |= Q(**{field + '__isnull': True})
+            equal = Q(**{field: value})
+        if after is not None:
+            q_obj |= prefix & after
+        prefix &= equal
+    return q_obj
+
+
+def _item_value(item, field):
+    value = item
+    for name in field.split('__'):
+        value = getattr(value, name, None)
+        if value is None:
+            return None
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if not isinstance(value, (int, float, str, bool)):
+        return getattr(value, 'pk', str(value))
+    return value
+
+
+def estimated_count(queryset):
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+class RankCursorPagination(LimitOffsetPagination):
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def use_cursor(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.use_cursor(request)
+        if not self.cursor_mode:
+            return super(RankCursorPagination, self).paginate_queryset(queryset, request, view)
+        self.request = request
+        self.limit = self.get_limit(request) or self.default_limit
+        self.keys = _ordering_keys(queryset)
+        if self.keys is None:
+            # ordering on expressions can't be keyed, keep offsets
+            self.cursor_mode = False
+            return super(RankCursorPagination, self).paginate_queryset(queryset, request, view)
+        if queryset.query.distinct_fields:
+            # DISTINCT ON needs its own leading ordering, rows are made distinct as a whole
+            queryset = queryset.distinct()
+        self.count = self.get_cursor_count(queryset, request)
+        values = self.decode_cursor(request)
+        if values is not None:
+            queryset = queryset.filter(_after_q(self.keys, values))
+        ordering = []
+        for field, descending, nulls_last in self.keys:
+            expression = F(field).desc if descending else F(field).asc
+            ordering.append(expression(nulls_last=True) if nulls_last else expression(nulls_first=True))
+        page = list(queryset.order_by(*ordering)[: self.limit + 1])
+        self.has_next = len(page) > self.limit
+        page = page[: self.limit]
+        self.next_values = (
+            [_item_value(page[-1], field) for field, descending, nulls_last in self.keys] if page else None
+        )
+        return page
+
+    def get_cursor_count(self, queryset, request):
+        count = request.query_params.get(self.count_query_param)
+        if count == 'exact':
+            return queryset.count()
+        if count == 'estimate':
+            return estimated_count(queryset)
+        return None
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def encode_cursor(self, values):
+        return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super(RankCursorPagination, self).get_next_link()
+        if not self.has_next:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_values))
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super(RankCursorPagination, self).get_paginated_response(data)
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['results'] = data
+        return Response(response)
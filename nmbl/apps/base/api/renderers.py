@@ -0,0 +1,86 @@
+"""
+JSON renderer encoding with orjson, several times faster than the
+json module on large responses. Output matches the default renderer:
+compact UTF-8, datetimes in the configured DATETIME_FORMAT, Decimal as
+float and lazy translation strings as text. Indented responses (the
+browsable API) and installs without orjson use the default renderer.
+"""
+import datetime
+import decimal
+import uuid
+
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+
+def _format_datetime(value):
+    output_format = api_settings.DATETIME_FORMAT
+    if output_format is None or output_format.lower() == 'iso-8601':
+        representation = value.isoformat()
+        if representation.endswith('+00:00'):
+            representation = representation[:-6] + 'Z'
+        return representation
+    # as serializers.DateTimeField renders it
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.strftime(output_format)
+
+
+def encode_default(obj):
+    """
+    Types orjson doesn't encode itself, converted like rest_framework's
+    JSONEncoder does.
+    """
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, datetime.datetime):
+        return _format_datetime(obj)
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    if isinstance(obj, datetime.time):
+        if timezone.is_aware(obj):
+            raise ValueError("JSON can't represent timezone-aware times.")
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, QuerySet):
+        return tuple(obj)
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8')
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__getitem__'):
+        cls = list if isinstance(obj, (list, tuple)) else dict
+        try:
+            return cls(obj)
+        except Exception:
+            pass
+    if hasattr(obj, '__iter__'):
+        return tuple(item for item in obj)
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(obj).__name__))
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+        if orjson is None or self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super(FastJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+        # same escaping as JSONRenderer, the two separators are invalid in javascript strings
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
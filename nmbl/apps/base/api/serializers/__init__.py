@@ -1 +1,2 @@
 from .basemodels import BaseModelSummarySerializer, BaseModelDetailSerializer
+from .dynamicfields import DynamicFieldsMixin, collapsed_id, collapsed_ids, field_expanded, field_requested
@@ -0,0 +1,71 @@
+from rest_framework import serializers
+
+FIELDS_QUERY_PARAM = 'fields'
+EXPAND_QUERY_PARAM = 'expand'
+
+
+def _query_param_set(request, name):
+    if request is None or name not in request.query_params:
+        return None
+    return {value.strip() for value in request.query_params.get(name, '').split(',') if value.strip()}
+
+
+def field_requested(request, name):
+    """
+    False when ?fields= is given without name.
+    """
+    fields = _query_param_set(request, FIELDS_QUERY_PARAM)
+    return fields is None or name in fields
+
+
+def field_expanded(request, name):
+    """
+    False when name isn't requested or ?expand= is given without it.
+    """
+    expand = _query_param_set(request, EXPAND_QUERY_PARAM)
+    return field_requested(request, name) and (expand is None or name in expand)
+
+
+def collapsed_id():
+    return serializers.PrimaryKeyRelatedField(read_only=True)
+
+
+def collapsed_ids():
+    return serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+
+class DynamicFieldsMixin(object):
+    """
+    ?fields=a,b keeps only the listed fields, the others are removed before
+    serialization so their queries and get_<field> methods never run.
+    ?expand=a,b keeps the listed expandable_fields nested, the others are
+    replaced by their collapsed field or left out when it is None.
+    Without the params every field is serialized nested as before. The
+    params select the fields of the root serializer (or of the items of a
+    root list) only, nested serializers keep their default fields.
+    """
+
+    # field name -> factory of the collapsed field, or None
+    expandable_fields = {}
+
+    def is_root_serializer(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super(DynamicFieldsMixin, self).get_fields()
+        if not self.is_root_serializer():
+            return fields
+        request = self.context.get('request')
+        for name in list(fields):
+            if not field_requested(request, name):
+                del fields[name]
+            elif name in self.expandable_fields and not field_expanded(request, name):
+                collapsed = self.expandable_fields[name]
+                if collapsed is None:
+                    del fields[name]
+                else:
+                    fields[name] = collapsed()
+        return fields
@@ -0,0 +1,94 @@
+"""
+Client timezone arithmetic done by postgres. A zone is either the
+offset_time the front-end sends, minutes added to utc to get the local
+time, or an IANA timezone name.
+"""
+import datetime
+
+import pytz
+from django.db.models import Count, DateField, DateTimeField, Func, Value
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+
+def client_zone(offset_time=None, timezone_name=None):
+    """
+    Zone of a request from its timezone or offset_time parameter,
+    ValueError when neither is usable.
+    """
+    if timezone_name:
+        try:
+            pytz.timezone(timezone_name)
+        except pytz.UnknownTimeZoneError:
+            raise ValueError('Unknown timezone: {}'.format(timezone_name))
+        return timezone_name
+    if offset_time in [None, '']:
+        raise ValueError('offset_time is required field')
+    return datetime.timedelta(minutes=int(offset_time))
+
+
+class AtTimeZone(Func):
+    """
+    Wall clock time of a timestamptz in zone, postgres reads an interval
+    zone as the offset east of utc.
+    """
+
+    arg_joiner = ' AT TIME ZONE '
+    template = '(%(expressions)s)'
+    output_field = DateTimeField()
+
+    def __init__(self, expression, zone, **extra):
+        super(AtTimeZone, self).__init__(expression, Value(zone), **extra)
+
+
+def local_datetime(expression, zone):
+    return AtTimeZone(expression, zone)
+
+
+def local_date(expression, zone):
+    return Cast(AtTimeZone(expression, zone), DateField())
+
+
+def local_now(zone):
+    if isinstance(zone, datetime.timedelta):
+        return timezone.now().astimezone(pytz.utc).replace(tzinfo=None) + zone
+    return timezone.now().astimezone(pytz.timezone(zone)).replace(tzinfo=None)
+
+
+def next_local_midnight(zone):
+    """
+    Aware utc datetime the next local day starts at.
+    """
+    midnight = datetime.datetime.combine(local_now(zone).date() + datetime.timedelta(1), datetime.time())
+    if isinstance(zone, datetime.timedelta):
+        return timezone.make_aware(midnight - zone, pytz.utc)
+    return pytz.timezone(zone).localize(midnight).astimezone(pytz.utc)
+
+
+def daily_counts(queryset, field, zone, first_day, days):
+    """
+    [(date, count)] of the rows of queryset whose field falls on each of
+    the days local dates from first_day, grouped in one query.
+    """
+    last_day = first_day + datetime.timedelta(days - 1)
+    # loose utc bounds so the index on field still narrows the rows
+    start = timezone.make_aware(datetime.datetime.combine(first_day, datetime.time()), pytz.utc)
+    rows = (
+        queryset.filter(
+            **{
+                field + '__gte': start - datetime.timedelta(days=1),
+                field + '__lt': start + datetime.timedelta(days=days + 1),
+            }
+        )
+        .annotate(local_day=local_date(field, zone))
+        .filter(local_day__range=[first_day, last_day])
+        .order_by()
+        .values('local_day')
+        .annotate(count=Count('pk'))
+        .values_list('local_day', 'count')
+    )
+    counts = dict(rows)
+    return [
+        (first_day + datetime.timedelta(day), counts.get(first_day + datetime.timedelta(day), 0))
+        for day in range(days)
+    ]
@@ -0,0 +1,28 @@
+"""
+Lookups postgres can answer from a pg_trgm index, the icontains lookup
+wraps the column in UPPER() which the index doesn't cover.
+"""
+from django.db.models import CharField, Lookup
+
+
+@CharField.register_lookup
+class ILike(Lookup):
+    """
+    column ILIKE pattern, the pattern is passed as is, see like_pattern.
+    """
+
+    lookup_name = 'ilike'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return '%s ILIKE %s' % (lhs, rhs), lhs_params + rhs_params
+
+
+def like_pattern(text, prefix=False):
+    """
+    ILIKE pattern of the rows containing text, starting with it when
+    prefix is set.
+    """
+    text = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return text + '%' if prefix else '%' + text + '%'
@@ -1,3 +1,4 @@
+from base.api.serializers import DynamicFieldsMixin, collapsed_id
 from base.constants import DATE_FORMAT_OUT
 from projects.helpers import AuditHistoryCreate, GetOrCreateTags
 from projects.models import Attachment
@@ -112,7 +113,7 @@ class AttachmentUpdateSerializer(serializers.ModelSerializer):
         return get_attachment_url(self.context['request'], obj)
 
 
-class AttachmentListSerializer(serializers.ModelSerializer):
+class AttachmentListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     document_url = serializers.SerializerMethodField()
 
     class Meta:
@@ -130,6 +131,11 @@ class AttachmentListSerializer(serializers.ModelSerializer):
             'document_url',
         ]
 
+    expandable_fields = {
+        'created_by': collapsed_id,
+        'uploaded_to': None,
+    }
+
     uploaded_to = serializers.SerializerMethodField()
     document_name = serializers.SerializerMethodField()
     created_by = serializers.SerializerMethodField()
@@ -1,3 +1,4 @@
+from base.api.serializers import DynamicFieldsMixin, collapsed_id
 from django.contrib.contenttypes.models import ContentType
 from projects.api.serializers.attachments import (
     DocumentBaseSerializer,
@@ -74,12 +75,15 @@ class TaskAttachmentSerializer(serializers.ModelSerializer):
 
     def get_attachments(self, task):
         request = self.context['request']
-        return DocumentBaseSerializer(
-            Attachment.objects.filter(task=task, is_delete=False), many=True, context={'request': request}
-        ).data
+        page_loader = self.context.get('page_loader')
+        if page_loader:
+            attachments = page_loader.task_attachments.get(task.id, [])
+        else:
+            attachments = Attachment.objects.filter(task=task, is_delete=False)
+        return DocumentBaseSerializer(attachments, many=True, context={'request': request}).data
 
 
-class TaskListSerializer(serializers.ModelSerializer):
+class TaskListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Task
         fields = (
@@ -99,6 +103,11 @@ class TaskListSerializer(serializers.ModelSerializer):
             'task_template_id',
         )
 
+    expandable_fields = {
+        'assigned_to': collapsed_id,
+        'attachments': None,
+    }
+
     assigned_to = UserSerializer()
     attachments = DocumentDetailsSerializer(source='task_attachment', many=True)
 
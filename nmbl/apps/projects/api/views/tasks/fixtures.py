@@ -1,4 +1,4 @@
-from authentication.models import GroupAndPermission
+from authentication.permission_snapshot import permission_snapshot
 from django.db.models import Q
 from django_filters import rest_framework as filters
 from projects.api.serializers import (
@@ -54,13 +54,7 @@ class TaskFixtureViewSet(ModelViewSet):
                 Q(organization=company),
                 Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
             ).distinct()
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            permission__slug='task_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('task_view-archived'):
             queryset = queryset.exclude(status__in=[3, 4])
         task_type = self.request.query_params.get('type', None)
         if task_type:
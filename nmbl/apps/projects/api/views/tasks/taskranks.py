@@ -1,12 +1,14 @@
+from projects.lazy_ranks import MaterializedRankMixin
 from projects.models import Task, TaskRank
 from projects.permissions import RankPermission
 from projects.serializers import TaskRankSerializer
 from rest_framework.viewsets import ModelViewSet
 
 
-class TaskRankViewSet(ModelViewSet):
+class TaskRankViewSet(MaterializedRankMixin, ModelViewSet):
     model = Task
     permission_classes = (RankPermission,)
+    rank_model = TaskRank
 
     def get_queryset(self):
         user = self.request.user
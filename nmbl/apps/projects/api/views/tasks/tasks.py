@@ -1,13 +1,16 @@
 import uuid
 from datetime import timedelta
 
-from authentication.models import GroupAndPermission
+from authentication.permission_snapshot import permission_snapshot
+from base.api.pagination import RankCursorPagination
+from base.api.serializers import field_expanded, field_requested
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import Prefetch, Q
 from django.http import Http404
 from django.utils import timezone
 from django_filters import rest_framework as filters
 from projects.api.serializers import TaskCreateSerializer, TaskUpdateSerializer
+from projects.conditional import ConditionalDetailMixin
 from projects.filters import TaskFilterSet
 from projects.helpers import (
     AuditHistoryCreate,
@@ -18,9 +21,9 @@ from projects.helpers import (
     task_new_message_notification,
     user_permission_check,
 )
+from projects.lazy_ranks import LazyRankListMixin
 from projects.models import (
     Attachment,
-    Project,
     ServiceDeskExternalCCUser,
     ServiceDeskExternalRequest,
     ServiceDeskRequest,
@@ -28,7 +31,6 @@ from projects.models import (
     ServiceDeskUserInformation,
     Task,
     TaskRank,
-    Workflow,
 )
 from projects.permissions import CustomPermission
 from projects.serializers import (
@@ -41,6 +43,7 @@ from projects.serializers import (
     TaskRankDetailSerializer,
     TaskRankListSerializer,
 )
+from projects.statistics import visible_objects
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.filters import OrderingFilter, SearchFilter
@@ -49,7 +52,7 @@ from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
 
-class TaskViewSet(ModelViewSet):
+class TaskViewSet(ConditionalDetailMixin, LazyRankListMixin, ModelViewSet):
     """
     list:
     API to list all Task in my organisation
@@ -166,40 +169,28 @@ class TaskViewSet(ModelViewSet):
         SearchFilter,
         OrderingFilter,
     )
+    pagination_class = RankCursorPagination
     search_fields = [
         'task__name',
     ]
     ordering_fields = ['task__name', 'task__assigned_to', 'task__status', 'task__due_date', 'rank']
+    rank_model = TaskRank
+    detail_object_type = 'task'
+    member_lookups = (
+        'assigned_to__id__in',
+        'assigned_to_group__group_members__id__in',
+    )
+    group_lookup = 'assigned_to_group__id__in'
 
     def get_queryset(self):
         user = self.request.user
         company = user.company
         group = user.group
         if user_permission_check(user, 'task'):
-            q_obj = Q()
-            q_obj.add(
-                Q(task__is_private=True, task__organization=company, user=user)
-                & Q(
-                    Q(task__assigned_to=user)
-                    | Q(task__created_by=user)
-                    | Q(task__assigned_to_group__group_members=user)
-                ),
-                Q.OR,
-            )
-            q_obj.add(Q(task__is_private=False, task__organization=company, user=user), Q.OR)
-            queryset = TaskRank.objects.filter(q_obj).distinct()
+            queryset = TaskRank.objects.filter(user=user, task__in=Task.objects.company_visible_to(user))
         else:
-            queryset = TaskRank.objects.filter(
-                Q(task__organization=company, user=user),
-                Q(task__assigned_to=user) | Q(task__created_by=user) | Q(task__assigned_to_group__group_members=user),
-            ).distinct()
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            permission__slug='task_view-archived',
-            has_permission=True,
-        ).exists():
+            queryset = TaskRank.objects.filter(user=user, task__in=Task.objects.related_to(user))
+        if not permission_snapshot(group, company).has('task_view-archived'):
             queryset = queryset.exclude(task__status__in=[3, 4])
         task_type = self.request.query_params.get('type', None)
         if task_type:
@@ -242,7 +233,12 @@ class TaskViewSet(ModelViewSet):
             return result_queryset
         else:
             pass
-        queryset = queryset.prefetch_related(Prefetch('task__task_attachment', queryset=Attachment.objects.active()))
+        if field_expanded(self.request, 'attachments'):
+            queryset = queryset.prefetch_related(
+                Prefetch('task__task_attachment', queryset=Attachment.objects.active())
+            )
+        if field_requested(self.request, 'assigned_to'):
+            queryset = queryset.select_related('task__assigned_to')
         return queryset
 
     def get_serializer_class(self):
@@ -262,7 +258,35 @@ class TaskViewSet(ModelViewSet):
             return MessageDeleteSerializer
         return TaskRankListSerializer
 
+    def detail_user_state(self, instance):
+        total_favorite_task = TaskRank.objects.filter(user=self.request.user, is_favorite=True).count()
+        return instance.id, instance.rank, instance.is_favorite, total_favorite_task
+
+    def get_lazy_queryset(self):
+        queryset = super(TaskViewSet, self).get_lazy_queryset()
+        task_type = self.request.query_params.get('type', None)
+        if task_type:
+            if task_type.lower() == "active":
+                queryset = queryset.exclude(status__in=[3, 4])
+            elif task_type.lower() == "archived":
+                queryset = queryset.filter(status__in=[3, 4])
+            else:
+                queryset = Task.objects.none()
+        if self.request.query_params.get("exclude_request_task") == 'true':
+            attached_task = ServiceDeskExternalRequest.objects.exclude(task=None).values('task_id')
+            queryset = queryset.exclude(Q(id__in=attached_task) | Q(status__in=[3, 4]))
+        if self.request.query_params.get('favorite_task') in ['true', 'True', '1']:
+            # favorites are rank rows, a user without materialized ranks has none
+            queryset = Task.objects.none()
+        if field_expanded(self.request, 'attachments'):
+            queryset = queryset.prefetch_related(Prefetch('task_attachment', queryset=Attachment.objects.active()))
+        if field_requested(self.request, 'assigned_to'):
+            queryset = queryset.select_related('assigned_to')
+        return queryset
+
     def list(self, request, *args, **kwargs):
+        if self.ranks_are_lazy():
+            return self.lazy_list(request)
         queryset = self.filter_queryset(self.get_queryset())
         context = self.paginate_queryset(queryset)
         serializer = TaskRankListSerializer(context, many=True, context={'request': request, "q_set": queryset})
@@ -320,10 +344,11 @@ class TaskViewSet(ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         if not str(kwargs.get('pk')).isdigit():
             raise Http404
-        instance = get_object_or_404(self.get_queryset(), task_id=int(kwargs.get('pk')))
-        AuditHistoryCreate("task", instance.task_id, self.request.user, "Viewed By")
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        if self.ranks_are_lazy():
+            instance = self.get_lazy_rank(int(kwargs.get('pk')))
+        else:
+            instance = get_object_or_404(self.get_queryset(), task_id=int(kwargs.get('pk')))
+        return self.conditional_retrieve(instance)
 
     @action(
         detail=True,
@@ -406,13 +431,7 @@ class TaskViewSet(ModelViewSet):
                 Q(organization=user.company),
                 Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
             ).distinct('id')
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            permission__slug='task_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('task_view-archived'):
             queryset = queryset.exclude(status__in=[3, 4])
         instance = get_object_or_404(queryset, pk=pk)
         if instance.status in [3, 4]:
@@ -562,13 +581,7 @@ class TaskViewSet(ModelViewSet):
                 Q(organization=user.company),
                 Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
             ).distinct('id')
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            permission__slug='task_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('task_view-archived'):
             queryset = queryset.filter(status__in=[3, 4])
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid(raise_exception=True):
@@ -715,13 +728,7 @@ class TaskViewSet(ModelViewSet):
                 Q(organization=user.company),
                 Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
             ).distinct('id')
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            permission__slug='task_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('task_view-archived'):
             queryset = queryset.filter(status__in=[3, 4])
         task_obj = get_object_or_404(queryset, pk=int(kwargs.get('pk')))
         serializer = self.get_serializer(data=request.data)
@@ -764,8 +771,6 @@ class TaskViewSet(ModelViewSet):
         ```
         """
         user = request.user
-        group = user.group
-        company = user.company
         detail = {
             'workflow': None,
             'workflow_id': None,
@@ -776,84 +781,17 @@ class TaskViewSet(ModelViewSet):
             'project_id': None,
             'project_total_workflow': None,
         }
-        if user_permission_check(user, 'task'):
-            q_obj = Q()
-            q_obj.add(
-                Q(is_private=True, organization=company)
-                & Q(Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user)),
-                Q.OR,
-            )
-            q_obj.add(Q(is_private=False, organization=company), Q.OR)
-            queryset = Task.objects.filter(q_obj).distinct('id')
-        else:
-            queryset = Task.objects.filter(
-                Q(organization=user.company),
-                Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
-            ).distinct('id')
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            permission__slug='task_view-archived',
-            has_permission=True,
-        ).exists():
-            queryset = queryset.exclude(status__in=[3, 4])
+        queryset = visible_objects(user, 'task')
         instance = get_object_or_404(queryset, pk=pk)
         if instance.workflow:
             workflow = instance.workflow
-            # get all the accessable workflow queryset as
-            # "workflow_queryset" and make dublicate queryset
-            # list of all id
-            if GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='workflow',
-                has_permission=True,
-                permission__slug='workflow_workflow-view-all',
-            ).exists():
-                workflow_queryset = Workflow.objects.filter(organization=company)
-                if not GroupAndPermission.objects.filter(
-                    group=group,
-                    company=company,
-                    permission__permission_category='workflow',
-                    permission__slug='workflow_view-archived',
-                    has_permission=True,
-                ).exists():
-                    workflow_queryset = workflow_queryset.exclude(status__in=[2, 3])
-                workflow_ids = workflow_queryset.values_list("id", flat=True).distinct()
-            elif GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='workflow',
-                has_permission=True,
-                permission__slug='workflow_workflow-view',
-            ).exists():
-                workflow_queryset = Workflow.objects.filter(
-                    Q(organization=company),
-                    Q(owner=user)
-                    | Q(assigned_to_users=user)
-                    | Q(created_by=user)
-                    | Q(assigned_to_group__group_members=user),
-                )
-                if not GroupAndPermission.objects.filter(
-                    group=group,
-                    company=company,
-                    permission__permission_category='workflow',
-                    permission__slug='workflow_view-archived',
-                    has_permission=True,
-                ).exists():
-                    workflow_queryset = workflow_queryset.exclude(status__in=[2, 3])
-                workflow_ids = workflow_queryset.values_list("id", flat=True).distinct()
-            else:
-                workflow_ids = []
-            if not workflow_ids:
+            workflow_queryset = visible_objects(user, 'workflow')
+            if not workflow_queryset.exists():
                 return Response({'detail': 'Invalid Request'}, status=status.HTTP_400_BAD_REQUEST)
             # check task workflow have accessible and get
             # all task of the workflow
-            if workflow.id in workflow_ids:
-                total_task_of_workflow = (
-                    queryset.filter(workflow=workflow, organization=company).values_list('id', flat=True).distinct()
-                )
+            if workflow_queryset.filter(id=workflow.id).exists():
+                total_task_of_workflow = queryset.filter(workflow=workflow)
                 detail['workflow'] = workflow.name
                 detail['workflow_id'] = workflow.id
                 detail['workflow_importance'] = workflow.importance
@@ -861,57 +799,10 @@ class TaskViewSet(ModelViewSet):
                 if not workflow.project:
                     return Response({'detail': detail}, status=status.HTTP_200_OK)
                 else:
-                    # get all the accessible project queryset
-                    # as "project_queryset" and make duplicate
-                    # queryset list of all id
-                    if GroupAndPermission.objects.filter(
-                        group=group,
-                        company=company,
-                        permission__permission_category='project',
-                        has_permission=True,
-                        permission__slug='project_project-view-all',
-                    ).exists():
-                        project_queryset = Project.objects.filter(organization=company)
-                        if not GroupAndPermission.objects.filter(
-                            group=group,
-                            company=company,
-                            permission__permission_category='project',
-                            permission__slug='project_view-archived',
-                            has_permission=True,
-                        ).exists():
-                            project_queryset = project_queryset.exclude(status__in=[2, 3])
-                        project_ids = project_queryset.values_list('id', flat=True).distinct()
-                    elif GroupAndPermission.objects.filter(
-                        group=group,
-                        company=company,
-                        permission__permission_category='project',
-                        has_permission=True,
-                        permission__slug='project_project-view',
-                    ).exists():
-                        project_queryset = Project.objects.filter(
-                            Q(organization=company),
-                            Q(owner=user)
-                            | Q(assigned_to_users=user)
-                            | Q(created_by=user)
-                            | Q(assigned_to_group__group_members=user),
-                        )
-                        if not GroupAndPermission.objects.filter(
-                            group=group,
-                            company=company,
-                            permission__permission_category='project',
-                            permission__slug='project_view-archived',
-                            has_permission=True,
-                        ).exists():
-                            project_queryset = project_queryset.exclude(status__in=[2, 3])
-                        project_ids = project_queryset.values_list('id', flat=True).distinct()
-                    else:
-                        project_ids = []
                     # check user have access to task of workflow of project
-                    if not project_ids or workflow.project.id not in project_ids:
+                    if not visible_objects(user, 'project').filter(id=workflow.project.id).exists():
                         return Response({'detail': detail}, status=status.HTTP_200_OK)
-                    total_project_of_workflow = (
-                        workflow_queryset.filter(project=workflow.project).values_list('id', flat=True).distinct()
-                    )
+                    total_project_of_workflow = workflow_queryset.filter(project=workflow.project)
                     detail['project_name'] = workflow.project.name
                     detail['project_importance'] = workflow.project.importance
                     detail['project_id'] = workflow.project.id
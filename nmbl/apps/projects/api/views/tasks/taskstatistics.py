@@ -1,10 +1,11 @@
 import datetime
 
-from authentication.models import GroupAndPermission
+from authentication.permission_snapshot import permission_snapshot
 from django.db.models import Q
 from projects.helpers import user_permission_check
 from projects.models import Task
 from projects.permissions import UserWorkGroupPermission
+from projects.statistics import task_importance_counts
 from rest_framework.mixins import ListModelMixin
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -48,13 +49,7 @@ class TaskStatisticsViewSet(ListModelMixin, GenericViewSet):
                 Q(organization=company),
                 Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
             ).distinct('id')
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            permission__slug='task_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('task_view-archived'):
             queryset = queryset.exclude(status__in=[3, 4])
         return queryset
 
@@ -63,19 +58,5 @@ class TaskStatisticsViewSet(ListModelMixin, GenericViewSet):
 
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
-        active_task_objs = queryset.exclude(status__in=[3, 4])
-        total_task = queryset.count()
-        completed = queryset.filter(status__in=[3, 4]).count()
-        date_today = datetime.datetime.utcnow().date()
-        today_due = active_task_objs.filter(due_date__date=date_today).count()
-        total_due = active_task_objs.filter(due_date__date__lt=date_today).count()
-        response = {
-            'high': active_task_objs.filter(importance=3).count(),
-            'med': active_task_objs.filter(importance=2).count(),
-            'low': active_task_objs.filter(importance=1).count(),
-            'completed': completed,
-            'total_task': total_task,
-            'due_today': today_due,
-            'total_due': total_due,
-        }
+        response = task_importance_counts(queryset, datetime.datetime.utcnow().date())
         return Response(dict(response))
@@ -1,4 +1,4 @@
-from authentication.models import GroupAndPermission
+from authentication.permission_snapshot import permission_snapshot
 from django.db.models import Q
 from django_filters import rest_framework as filters
 from projects.api.serializers import (
@@ -48,13 +48,7 @@ class WorkflowFixtureViewSet(ModelViewSet):
                     | Q(created_by=user)
                     | Q(assigned_to_group__group_members=user),
                 )
-            if not GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='workflow',
-                permission__slug='workflow_view-archived',
-                has_permission=True,
-            ).exists():
+            if not permission_snapshot(group, company).has('workflow_view-archived'):
                 queryset = queryset.exclude(status__in=[2, 3])
             user_ids = []
             group_ids = []
@@ -0,0 +1,48 @@
+from collections import defaultdict
+
+from .visibility import VISIBILITY_MODELS
+
+# queryset method of the visibility managers each scope checks against
+OBJECT_PERMISSION_SCOPES = {
+    'related': 'related_to',
+    'company': 'company_visible_to',
+    'visible': 'visible_to',
+}
+
+
+def permitted_objects(user, pairs, scope='visible'):
+    """
+    Return the set of (model, id) pairs of pairs the user may access,
+    with one query per model type. model is 'project', 'workflow' or 'task',
+    unknown models and ids that aren't integers are never permitted.
+    """
+    ids_by_model = defaultdict(set)
+    for model, instance_id in pairs:
+        try:
+            ids_by_model[model].add(int(instance_id))
+        except (TypeError, ValueError):
+            continue
+    permitted = set()
+    for model, instance_ids in ids_by_model.items():
+        if model not in VISIBILITY_MODELS:
+            continue
+        queryset = getattr(VISIBILITY_MODELS[model].objects, OBJECT_PERMISSION_SCOPES[scope])(user)
+        permitted.update(
+            (model, instance_id) for instance_id in queryset.filter(id__in=instance_ids).values_list('id', flat=True)
+        )
+    return permitted
+
+
+def has_object_permissions(user, pairs, scope='visible'):
+    """
+    True when the user may access every (model, id) pair of pairs.
+    """
+    pairs = [(model, instance_id) for model, instance_id in pairs]
+    permitted = permitted_objects(user, pairs, scope)
+    for model, instance_id in pairs:
+        try:
+            if (model, int(instance_id)) not in permitted:
+                return False
+        except (TypeError, ValueError):
+            return False
+    return True
@@ -0,0 +1,121 @@
+import hashlib
+import time
+
+from authentication.models import User
+from django.conf import settings
+from django.db.models import Count, DateTimeField, IntegerField, Max, OuterRef, Subquery, Sum
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+from .helpers import audit_viewed_by
+from .models import Attachment, ServiceDeskExternalRequest, Tag, Task, WorkGroup
+from .visibility import VISIBILITY_MODELS
+
+# bump when the detail serializers change so cached representations are dropped
+DETAIL_ETAG_VERSION = 1
+
+# rows serialized with a detail as (name, model, filters, lookup to the object, object field)
+DETAIL_COLLECTIONS = {
+    'project': (
+        ('owner', User, {}, 'project_owner', 'pk'),
+        ('assigned_to_users', User, {}, 'project_assigned_to_users', 'pk'),
+        ('tags', Tag, {}, 'project_tags', 'pk'),
+        ('groups', WorkGroup, {}, 'project_assigned_to_workgroup', 'pk'),
+        ('attachments', Attachment, {'is_delete': False}, 'project', 'pk'),
+    ),
+    'workflow': (
+        ('owner', User, {}, 'workflow_owner', 'pk'),
+        ('assigned_to_users', User, {}, 'workflow_assigned_to_users', 'pk'),
+        ('tags', Tag, {}, 'workflow_tags', 'pk'),
+        ('groups', WorkGroup, {}, 'workflow_assigned_to_workgroup', 'pk'),
+        ('attachments', Attachment, {'is_delete': False}, 'workflow', 'pk'),
+        ('requests', ServiceDeskExternalRequest, {}, 'workflow', 'pk'),
+    ),
+    'task': (
+        ('assigned_to', User, {}, 'task_assigned_to_user', 'pk'),
+        ('tags', Tag, {}, 'task_tags', 'pk'),
+        ('groups', WorkGroup, {}, 'task_assigned_to_workgroup', 'pk'),
+        ('attachments', Attachment, {'is_delete': False}, 'task', 'pk'),
+        ('requests', ServiceDeskExternalRequest, {}, 'task', 'pk'),
+        ('prior_task', Task, {}, 'id', 'prior_task_id'),
+        ('after_task', Task, {}, 'id', 'after_task_id'),
+    ),
+}
+
+
+def _collection_versions(object_type):
+    """
+    Count, sum of ids and latest modified_at of each collection as
+    subqueries on the object, a row added, removed or saved changes one.
+    """
+    annotations = {}
+    for name, model, filters, lookup, object_field in DETAIL_COLLECTIONS[object_type]:
+        rows = model.objects.filter(**filters, **{lookup: OuterRef(object_field)}).order_by().values(lookup)
+        for suffix, aggregate, output_field in [
+            ('count', Count('id'), IntegerField()),
+            ('ids', Sum('id'), IntegerField()),
+            ('modified', Max('modified_at'), DateTimeField()),
+        ]:
+            annotations['{}_{}'.format(name, suffix)] = Subquery(
+                rows.annotate(version=aggregate).values('version'), output_field=output_field
+            )
+    return annotations
+
+
+def signed_url_period():
+    """
+    Number of the half of the presigned url lifetime we are in, None when
+    file urls aren't signed. A cached detail holding urls signed in an
+    earlier period may be about to expire, so it stops matching.
+    """
+    if not getattr(settings, 'AWS_QUERYSTRING_AUTH', False):
+        return None
+    # django-storages signs urls for an hour unless told otherwise
+    return int(time.time() // (getattr(settings, 'AWS_QUERYSTRING_EXPIRE', 3600) / 2))
+
+
+def detail_etag(object_type, object_id, *user_state):
+    """
+    ETag of the detail of an object with one query, None when it doesn't
+    exist. user_state holds the values of the response that depend on the
+    user, the rank and favorite flags. There is no Last-Modified: removed
+    tags, users or attachments and rank changes don't advance any
+    modified_at, a date can't tell the detail changed. The detail holds
+    presigned attachment urls, the ETag changes with signed_url_period.
+    """
+    annotations = _collection_versions(object_type)
+    row = (
+        VISIBILITY_MODELS[object_type]
+        .objects.filter(id=object_id)
+        .annotate(**annotations)
+        .values_list('modified_at', *annotations)
+        .first()
+    )
+    if row is None:
+        return None
+    state = repr((DETAIL_ETAG_VERSION, object_type, object_id, user_state, signed_url_period(), row)).encode('utf-8')
+    return 'W/"{}"'.format(hashlib.md5(state).hexdigest())
+
+
+class ConditionalDetailMixin(object):
+    """
+    Detail of project/workflow/task rank viewsets answered with 304 when
+    the If-None-Match of the request still matches, without serializing
+    the object. If-Modified-Since alone is ignored.
+    """
+
+    detail_object_type = None
+
+    def detail_user_state(self, instance):
+        return instance.id, instance.rank
+
+    def conditional_retrieve(self, instance):
+        object_id = getattr(instance, self.detail_object_type + '_id')
+        audit_viewed_by(self.detail_object_type, object_id, self.request.user)
+        etag = detail_etag(self.detail_object_type, object_id, self.request.user.id, *self.detail_user_state(instance))
+        response = get_conditional_response(self.request, etag=etag)
+        if response is None:
+            response = Response(self.get_serializer(instance).data)
+        if etag:
+            response['ETag'] = etag
+        return response
@@ -0,0 +1,142 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Project, Task, Workflow
+from .models.taskcounters import TASK_COUNTER_FIELDS
+
+COMPLETED_TASK_STATUSES = [3, 4]
+
+
+def _today():
+    return timezone.localdate()
+
+
+def task_counter_values(task, today=None):
+    """
+    What task adds to the counters of its workflow and project.
+    """
+    completed = task.status in COMPLETED_TASK_STATUSES
+    due_date = task.due_date
+    if due_date and timezone.is_aware(due_date):
+        due_date = timezone.localtime(due_date)
+    passed_due = bool(due_date and not completed and due_date.date() < (today or _today()))
+    return {'total_task': 1, 'completed_task': int(completed), 'passed_due': int(passed_due)}
+
+
+def task_counters(obj):
+    return {field: getattr(obj, field) for field in TASK_COUNTER_FIELDS}
+
+
+def task_counter_state(task):
+    """
+    (workflow_id, counter values) of a task, workflow_id None when
+    the task doesn't count anywhere.
+    """
+    if not task.workflow_id:
+        return None, {}
+    return task.workflow_id, task_counter_values(task)
+
+
+def apply_task_counter_delta(workflow_id, delta):
+    """
+    Add delta to the counters of the workflow and its project, in the
+    UPDATE itself so concurrent task changes don't overwrite each other.
+    """
+    delta = {field: value for field, value in delta.items() if value}
+    if not workflow_id or not delta:
+        return
+    updates = {field: F(field) + value for field, value in delta.items()}
+    Workflow.objects.filter(id=workflow_id).update(**updates)
+    Project.objects.filter(workflow_assigned_project=workflow_id).update(**updates)
+
+
+def apply_task_counter_change(old_state, new_state):
+    old_workflow_id, old_values = old_state
+    new_workflow_id, new_values = new_state
+    if old_workflow_id == new_workflow_id:
+        apply_task_counter_delta(
+            new_workflow_id,
+            {field: new_values.get(field, 0) - old_values.get(field, 0) for field in TASK_COUNTER_FIELDS},
+        )
+        return
+    apply_task_counter_delta(old_workflow_id, {field: -value for field, value in old_values.items()})
+    apply_task_counter_delta(new_workflow_id, new_values)
+
+
+def move_workflow_counters(workflow_id, old_project_id, new_project_id):
+    """
+    Carry the counters of a workflow moved to another project.
+    """
+    values = Workflow.objects.filter(id=workflow_id).values(*TASK_COUNTER_FIELDS).first()
+    if not values:
+        return
+    if old_project_id:
+        Project.objects.filter(id=old_project_id).update(
+            **{field: F(field) - value for field, value in values.items() if value}
+        )
+    if new_project_id:
+        Project.objects.filter(id=new_project_id).update(
+            **{field: F(field) + value for field, value in values.items() if value}
+        )
+
+
+def task_counter_subqueries(group_by, fields=TASK_COUNTER_FIELDS, today=None):
+    """
+    Correlated COUNT subqueries of the counters, group_by is the task
+    lookup of the outer row ('workflow' or 'workflow__project').
+    """
+    today = today or _today()
+    filters = {
+        'total_task': Q(),
+        'completed_task': Q(status__in=COMPLETED_TASK_STATUSES),
+        'passed_due': Q(due_date__date__lt=today) & ~Q(status__in=COMPLETED_TASK_STATUSES),
+    }
+    subqueries = {}
+    for field in fields:
+        counts = (
+            Task.objects.filter(filters[field], **{group_by: OuterRef('pk')})
+            .order_by()
+            .values(group_by)
+            .annotate(count=Count('id'))
+            .values('count')
+        )
+        subqueries[field] = Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+    return subqueries
+
+
+def refresh_task_counters(workflow_ids=None, project_ids=None, fields=TASK_COUNTER_FIELDS):
+    """
+    Recount the counters from the tasks of the given workflows and
+    projects with their projects and workflows, of every one when no
+    ids are given. Used after bulk task updates which don't send
+    signals, by the nightly passed_due rollover and the repair command.
+    """
+    workflows = Workflow.objects.all()
+    projects = Project.objects.all()
+    if workflow_ids is not None or project_ids is not None:
+        workflow_ids = set(workflow_ids or [])
+        project_ids = set(project_ids or [])
+        workflows = workflows.filter(Q(id__in=workflow_ids) | Q(project_id__in=project_ids))
+        projects = projects.filter(Q(id__in=project_ids) | Q(workflow_assigned_project__in=workflow_ids))
+    workflows.update(**task_counter_subqueries('workflow', fields))
+    projects.update(**task_counter_subqueries('workflow__project', fields))
+
+
+def rollover_passed_due():
+    # tasks whose due date passed since the last run are only counted by a recount
+    refresh_task_counters(fields=['passed_due'])
+
+
+def stale_task_counters(model, group_by):
+    """
+    (id, stored, counted) of the rows of model whose stored counters
+    differ from a recount, counters in TASK_COUNTER_FIELDS order.
+    """
+    counted = {'counted_' + field: subquery for field, subquery in task_counter_subqueries(group_by).items()}
+    stale = Q()
+    for field in TASK_COUNTER_FIELDS:
+        stale |= ~Q(**{field: F('counted_' + field)})
+    rows = model.objects.annotate(**counted).filter(stale).order_by('id')
+    for row in rows.values_list('id', *(TASK_COUNTER_FIELDS + tuple(counted))):
+        yield row[0], row[1 : len(TASK_COUNTER_FIELDS) + 1], row[len(TASK_COUNTER_FIELDS) + 1 :]
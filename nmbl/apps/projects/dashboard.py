@@ -0,0 +1,255 @@
+import datetime
+from datetime import timedelta
+
+from authentication.models import GroupAndPermission, User
+from base.db.localtime import daily_counts, local_now, next_local_midnight
+from celery import shared_task
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import DashboardRollup, ObjectVisibility, Project, Task, WorkGroup, Workflow
+from .statistics import CLOSED_TASK_STATUSES, conditional_counts, task_importance_counts, task_totals, visible_objects
+from .visibility import VISIBILITY_MODELS
+
+DASHBOARD_SECTIONS = ('task', 'workflow', 'project', 'assigned_task', 'upcoming_week')
+# sections kept in the users' DashboardRollup
+DASHBOARD_ROLLUP_SECTIONS = ('task', 'assigned_task', 'upcoming_week')
+# seconds to wait for further changes before refreshing, saves in a row are refreshed together
+DASHBOARD_ROLLUP_DELAY = 10
+DASHBOARD_ROLLUP_LOCK_TIMEOUT = 60 * 5
+# fields the rollups count the objects on
+DASHBOARD_COUNTED_FIELDS = {
+    'project': ('status', 'due_date'),
+    'workflow': ('status', 'due_date'),
+    'task': ('status', 'importance', 'due_date'),
+}
+# fields deciding which users count the objects, the assignments are m2m_changed
+DASHBOARD_VISIBILITY_FIELDS = {
+    'project': ('organization', 'owner', 'created_by', 'is_private'),
+    'workflow': ('organization', 'owner', 'created_by', 'is_private'),
+    'task': ('organization', 'assigned_to', 'created_by', 'is_private'),
+}
+
+
+class DashboardSummary(object):
+    """
+    Dashboard widgets of a user built on the same visible project, workflow
+    and task sets, permissions are resolved once for all of them. Each
+    section returns the body of the statistics endpoint it replaces.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.date_today = datetime.datetime.utcnow().date()
+
+    @cached_property
+    def tasks(self):
+        return visible_objects(self.user, 'task')
+
+    @cached_property
+    def workflows(self):
+        return visible_objects(self.user, 'workflow')
+
+    @cached_property
+    def projects(self):
+        return visible_objects(self.user, 'project')
+
+    def task(self):
+        return task_importance_counts(self.tasks, self.date_today)
+
+    def workflow(self):
+        tasks = self.tasks.filter(workflow_id__in=self.workflows.values('id'))
+        return dict(total_workflow=self.workflows.count(), **task_totals(tasks, self.date_today))
+
+    def project(self):
+        workflows = self.workflows.filter(project_id__in=self.projects.values('id'))
+        tasks = self.tasks.filter(workflow_id__in=workflows.values('id'))
+        return dict(
+            total_project=self.projects.count(),
+            total_workflow=workflows.count(),
+            **task_totals(tasks, self.date_today)
+        )
+
+    def assigned_task(self):
+        my_work_group = WorkGroup.objects.filter(group_members=self.user).values('id')
+        my_group_member = WorkGroup.objects.filter(id__in=my_work_group).values('group_members__id')
+        # subquery so the workgroup join doesn't repeat the rows of the other counts
+        our_task_ids = Task.objects.filter(assigned_to_group__in=my_work_group).values('id')
+        return conditional_counts(
+            self.tasks,
+            my_task=Q(assigned_to=self.user),
+            our_task=Q(id__in=our_task_ids) & ~Q(assigned_to=self.user),
+            their_task=Q(assigned_to__id__in=my_group_member) & ~Q(assigned_to=self.user),
+        )
+
+    def upcoming_week(self, zone):
+        """
+        Due projects, workflows and tasks of the next seven days of the
+        client zone, see base.db.localtime.
+        """
+        first_day = local_now(zone).date() + timedelta(1)
+        projects = daily_counts(
+            Project.objects.visible_to(self.user).exclude(status__in=[2, 3]), 'due_date', zone, first_day, 7
+        )
+        workflows = daily_counts(
+            Workflow.objects.visible_to(self.user).exclude(status__in=[2, 3]), 'due_date', zone, first_day, 7
+        )
+        tasks = daily_counts(self.tasks.exclude(status__in=CLOSED_TASK_STATUSES), 'due_date', zone, first_day, 7)
+        return [
+            {str(day): {'project': project_count, 'workflow': workflow_count, 'task': task_count}}
+            for (day, project_count), (_, workflow_count), (_, task_count) in zip(projects, workflows, tasks)
+        ]
+
+
+def dashboard_valid_until(zone):
+    """
+    Next midnight in utc or in the client zone, the due today and
+    upcoming week buckets move on at either.
+    """
+    return min(next_local_midnight(timedelta(0)), next_local_midnight(zone))
+
+
+def rollup_zone(rollup):
+    return rollup.timezone or timedelta(minutes=rollup.offset_time)
+
+
+def refresh_dashboard_rollup(user, zone=None):
+    """
+    Recompute the rollup sections of user, stored unless the rollup was
+    expired again meanwhile.
+    """
+    rollup, created = DashboardRollup.objects.get_or_create(user=user)
+    if zone is None:
+        zone = rollup_zone(rollup)
+    dashboard = DashboardSummary(user)
+    data = {
+        'task': dashboard.task(),
+        'assigned_task': dashboard.assigned_task(),
+        'upcoming_week': dashboard.upcoming_week(zone),
+    }
+    if isinstance(zone, timedelta):
+        zone_fields = {'timezone': '', 'offset_time': int(zone.total_seconds() // 60)}
+    else:
+        zone_fields = {'timezone': zone, 'offset_time': 0}
+    DashboardRollup.objects.filter(id=rollup.id, version=rollup.version).update(
+        data=data,
+        computed_version=rollup.version,
+        valid_until=dashboard_valid_until(zone),
+        modified_at=timezone.now(),
+        **zone_fields
+    )
+    return data
+
+
+def load_dashboard_rollup(user, zone=None):
+    """
+    Rollup sections of user, recomputed when stale, past their day or
+    computed for another zone.
+    """
+    rollup = DashboardRollup.objects.filter(user=user).first()
+    if (
+        rollup is not None
+        and rollup.computed_version == rollup.version
+        and rollup.valid_until > timezone.now()
+        and zone in [None, rollup_zone(rollup)]
+    ):
+        return rollup.data
+    return refresh_dashboard_rollup(user, zone)
+
+
+def dashboard_rollup_user_ids(object_type, object_ids):
+    """
+    Users with a rollup which may count the objects, the related users
+    and the users of the company with the view-all permission.
+    """
+    companies = VISIBILITY_MODELS[object_type].objects.filter(id__in=object_ids).values('organization_id')
+    view_all_groups = GroupAndPermission.objects.filter(
+        company_id__in=companies, permission__slug='{0}_{0}-view-all'.format(object_type), has_permission=True
+    ).values('group_id')
+    related_users = ObjectVisibility.objects.filter(object_type=object_type, object_id__in=object_ids)
+    return set(
+        DashboardRollup.objects.filter(
+            Q(user_id__in=related_users.values('user_id'))
+            | Q(user__company_id__in=companies, user__group_id__in=view_all_groups)
+        ).values_list('user_id', flat=True)
+    )
+
+
+def workgroup_rollup_user_ids(workgroup_ids):
+    """
+    Users with a rollup whose our/their task counts follow the members of the workgroups.
+    """
+    members = WorkGroup.objects.filter(id__in=workgroup_ids).values('group_members__id')
+    return set(DashboardRollup.objects.filter(user_id__in=members).values_list('user_id', flat=True))
+
+
+def dashboard_changed_fields(instance, update_fields=None):
+    """
+    Counted and visibility fields of instance its save changes, None
+    for an object not saved yet.
+    """
+    object_type = instance._meta.model_name
+    fields = DASHBOARD_COUNTED_FIELDS[object_type] + DASHBOARD_VISIBILITY_FIELDS[object_type]
+    if instance.pk is None:
+        return None
+    if update_fields is not None:
+        fields = [field for field in fields if field in update_fields]
+        if not fields:
+            return set()
+    attnames = {field: instance._meta.get_field(field).attname for field in fields}
+    previous = type(instance).objects.filter(pk=instance.pk).values(*attnames.values()).first()
+    if previous is None:
+        return None
+    return {field for field, attname in attnames.items() if getattr(instance, attname) != previous[attname]}
+
+
+def dashboard_visibility_changed(object_type, changed_fields):
+    return changed_fields is None or bool(set(changed_fields) & set(DASHBOARD_VISIBILITY_FIELDS[object_type]))
+
+
+def _refresh_lock_key():
+    return 'dashboard_rollups_refresh:{}'.format(connection.schema_name)
+
+
+def schedule_dashboard_rollups_refresh():
+    # one refresh of the tenant per delay, it covers every rollup expired meanwhile
+    if cache.add(_refresh_lock_key(), True, DASHBOARD_ROLLUP_LOCK_TIMEOUT):
+        refresh_stale_dashboard_rollups.apply_async(countdown=DASHBOARD_ROLLUP_DELAY)
+
+
+def expire_dashboard_rollups(user_ids):
+    """
+    Mark the rollups of the users stale, they are recomputed together
+    DASHBOARD_ROLLUP_DELAY after the change is committed.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    DashboardRollup.objects.filter(user_id__in=user_ids).update(version=F('version') + 1)
+    transaction.on_commit(schedule_dashboard_rollups_refresh)
+
+
+@shared_task
+def refresh_stale_dashboard_rollups():
+    # changes committed from now on schedule another refresh
+    cache.delete(_refresh_lock_key())
+    user_ids = DashboardRollup.objects.filter(
+        Q(computed_version__lt=F('version')) | Q(computed_version__isnull=True)
+    ).values('user_id')
+    for user in User.objects.select_related('group', 'company').filter(id__in=user_ids):
+        refresh_dashboard_rollup(user)
+
+
+def refresh_expired_dashboard_rollups():
+    """
+    Recompute the rollups whose day ended, and the stale ones whose
+    refresh didn't run.
+    """
+    user_ids = DashboardRollup.objects.filter(
+        Q(valid_until__lte=timezone.now()) | Q(valid_until__isnull=True) | Q(computed_version__lt=F('version'))
+    ).values('user_id')
+    for user in User.objects.select_related('group', 'company').filter(id__in=user_ids):
+        refresh_dashboard_rollup(user)
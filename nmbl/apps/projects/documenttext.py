@@ -0,0 +1,152 @@
+"""
+Text of the uploaded documents for the global search.
+
+The text of PDF, DOCX, TXT and Outlook MSG documents is read by a celery
+task once the attachment is saved with a new file, and stored capped to
+DOCUMENT_TEXT_MAX_LENGTH in Attachment.document_text, part of the
+document search_vector. document_text_status tells whether the document
+is still to be read, the extract_document_texts command reads the
+pending ones. PDF and MSG need pdfminer.six and extract-msg, without
+them those documents are left unsupported.
+"""
+import io
+import logging
+import os
+import zipfile
+
+import chardet
+from celery import shared_task
+from defusedxml import ElementTree
+from django.db import transaction
+
+from .models import Attachment
+from .searchindex import refresh_search_index
+
+try:
+    from pdfminer.high_level import extract_text as pdf_extract_text
+except ImportError:
+    pdf_extract_text = None
+
+try:
+    import extract_msg
+except ImportError:
+    extract_msg = None
+
+logger = logging.getLogger(__name__)
+
+# characters kept, well under the 1MB a tsvector can hold
+DOCUMENT_TEXT_MAX_LENGTH = 256 * 1024
+# larger files aren't read
+DOCUMENT_TEXT_MAX_FILE_SIZE = 50 * 1024 * 1024
+DOCUMENT_TEXT_MAX_PAGES = 500
+DOCUMENT_TEXT_BATCH_SIZE = 20
+
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def _pdf_text(content):
+    return pdf_extract_text(io.BytesIO(content), maxpages=DOCUMENT_TEXT_MAX_PAGES)
+
+
+def _docx_text(content):
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        info = archive.getinfo('word/document.xml')
+        if info.file_size > DOCUMENT_TEXT_MAX_FILE_SIZE:
+            raise ValueError('word/document.xml is {} bytes'.format(info.file_size))
+        root = ElementTree.fromstring(archive.read(info))
+    return '\n'.join(
+        ''.join(text.text or '' for text in paragraph.iter(WORD_NAMESPACE + 't'))
+        for paragraph in root.iter(WORD_NAMESPACE + 'p')
+    )
+
+
+def _txt_text(content):
+    content = content[: DOCUMENT_TEXT_MAX_LENGTH * 4]
+    try:
+        return content.decode('utf-8')
+    except UnicodeDecodeError:
+        encoding = chardet.detect(content[: 64 * 1024])['encoding'] or 'latin-1'
+        return content.decode(encoding, errors='replace')
+
+
+def _msg_text(content):
+    message = extract_msg.Message(content)
+    try:
+        return '\n'.join(
+            value for value in [message.subject, message.sender, message.to, message.cc, message.body] if value
+        )
+    finally:
+        message.close()
+
+
+# extension -> reader of the file content, None when its library isn't installed
+DOCUMENT_TEXT_READERS = {
+    'pdf': _pdf_text if pdf_extract_text else None,
+    'docx': _docx_text,
+    'txt': _txt_text,
+    'msg': _msg_text if extract_msg else None,
+}
+
+
+def capped_text(text):
+    """
+    text without the NUL characters postgres can't store, cut before
+    DOCUMENT_TEXT_MAX_LENGTH without splitting the last word.
+    """
+    text = text.replace('\x00', '')
+    if len(text) > DOCUMENT_TEXT_MAX_LENGTH:
+        parts = text[: DOCUMENT_TEXT_MAX_LENGTH + 1].rsplit(None, 1)
+        text = parts[0] if len(parts) == 2 else text[:DOCUMENT_TEXT_MAX_LENGTH]
+    return text
+
+
+def document_text(attachment):
+    """
+    (document_text_status, text) of the attachment's file.
+    """
+    if not attachment.document:
+        return Attachment.TEXT_UNSUPPORTED, ''
+    extension = os.path.splitext(attachment.document.name)[1].lstrip('.').lower()
+    reader = DOCUMENT_TEXT_READERS.get(extension)
+    if reader is None:
+        return Attachment.TEXT_UNSUPPORTED, ''
+    try:
+        if attachment.document.size > DOCUMENT_TEXT_MAX_FILE_SIZE:
+            return Attachment.TEXT_UNSUPPORTED, ''
+        with attachment.document.open('rb') as document:
+            content = document.read()
+        return Attachment.TEXT_EXTRACTED, capped_text(reader(content) or '')
+    except Exception:
+        logger.exception('Reading the text of attachment %s failed', attachment.pk)
+        return Attachment.TEXT_FAILED, ''
+
+
+def store_document_text(attachment):
+    """
+    Read and store the text of attachment, unless its file was replaced
+    meanwhile, and index it.
+    """
+    status, text = document_text(attachment)
+    attachments = Attachment.objects.filter(pk=attachment.pk)
+    if attachment.document:
+        attachments = attachments.filter(document=attachment.document.name)
+    if attachments.update(document_text=text, document_text_status=status):
+        refresh_search_index('document', [attachment.pk])
+    return status
+
+
+@shared_task
+def extract_document_texts(attachment_ids):
+    """
+    Read the text of the pending attachments of attachment_ids, returns
+    how many ended in each document_text_status.
+    """
+    statuses = {}
+    for attachment in Attachment.objects.filter(id__in=attachment_ids, document_text_status=Attachment.TEXT_PENDING):
+        status = str(store_document_text(attachment))
+        statuses[status] = statuses.get(status, 0) + 1
+    return statuses
+
+
+def schedule_document_text(attachment_id):
+    transaction.on_commit(lambda: extract_document_texts.delay([attachment_id]))
@@ -2,7 +2,7 @@ from django.shortcuts import get_object_or_404
 from rest_framework import permissions
 from rest_framework.permissions import SAFE_METHODS
 
-from authentication.models import GroupAndPermission
+from authentication.permission_snapshot import permission_snapshot
 from customers.features.models import FeatureName, Feature
 from ..models import GlobalCustomField
 
@@ -48,13 +48,7 @@ class BaseGlobalCustomFieldPermission(permissions.BasePermission):
         permission_category = model._meta.model_name
         method_name = view.action
         slug = self.get_slug_by_method(permission_category, method_name)
-        group_permission = GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category=permission_category,
-            permission__slug=slug,
-            has_permission=True
-        ).exists()
+        group_permission = permission_snapshot(group, company).has(slug)
         return group_permission
 
     @staticmethod
@@ -0,0 +1,96 @@
+"""
+Paging and streaming of the global search results.
+
+Each result type is a keyset page of its own. The first request returns
+the first page of every type, and ``pagination.<type>.next`` loads more
+of that type alone, with the same search and filters plus ``more`` and
+``cursor``. Totals are only counted on ``count=exact`` or
+``count=estimate``, see base.api.pagination. ``stream=true`` writes every
+row of the requested types instead, serialized in chunks as they're read.
+"""
+from collections import OrderedDict
+
+from base.api.pagination import RankCursorPagination
+from base.api.renderers import FastJSONRenderer
+from django.http import StreamingHttpResponse
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+SEARCH_STREAM_CHUNK = 500
+
+
+class SearchResultPagination(RankCursorPagination):
+    """
+    Keyset pagination of the results of one type, the cursor of the
+    request is this type's when more names it.
+    """
+
+    more_query_param = 'more'
+    max_limit = 100
+
+    def __init__(self, object_type):
+        self.object_type = object_type
+
+    def use_cursor(self, request):
+        return True
+
+    def decode_cursor(self, request):
+        if request.query_params.get(self.more_query_param) != self.object_type:
+            return None
+        return super(SearchResultPagination, self).decode_cursor(request)
+
+    def get_next_link(self):
+        url = super(SearchResultPagination, self).get_next_link()
+        if url is None:
+            return None
+        return replace_query_param(remove_query_param(url, 'stream'), self.more_query_param, self.object_type)
+
+    def get_page_info(self):
+        info = OrderedDict()
+        if self.count is not None:
+            info['count'] = self.count
+        info['next'] = self.get_next_link()
+        return info
+
+
+def paginate_search_results(results, request, view=None):
+    """
+    {type: first page data, 'pagination': {type: {count, next}}} of the
+    results, [(type, queryset, serializer class, context)].
+    """
+    response = OrderedDict()
+    pagination = OrderedDict()
+    for object_type, queryset, serializer_class, context in results:
+        paginator = SearchResultPagination(object_type)
+        page = paginator.paginate_queryset(queryset, request, view)
+        # a context of its own, the list serializers keep the loader of their page in it
+        response[object_type] = serializer_class(page, many=True, context=dict(context)).data
+        pagination[object_type] = paginator.get_page_info()
+    response['pagination'] = pagination
+    return response
+
+
+def _stream_search_results(results):
+    renderer = FastJSONRenderer()
+    yield b'{'
+    for n, (object_type, queryset, serializer_class, context) in enumerate(results):
+        yield (b',' if n else b'') + renderer.render(object_type) + b':['
+        chunk = []
+        separator = b''
+        for item in queryset.iterator(chunk_size=SEARCH_STREAM_CHUNK):
+            chunk.append(item)
+            if len(chunk) == SEARCH_STREAM_CHUNK:
+                yield separator + renderer.render(serializer_class(chunk, many=True, context=dict(context)).data)[1:-1]
+                separator = b','
+                chunk = []
+        if chunk:
+            yield separator + renderer.render(serializer_class(chunk, many=True, context=dict(context)).data)[1:-1]
+        yield b']'
+    yield b'}'
+
+
+def stream_search_results(results):
+    """
+    Response writing every row of the results as {type: [...]}, the
+    rows are read and serialized SEARCH_STREAM_CHUNK at a time.
+    """
+    return StreamingHttpResponse(_stream_search_results(results), content_type='application/json')
@@ -2,7 +2,8 @@ import datetime
 import logging
 from urllib.parse import urlparse
 
-from authentication.models import GroupAndPermission, Organization, User
+from authentication.models import Organization, User
+from authentication.permission_snapshot import permission_snapshot
 from base.services.postmark import PostmarkInbound
 from celery import shared_task
 from django.conf import settings
@@ -10,12 +11,14 @@ from django.contrib.contenttypes.models import ContentType
 from django.core.files import File
 from django.core.files.storage import default_storage
 from django.core.mail import EmailMessage
-from django.db.models import Q
 from django.http import Http404, JsonResponse
 from django.template.loader import get_template
 from django.utils.crypto import get_random_string
 from notifications.utils import send_user_notification
 
+from .authorization import has_object_permissions, permitted_objects
+from .counters import refresh_task_counters
+from .dashboard import dashboard_rollup_user_ids, expire_dashboard_rollups
 from .models import (
     Attachment,
     AuditHistory,
@@ -53,6 +56,20 @@ def email_with_site_domain(mailbox_name):
     return mailbox_name + "@" + domain_name
 
 
+def expire_project_rollups(workflow_ids, task_ids):
+    """
+    Expire the dashboard rollups counting the workflows and tasks
+    changed by a bulk update, which sends no signal.
+    """
+    workflow_ids, task_ids = list(workflow_ids), list(task_ids)
+    user_ids = set()
+    if workflow_ids:
+        user_ids |= dashboard_rollup_user_ids('workflow', workflow_ids)
+    if task_ids:
+        user_ids |= dashboard_rollup_user_ids('task', task_ids)
+    expire_dashboard_rollups(user_ids)
+
+
 def complete_project(project, user):
     """
     This is to complete project related task and workflow
@@ -64,7 +81,9 @@ def complete_project(project, user):
         for workflow_id in workflow_ids:
             AuditHistoryCreate("workflow", workflow_id, user, "Marked Completed on")
     Task.objects.filter(workflow__project=project).update(status=3)
+    refresh_task_counters(project_ids=[project.id])
     task_ids = list(Task.objects.filter(workflow__project=project).values_list('id', flat=True))
+    expire_project_rollups(workflow_ids, task_ids)
     if task_ids:
         for task_id in task_ids:
             AuditHistoryCreate("task", task_id, user, "Marked Completed on")
@@ -76,7 +95,9 @@ def complete_workflow(workflow, user):
     :return:
     """
     workflow.task_workflow.update(status=3)
+    refresh_task_counters(workflow_ids=[workflow.id])
     task_ids = list(Task.objects.filter(workflow=workflow).values_list('id', flat=True))
+    expire_project_rollups([], task_ids)
     if task_ids:
         for task_id in task_ids:
             AuditHistoryCreate("task", task_id, user, "Marked Completed on")
@@ -91,6 +112,11 @@ def archive_project(project):
     """
     project.workflow_assigned_project.update(status=3)
     Task.objects.filter(workflow__project=project).update(status=4)
+    refresh_task_counters(project_ids=[project.id])
+    expire_project_rollups(
+        Workflow.objects.filter(project=project).values_list('id', flat=True),
+        Task.objects.filter(workflow__project=project).values_list('id', flat=True),
+    )
 
 
 def archive_workflow(workflow):
@@ -99,6 +125,8 @@ def archive_workflow(workflow):
     :return:
     """
     workflow.task_workflow.update(status=4)
+    refresh_task_counters(workflow_ids=[workflow.id])
+    expire_project_rollups([], workflow.task_workflow.values_list('id', flat=True))
 
 
 def task_assigned_notification(task):
@@ -515,6 +543,19 @@ def AuditHistoryCreate(model_reference, model_id, by_user, change_message, model
         )
 
 
+@shared_task
+def audit_viewed_by_task(model_reference, model_id, by_user):
+    AuditHistoryCreate(model_reference, model_id, by_user, "Viewed By")
+
+
+def audit_viewed_by(model_reference, model_id, by_user):
+    """
+    Audit a detail view from the worker, one "Viewed By" row per request
+    whether the detail is sent or answered with 304.
+    """
+    audit_viewed_by_task.delay(model_reference, model_id, by_user)
+
+
 def handle_webhook_task_inbound(data):
     postmark_obj = PostmarkInbound(json=data)
     from_email = postmark_obj.sender.get('Email').lower()
@@ -526,13 +567,7 @@ def handle_webhook_task_inbound(data):
         group = user.group
         permission_category = 'task'
         slug = permission_category + "_" + permission_category + '-create'
-        group_permission = GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category=permission_category,
-            permission__slug=slug,
-            has_permission=True,
-        ).exists()
+        group_permission = permission_snapshot(group, company).has(slug)
         if not group_permission:
             return
         post_data = {
@@ -633,13 +668,7 @@ def handle_webhook_project_inbound(data):
         # print(postmark_obj.attachments)
         permission_category = 'project'
         slug = permission_category + "_" + permission_category + '-create'
-        group_permission = GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category=permission_category,
-            permission__slug=slug,
-            has_permission=True,
-        ).exists()
+        group_permission = permission_snapshot(group, company).has(slug)
         if not group_permission:
             return
         post_data = {
@@ -714,13 +743,7 @@ def handle_webhook_workflow_inbound(data):
         # print(postmark_obj.attachments)
         permission_category = 'workflow'
         slug = permission_category + "_" + permission_category + '-create'
-        group_permission = GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category=permission_category,
-            permission__slug=slug,
-            has_permission=True,
-        ).exists()
+        group_permission = permission_snapshot(group, company).has(slug)
         if not group_permission:
             return
         post_data = {
@@ -1080,13 +1103,9 @@ def attachment_copy_or_move(destination_id, destination_type, source_id, source_
 def user_permission_check(user, model):
     view_all_slug = model + '_' + model + '-view-all'
     view_mine_slug = model + '_' + model + '-view'
-    if GroupAndPermission.objects.filter(
-        group=user.group, company=user.company, has_permission=True, permission__slug=view_all_slug
-    ).exists():
+    if permission_snapshot(user.group, user.company).has(view_all_slug):
         return True
-    elif GroupAndPermission.objects.filter(
-        group=user.group, company=user.company, has_permission=True, permission__slug=view_mine_slug
-    ).exists():
+    elif permission_snapshot(user.group, user.company).has(view_mine_slug):
         return False
     else:
         raise Http404
@@ -1097,44 +1116,7 @@ def user_has_object_permission(model, instance_id, user):
     Function checks if the user is authorized
     to access the resource.
     """
-    permission_count = 0
-    if model == "task":
-        if (
-            Task.objects.filter(
-                Q(organization=user.company),
-                Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
-            )
-            .filter(id=instance_id)
-            .exists()
-        ):
-            permission_count += 1
-    elif model == "workflow":
-        if (
-            Workflow.objects.filter(
-                Q(organization=user.company),
-                Q(owner=user)
-                | Q(assigned_to_users=user)
-                | Q(created_by=user)
-                | Q(assigned_to_group__group_members=user),
-            )
-            .filter(id=instance_id)
-            .exists()
-        ):
-            permission_count += 1
-    elif model == "project":
-        if (
-            Project.objects.filter(
-                Q(organization=user.company),
-                Q(owner=user)
-                | Q(assigned_to_users=user)
-                | Q(created_by=user)
-                | Q(assigned_to_group__group_members=user),
-            )
-            .filter(id=instance_id)
-            .exists()
-        ):
-            permission_count += 1
-    return permission_count
+    return len(permitted_objects(user, [(model, instance_id)], scope='related'))
 
 
 def user_object_permission(model, instance_id, user):
@@ -1142,24 +1124,7 @@ def user_object_permission(model, instance_id, user):
     Function checks if the user is authorized
     to access the resource.
     """
-    permission_count = 0
-    if model == "task":
-        q_obj = Q()
-        q_obj.add(
-            Q(is_private=True, organization=user.company)
-            & Q(Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user)),
-            Q.OR,
-        )
-        q_obj.add(Q(is_private=False, organization=user.company), Q.OR)
-        if Task.objects.filter(q_obj).filter(id=instance_id).exists():
-            permission_count += 1
-    elif model == "workflow":
-        if Workflow.objects.filter(organization=user.company, id=instance_id).exists():
-            permission_count += 1
-    elif model == "project":
-        if Project.objects.filter(organization=user.company, id=instance_id).exists():
-            permission_count += 1
-    return permission_count
+    return len(permitted_objects(user, [(model, instance_id)], scope='company'))
 
 
 def user_attachment_authorization_permission(source_type, source_id, destination_type, destination_id, user):
@@ -1167,34 +1132,23 @@ def user_attachment_authorization_permission(source_type, source_id, destination
     destination_view_all_slug = destination_type + '_' + destination_type + '-view-all'
     source_mine_slug = source_type + '_' + source_type + '-view'
     destination_mine_slug = destination_type + '_' + destination_type + '-view'
+    objects = [(source_type, source_id), (destination_type, destination_id)]
     # Return true if the user has view all permission
     # for both source and destination.
     if (
-        GroupAndPermission.objects.filter(
-            group=user.group, company=user.company, has_permission=True, permission__slug=source_view_all_slug
-        ).exists()
-        and GroupAndPermission.objects.filter(
-            group=user.group, company=user.company, has_permission=True, permission__slug=destination_view_all_slug
-        ).exists()
+        permission_snapshot(user.group, user.company).has(source_view_all_slug)
+        and permission_snapshot(user.group, user.company).has(destination_view_all_slug)
     ):
-        soucre_permission_count = user_object_permission(source_type, source_id, user)
-        destination_permission_count = user_object_permission(destination_type, destination_id, user)
-        if soucre_permission_count + destination_permission_count == 2:
+        if has_object_permissions(user, objects, scope='company'):
             return True
     # Else check if the user has view-mine permissions and
     # return if exists
     # forboth source and destination.
     elif (
-        GroupAndPermission.objects.filter(
-            group=user.group, company=user.company, has_permission=True, permission__slug=source_mine_slug
-        ).exists()
-        and GroupAndPermission.objects.filter(
-            group=user.group, company=user.company, has_permission=True, permission__slug=destination_mine_slug
-        ).exists()
+        permission_snapshot(user.group, user.company).has(source_mine_slug)
+        and permission_snapshot(user.group, user.company).has(destination_mine_slug)
     ):
-        soucre_permission_count = user_has_object_permission(source_type, source_id, user)
-        destination_permission_count = user_has_object_permission(destination_type, destination_id, user)
-        if soucre_permission_count + destination_permission_count == 2:
+        if has_object_permissions(user, objects, scope='related'):
             return True
     else:
         return False
@@ -3263,33 +3217,11 @@ def task_message_inbound_webhook(data, inbound_email):
     if user:
         company = user.company
         group = user.group
-        if GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='task_task-view-all'
-        ).exists():
-            q_obj = Q()
-            q_obj.add(
-                Q(is_private=True, organization=company)
-                & Q(Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user)),
-                Q.OR,
-            )
-            q_obj.add(Q(is_private=False, organization=company), Q.OR)
-            t_qset = Task.objects.filter(q_obj).distinct('id')
-        elif GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='task_task-view'
-        ).exists():
-            t_qset = Task.objects.filter(
-                Q(organization=company),
-                Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
-            ).distinct('id')
+        if permission_snapshot(group, company).has_any('task_task-view-all', 'task_task-view'):
+            t_qset = Task.objects.visible_to(user)
         else:
             return JsonResponse({'status': 'ok'})
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            permission__slug='task_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('task_view-archived'):
             t_qset = t_qset.exclude(status__in=[3, 4])
         task_obj = t_qset.filter(id=task_id).first()
         if task_obj:
@@ -3349,29 +3281,11 @@ def workflow_message_inbound_webhook(data, inbound_email):
     if user:
         company = user.company
         group = user.group
-        if GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='workflow_workflow-view-all'
-        ).exists():
-            w_qset = Workflow.objects.filter(organization=company)
-        elif GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='workflow_workflow-view'
-        ).exists():
-            w_qset = Workflow.objects.filter(
-                Q(organization=company),
-                Q(owner=user)
-                | Q(assigned_to_users=user)
-                | Q(created_by=user)
-                | Q(assigned_to_group__group_members=user),
-            ).distinct('id')
+        if permission_snapshot(group, company).has_any('workflow_workflow-view-all', 'workflow_workflow-view'):
+            w_qset = Workflow.objects.visible_to(user)
         else:
             return JsonResponse({'status': 'ok'})
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='workflow',
-            permission__slug='workflow_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('workflow_view-archived'):
             w_qset = w_qset.exclude(status__in=[2, 3])
         workflow_obj = w_qset.filter(id=workflow_id).first()
         if workflow_obj:
@@ -3431,30 +3345,11 @@ def project_message_inbound_webhook(data, inbound_email):
     if user:
         company = user.company
         group = user.group
-        if GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='project_project-view-all'
-        ).exists():
-            p_qset = Project.objects.filter(organization=company)
-        elif GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='project_project-view'
-        ).exists():
-            p_qset = Project.objects.filter(
-                Q(organization=company),
-                Q(owner=user)
-                | Q(assigned_to_users=user)
-                | Q(created_by=user)
-                | Q(assigned_to_group__group_members=user),
-            ).distinct('id')
+        if permission_snapshot(group, company).has_any('project_project-view-all', 'project_project-view'):
+            p_qset = Project.objects.visible_to(user)
         else:
             return JsonResponse({'status': 'ok'})
-            pass
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='project',
-            permission__slug='project_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('project_view-archived'):
             p_qset = p_qset.exclude(status__in=[2, 3])
         project_obj = p_qset.filter(id=project_id).first()
         if project_obj:
@@ -0,0 +1,139 @@
+import copy
+
+from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+from .ranking import (
+    RANK_OBJECT_FIELDS,
+    lazy_rank_ordering,
+    lazy_ranks,
+    materialized_rank_id,
+    ranks_materialized,
+    visible_rank_objects,
+)
+
+
+def _object_filterset_class(filterset_class, prefix, model):
+    """
+    filterset_class of a rank model rewritten for the object model,
+    filters on rank fields are left out.
+    """
+    declared = {}
+    for name, rank_filter in filterset_class.base_filters.items():
+        if rank_filter.field_name.startswith(prefix):
+            object_filter = copy.deepcopy(rank_filter)
+            object_filter.field_name = rank_filter.field_name[len(prefix) :]
+            declared[name] = object_filter
+    declared['Meta'] = type('Meta', (), {'model': model, 'fields': []})
+    return type(model.__name__ + 'LazyFilterSet', (filters.FilterSet,), declared)
+
+
+class _LazyFilterBackend(filters.DjangoFilterBackend):
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def get_filterset_class(self, view, queryset=None):
+        return _object_filterset_class(view.filterset_class, self.prefix, queryset.model)
+
+
+class _LazySearchFilter(SearchFilter):
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def get_search_fields(self, view, request):
+        return [field.replace(self.prefix, '', 1) for field in super().get_search_fields(view, request)]
+
+
+class _LazyOrderingFilter(OrderingFilter):
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = []
+        for field in self.get_ordering(request, queryset, view) or []:
+            if field.lstrip('-') == 'rank':
+                rank_ordering = lazy_rank_ordering()
+                if field.startswith('-'):
+                    rank_ordering = [expression.copy().reverse_ordering() for expression in rank_ordering]
+                ordering.extend(rank_ordering)
+            else:
+                ordering.append(field.replace(self.prefix, '', 1))
+        if ordering:
+            return queryset.order_by(*ordering)
+        return queryset
+
+
+class LazyRankListMixin(object):
+    """
+    List and retrieve of project/workflow/task viewsets for users whose
+    ranks aren't materialized, objects are listed in the default ordering
+    and serialized through lazy rank instances like stored rank rows.
+    """
+
+    rank_model = None
+    # lookups of the user/group_member and group query params, as in get_queryset
+    member_lookups = ()
+    group_lookup = None
+    # annotations copied from the objects to their lazy ranks
+    lazy_annotations = ()
+
+    def ranks_are_lazy(self):
+        return not ranks_materialized(self.request.user, self.rank_model)
+
+    def get_lazy_queryset(self):
+        queryset = visible_rank_objects(self.rank_model, self.request.user)
+        params = self.request.query_params
+        user_ids = [int(x) for x in params.get('user', '').split(',') if x]
+        group_ids = [int(x) for x in params.get('group', '').split(',') if x]
+        q_obj = Q()
+        if user_ids and params.get('group_member', ''):
+            for lookup in self.member_lookups:
+                q_obj |= Q(**{lookup: user_ids})
+        if group_ids:
+            q_obj |= Q(**{self.group_lookup: group_ids})
+        if q_obj:
+            queryset = queryset.filter(q_obj)
+        return queryset.distinct()
+
+    def filter_lazy_queryset(self, queryset):
+        prefix = RANK_OBJECT_FIELDS[self.rank_model._meta.model_name] + '__'
+        queryset = queryset.order_by(*lazy_rank_ordering())
+        for backend in self.filter_backends:
+            if issubclass(backend, filters.DjangoFilterBackend):
+                queryset = _LazyFilterBackend(prefix).filter_queryset(self.request, queryset, self)
+            elif issubclass(backend, SearchFilter):
+                queryset = _LazySearchFilter(prefix).filter_queryset(self.request, queryset, self)
+            elif issubclass(backend, OrderingFilter):
+                queryset = _LazyOrderingFilter(prefix).filter_queryset(self.request, queryset, self)
+        return queryset
+
+    def lazy_list(self, request):
+        queryset = self.filter_lazy_queryset(self.get_lazy_queryset())
+        page = self.paginate_queryset(queryset)
+        ranks = lazy_ranks(self.rank_model, request.user, page, self.lazy_annotations)
+        serializer = self.get_serializer(ranks, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def get_lazy_rank(self, pk):
+        instance = get_object_or_404(self.get_lazy_queryset(), pk=pk)
+        return lazy_ranks(self.rank_model, self.request.user, [instance], self.lazy_annotations)[0]
+
+
+class MaterializedRankMixin(object):
+    """
+    Rank viewsets accept the negative ids of lazy ranks,
+    the user's ranks are materialized before the rank is updated.
+    """
+
+    rank_model = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        lookup = str(self.kwargs.get(lookup_url_kwarg, ''))
+        if lookup.startswith('-') and lookup[1:].isdigit():
+            self.kwargs[lookup_url_kwarg] = str(
+                materialized_rank_id(self.rank_model, request.user, self.kwargs[lookup_url_kwarg])
+            )
@@ -0,0 +1,109 @@
+import datetime
+from collections import defaultdict
+
+from django.utils.functional import cached_property
+from rest_framework import serializers
+
+from .models import Attachment, Task, Workflow
+from .statistics import grouped_task_counts
+
+
+def _group_by(rows, key):
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[getattr(row, key)].append(row)
+    return grouped
+
+
+class ListPageLoader(object):
+    """
+    Related rows of a page of projects or workflows, each kind loaded
+    for the whole page with one query the first time it is asked for.
+    """
+
+    def __init__(self, project_ids=(), workflow_ids=()):
+        self.project_ids = set(project_ids)
+        self.page_workflow_ids = set(workflow_ids)
+
+    @cached_property
+    def project_workflows(self):
+        return _group_by(Workflow.objects.filter(project_id__in=self.project_ids).order_by('id'), 'project_id')
+
+    @cached_property
+    def workflow_ids(self):
+        workflow_ids = set(self.page_workflow_ids)
+        if self.project_ids:
+            for workflows in self.project_workflows.values():
+                workflow_ids.update(workflow.id for workflow in workflows)
+        return workflow_ids
+
+    @cached_property
+    def workflow_tasks(self):
+        return _group_by(Task.objects.filter(workflow_id__in=self.workflow_ids).order_by('id'), 'workflow_id')
+
+    @cached_property
+    def project_attachments(self):
+        return _group_by(
+            Attachment.objects.active().filter(project_id__in=self.project_ids).order_by('id'), 'project_id'
+        )
+
+    @cached_property
+    def workflow_attachments(self):
+        return _group_by(
+            Attachment.objects.active().filter(workflow_id__in=self.workflow_ids).order_by('id'), 'workflow_id'
+        )
+
+    @cached_property
+    def task_attachments(self):
+        task_ids = [task.id for tasks in self.workflow_tasks.values() for task in tasks]
+        return _group_by(Attachment.objects.active().filter(task_id__in=task_ids).order_by('id'), 'task_id')
+
+
+class TaskCountLoader(object):
+    """
+    Task counts of a page of projects or workflows among tasks, counted
+    for the whole page with one grouped query the first time they are
+    asked for.
+    """
+
+    def __init__(self, tasks, project_ids=(), workflow_ids=()):
+        self.tasks = tasks if tasks is not None else Task.objects.none()
+        self.project_ids = list(project_ids)
+        self.workflow_ids = list(workflow_ids)
+        self.date_today = datetime.datetime.utcnow().date()
+
+    @cached_property
+    def project_task_counts(self):
+        """
+        Counts of the tasks of the workflows of each project, projects
+        without workflows are left out.
+        """
+        counts = grouped_task_counts(self.tasks, 'workflow__project_id', self.project_ids, self.date_today)
+        with_workflows = (
+            Workflow.objects.filter(project_id__in=self.project_ids)
+            .order_by()
+            .values_list('project_id', flat=True)
+            .distinct()
+        )
+        return {
+            project_id: counts.get(project_id, {'total_task': 0, 'completed_task': 0, 'passed_due': 0})
+            for project_id in with_workflows
+        }
+
+    @cached_property
+    def workflow_task_counts(self):
+        return grouped_task_counts(self.tasks, 'workflow_id', self.workflow_ids, self.date_today)
+
+
+class PageLoaderListSerializer(serializers.ListSerializer):
+    """
+    Puts the loader (ListPageLoader, TaskCountLoader) of the page being
+    serialized in the context, the child serializer builds it from the
+    page with page_loader(items).
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        if 'page_loader' not in self._context:
+            self._context['page_loader'] = self.child.page_loader(items)
+        return super(PageLoaderListSerializer, self).to_representation(items)
@@ -0,0 +1,60 @@
+import io
+import json
+import os
+import timeit
+
+from base.api.parsers import FastJSONParser
+from base.api.renderers import FastJSONRenderer, orjson
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the default JSON renderer and parser with the orjson ones on recorded responses, '
+        'paths are JSON response bodies or directories of them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--repeat', type=int, default=20, help='Renders and parses of each response.')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError('orjson is not installed, FastJSONRenderer falls back to the default renderer.')
+        repeat = options['repeat']
+        totals = [0.0, 0.0, 0.0, 0.0]
+        for path in self.response_paths(options['paths']):
+            with open(path, 'rb') as response_file:
+                body = response_file.read()
+            data = json.loads(body.decode('utf-8'))
+            default_body = JSONRenderer().render(data)
+            fast_body = FastJSONRenderer().render(data)
+            if json.loads(default_body.decode('utf-8')) != json.loads(fast_body.decode('utf-8')):
+                self.stdout.write(self.style.ERROR(f'{path}: rendered responses differ'))
+            timings = [
+                timeit.timeit(lambda: JSONRenderer().render(data), number=repeat),
+                timeit.timeit(lambda: FastJSONRenderer().render(data), number=repeat),
+                timeit.timeit(lambda: JSONParser().parse(io.BytesIO(body)), number=repeat),
+                timeit.timeit(lambda: FastJSONParser().parse(io.BytesIO(body)), number=repeat),
+            ]
+            totals = [total + timing for total, timing in zip(totals, timings)]
+            self.write_timings(f'{path} ({len(body)} bytes)', timings, repeat)
+        self.write_timings('total', totals, repeat)
+
+    def response_paths(self, paths):
+        for path in paths:
+            if os.path.isdir(path):
+                for name in sorted(os.listdir(path)):
+                    if name.endswith('.json'):
+                        yield os.path.join(path, name)
+            else:
+                yield path
+
+    def write_timings(self, label, timings, repeat):
+        render, fast_render, parse, fast_parse = [timing * 1000 / repeat for timing in timings]
+        self.stdout.write(
+            f'{label}: render {render:.2f}ms -> {fast_render:.2f}ms ({render / max(fast_render, 1e-9):.1f}x), '
+            f'parse {parse:.2f}ms -> {fast_parse:.2f}ms ({parse / max(fast_parse, 1e-9):.1f}x)'
+        )
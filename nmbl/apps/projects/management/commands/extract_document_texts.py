@@ -0,0 +1,67 @@
+from celery import group
+from customers.models import Client
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context
+
+from ...documenttext import DOCUMENT_TEXT_BATCH_SIZE, extract_document_texts
+from ...models import Attachment
+
+
+class Command(BaseCommand):
+    help = (
+        'Read the text of the pending documents for the search, in batches run in parallel by the celery workers. '
+        'Documents are marked once read, an interrupted run resumes with the ones still pending.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schema', action='append', dest='schemas', help='Tenant schema, every tenant if omitted.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DOCUMENT_TEXT_BATCH_SIZE, help='Documents read by each celery task.'
+        )
+        parser.add_argument('--parallel', type=int, default=8, help='Batches run at the same time.')
+        parser.add_argument('--retry-failed', action='store_true', help='Read the documents that failed again.')
+        parser.add_argument('--inline', action='store_true', help='Read the documents in this process.')
+
+    def handle(self, *args, **options):
+        schema_names = options['schemas']
+        if not schema_names:
+            with schema_context('public'):
+                schema_names = list(Client.objects.exclude(schema_name='public').values_list('schema_name', flat=True))
+        for schema_name in schema_names:
+            with schema_context(schema_name):
+                self.extract_schema(schema_name, options)
+        self.stdout.write(self.style.SUCCESS('Document texts are up to date.'))
+
+    def extract_schema(self, schema_name, options):
+        if options['retry_failed']:
+            Attachment.objects.filter(document_text_status=Attachment.TEXT_FAILED).update(
+                document_text_status=Attachment.TEXT_PENDING
+            )
+        batch_size = max(1, options['batch_size'])
+        status_names = dict(Attachment.TEXT_STATUS_CHOICES)
+        totals = {}
+        checkpoint = 0
+        while True:
+            # each round starts after the last one, documents left pending aren't read twice
+            attachment_ids = list(
+                Attachment.objects.filter(document_text_status=Attachment.TEXT_PENDING, id__gt=checkpoint)
+                .order_by('id')
+                .values_list('id', flat=True)[: batch_size * max(1, options['parallel'])]
+            )
+            if not attachment_ids:
+                break
+            batches = [attachment_ids[n : n + batch_size] for n in range(0, len(attachment_ids), batch_size)]
+            if options['inline']:
+                results = [extract_document_texts(batch) for batch in batches]
+            else:
+                results = group(extract_document_texts.s(batch) for batch in batches).apply_async().get()
+            for statuses in results:
+                for status, count in statuses.items():
+                    totals[int(status)] = totals.get(int(status), 0) + count
+            checkpoint = attachment_ids[-1]
+            self.stdout.write(
+                f'{schema_name}: read up to attachment {checkpoint}, '
+                + ', '.join(f'{status_names[status]} {count}' for status, count in sorted(totals.items()))
+            )
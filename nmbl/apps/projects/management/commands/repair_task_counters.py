@@ -0,0 +1,54 @@
+from customers.models import Client
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django_tenants.utils import schema_context
+
+from ...counters import refresh_task_counters, stale_task_counters
+from ...models import Project, Workflow
+from ...models.taskcounters import TASK_COUNTER_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Verify the task counters of projects and workflows against their tasks, --fix recounts the stale ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schema', action='append', dest='schemas', help='Tenant schema, every tenant if omitted.'
+        )
+        parser.add_argument('--fix', action='store_true', help='Recount the stale counters.')
+
+    def handle(self, *args, **options):
+        schema_names = options['schemas']
+        if not schema_names:
+            with schema_context('public'):
+                schema_names = list(Client.objects.exclude(schema_name='public').values_list('schema_name', flat=True))
+        stale_total = 0
+        for schema_name in schema_names:
+            with schema_context(schema_name):
+                stale_total += self.check_schema(schema_name, options['fix'])
+        if not stale_total:
+            self.stdout.write(self.style.SUCCESS('Task counters are up to date.'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Recounted {stale_total} stale task counters.'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{stale_total} stale task counters, run with --fix to recount.'))
+
+    def check_schema(self, schema_name, fix):
+        stale = {}
+        for model_name, model, group_by in [
+            ('workflow', Workflow, 'workflow'),
+            ('project', Project, 'workflow__project'),
+        ]:
+            stale[model_name] = []
+            for object_id, stored, counted in stale_task_counters(model, group_by):
+                stale[model_name].append(object_id)
+                differences = ', '.join(
+                    f'{field} {stored_value} != {counted_value}'
+                    for field, stored_value, counted_value in zip(TASK_COUNTER_FIELDS, stored, counted)
+                    if stored_value != counted_value
+                )
+                self.stdout.write(f'{schema_name}: {model_name} {object_id}: {differences}')
+        if fix and (stale['workflow'] or stale['project']):
+            with transaction.atomic():
+                refresh_task_counters(workflow_ids=stale['workflow'], project_ids=stale['project'])
+        return len(stale['workflow']) + len(stale['project'])
@@ -0,0 +1,73 @@
+# Generated by Django 2.2.17 on 2021-12-20 10:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BACKFILL_SQL = """
+INSERT INTO projects_objectvisibility (user_id, object_type, object_id)
+SELECT DISTINCT related.user_id, related.object_type, related.object_id FROM (
+    SELECT owner_id AS user_id, 'project' AS object_type, id AS object_id
+    FROM projects_project WHERE owner_id IS NOT NULL
+    UNION SELECT created_by_id, 'project', id FROM projects_project WHERE created_by_id IS NOT NULL
+    UNION SELECT user_id, 'project', project_id FROM projects_project_assigned_to_users
+    UNION SELECT member.group_member_id, 'project', assigned.project_id
+    FROM projects_project_assigned_to_group assigned
+    JOIN projects_workgroupmember member ON member.work_group_id = assigned.workgroup_id
+    WHERE member.group_member_id IS NOT NULL
+    UNION SELECT owner_id, 'workflow', id FROM projects_workflow WHERE owner_id IS NOT NULL
+    UNION SELECT created_by_id, 'workflow', id FROM projects_workflow WHERE created_by_id IS NOT NULL
+    UNION SELECT user_id, 'workflow', workflow_id FROM projects_workflow_assigned_to_users
+    UNION SELECT member.group_member_id, 'workflow', assigned.workflow_id
+    FROM projects_workflow_assigned_to_group assigned
+    JOIN projects_workgroupmember member ON member.work_group_id = assigned.workgroup_id
+    WHERE member.group_member_id IS NOT NULL
+    UNION SELECT assigned_to_id, 'task', id FROM projects_task WHERE assigned_to_id IS NOT NULL
+    UNION SELECT created_by_id, 'task', id FROM projects_task WHERE created_by_id IS NOT NULL
+    UNION SELECT member.group_member_id, 'task', assigned.task_id
+    FROM projects_task_assigned_to_group assigned
+    JOIN projects_workgroupmember member ON member.work_group_id = assigned.workgroup_id
+    WHERE member.group_member_id IS NOT NULL
+) related
+ON CONFLICT DO NOTHING;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0070_auto_20211214_2006'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ObjectVisibility',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                (
+                    'object_type',
+                    models.CharField(
+                        choices=[('project', 'Project'), ('workflow', 'Workflow'), ('task', 'Task')],
+                        max_length=20,
+                        verbose_name='Object Type',
+                    ),
+                ),
+                ('object_id', models.PositiveIntegerField(verbose_name='Object ID')),
+                (
+                    'user',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='object_visibility',
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name='User',
+                    ),
+                ),
+            ],
+            options={
+                'unique_together': {('user', 'object_type', 'object_id')},
+                'index_together': {('object_type', 'object_id')},
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
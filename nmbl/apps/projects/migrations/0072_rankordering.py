@@ -0,0 +1,53 @@
+# Generated by Django 2.2.17 on 2021-12-22 09:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# users ranked before lazy ranks keep their stored ordering
+BACKFILL_SQL = """
+INSERT INTO projects_rankordering (user_id, object_type, created_at)
+SELECT DISTINCT user_id, 'task', NOW() FROM projects_taskrank
+UNION SELECT DISTINCT user_id, 'workflow', NOW() FROM projects_workflowrank
+UNION SELECT DISTINCT user_id, 'project', NOW() FROM projects_projectrank
+ON CONFLICT DO NOTHING;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0071_objectvisibility'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankOrdering',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                (
+                    'object_type',
+                    models.CharField(
+                        choices=[('project', 'Project'), ('workflow', 'Workflow'), ('task', 'Task')],
+                        max_length=20,
+                        verbose_name='Object Type',
+                    ),
+                ),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                (
+                    'user',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='rank_ordering',
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name='User',
+                    ),
+                ),
+            ],
+            options={
+                'unique_together': {('user', 'object_type')},
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 2.2.17 on 2021-12-27 10:12
+
+from django.db import migrations, models
+
+BACKFILL_SQL = """
+UPDATE projects_workflow SET total_task = counts.total_task, completed_task = counts.completed_task,
+    passed_due = counts.passed_due
+FROM (
+    SELECT workflow_id, COUNT(*) AS total_task,
+        COUNT(*) FILTER (WHERE status IN (3, 4)) AS completed_task,
+        COUNT(*) FILTER (WHERE due_date::date < CURRENT_DATE AND status NOT IN (3, 4)) AS passed_due
+    FROM projects_task WHERE workflow_id IS NOT NULL GROUP BY workflow_id
+) counts
+WHERE projects_workflow.id = counts.workflow_id;
+UPDATE projects_project SET total_task = counts.total_task, completed_task = counts.completed_task,
+    passed_due = counts.passed_due
+FROM (
+    SELECT project_id, SUM(total_task) AS total_task, SUM(completed_task) AS completed_task,
+        SUM(passed_due) AS passed_due
+    FROM projects_workflow WHERE project_id IS NOT NULL GROUP BY project_id
+) counts
+WHERE projects_project.id = counts.project_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0072_rankordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='total_task',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Total Tasks'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='completed_task',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Completed Tasks'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='passed_due',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Passed Due Tasks'),
+        ),
+        migrations.AddField(
+            model_name='workflow',
+            name='total_task',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Total Tasks'),
+        ),
+        migrations.AddField(
+            model_name='workflow',
+            name='completed_task',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Completed Tasks'),
+        ),
+        migrations.AddField(
+            model_name='workflow',
+            name='passed_due',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Passed Due Tasks'),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.17 on 2021-12-30 11:20
+
+import django.contrib.postgres.fields.jsonb
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0073_task_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', django.contrib.postgres.fields.jsonb.JSONField(default=dict, verbose_name='Data')),
+                ('offset_time', models.IntegerField(default=0, verbose_name='Offset Time')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Version')),
+                (
+                    'computed_version',
+                    models.PositiveIntegerField(blank=True, null=True, verbose_name='Computed Version'),
+                ),
+                (
+                    'valid_until',
+                    models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Valid Until'),
+                ),
+                ('modified_at', models.DateTimeField(auto_now=True, verbose_name='Modified At')),
+                (
+                    'user',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='dashboard_rollup',
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name='User',
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.17 on 2022-01-03 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0074_dashboardrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dashboardrollup',
+            name='timezone',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Timezone'),
+        ),
+    ]
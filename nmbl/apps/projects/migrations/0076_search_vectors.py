@@ -0,0 +1,97 @@
+# Generated by Django 2.2.17 on 2022-01-03 09:41
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# mirrors projects.searchindex.search_document
+OBJECT_BACKFILL_SQL = """
+UPDATE projects_{model} SET search_vector =
+    setweight(to_tsvector('simple', coalesce(projects_{model}.name, '')), 'A')
+    || setweight(to_tsvector('simple', coalesce((
+        SELECT string_agg(projects_tag.tag, ' ') FROM projects_{model}_{model}_tags
+        INNER JOIN projects_tag ON projects_tag.id = projects_{model}_{model}_tags.tag_id
+        WHERE projects_{model}_{model}_tags.{model}_id = projects_{model}.id
+    ), '')), 'B')
+    || setweight(to_tsvector('simple', coalesce(projects_{model}.description, '')), 'C')
+    || COALESCE(setweight(to_tsvector('simple', projects_{model}.custom_fields_value), 'D'), ''::tsvector)
+    || setweight(to_tsvector('simple', coalesce((
+        SELECT string_agg(projects_globalcustomfieldvalue.value, ' ') FROM projects_globalcustomfieldvalue
+        INNER JOIN django_content_type ON django_content_type.id = projects_globalcustomfieldvalue.content_type_id
+        WHERE django_content_type.app_label = 'projects' AND django_content_type.model = '{model}'
+            AND projects_globalcustomfieldvalue.object_id = projects_{model}.id
+            AND NOT projects_globalcustomfieldvalue.is_archive
+    ), '')), 'D');
+"""
+
+BACKFILL_SQL = (
+    ''.join(OBJECT_BACKFILL_SQL.format(model=model) for model in ['project', 'workflow', 'task'])
+    + """
+UPDATE projects_attachment SET search_vector =
+    setweight(to_tsvector('simple', coalesce(projects_attachment.document_name, '')), 'A')
+    || setweight(to_tsvector('simple', coalesce((
+        SELECT string_agg(projects_tag.tag, ' ') FROM projects_attachment_document_tags
+        INNER JOIN projects_tag ON projects_tag.id = projects_attachment_document_tags.tag_id
+        WHERE projects_attachment_document_tags.attachment_id = projects_attachment.id
+    ), '')), 'B');
+"""
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0075_dashboardrollup_timezone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True, verbose_name='Search Vector'
+            ),
+        ),
+        migrations.AddField(
+            model_name='workflow',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True, verbose_name='Search Vector'
+            ),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True, verbose_name='Search Vector'
+            ),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True, verbose_name='Search Vector'
+            ),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='project',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='project_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='workflow',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['search_vector'], name='workflow_search_vector_gin'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='task_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='attachment',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['search_vector'], name='document_search_vector_gin'
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.17 on 2022-01-04 14:02
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0076_search_vectors'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='project',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['name'], name='project_name_trgm', opclasses=['gin_trgm_ops']
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='workflow',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['name'], name='workflow_name_trgm', opclasses=['gin_trgm_ops']
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['name'], name='task_name_trgm', opclasses=['gin_trgm_ops']
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='attachment',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['document_name'], name='document_name_trgm', opclasses=['gin_trgm_ops']
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['tag'], name='tag_tag_trgm', opclasses=['gin_trgm_ops']
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.17 on 2022-01-06 10:27
+
+from django.db import migrations, models
+
+# attachments without a file have no text to read, the others are read by extract_document_texts
+UNSUPPORTED_SQL = """
+UPDATE projects_attachment SET document_text_status = 2 WHERE document IS NULL OR document = '';
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0077_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='document_text',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Document Text'),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='document_text_status',
+            field=models.PositiveSmallIntegerField(
+                choices=[(0, 'Pending'), (1, 'Extracted'), (2, 'Unsupported'), (3, 'Failed')],
+                db_index=True,
+                default=0,
+                editable=False,
+                verbose_name='Document Text Status',
+            ),
+        ),
+        migrations.RunSQL(UNSUPPORTED_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -11,16 +11,19 @@ from .attachments import Attachment  # noqa
 from .audits import AuditHistory  # noqa
 from .awscredentials import AWSCredential  # noqa
 from .completionlog import CompletionLog  # noqa
+from .dashboardrollups import DashboardRollup  # noqa
 from .groupworkloadlog import GroupWorkLoadLog  # noqa
 from .pageinstructions import PageInstruction  # noqa
 from .pftcommonmodel import PFTCommonModel  # noqa
 from .privilagechangelogs import Privilage_Change_Log  # noqa
 from .projects import Project, ProjectRank  # noqa
+from .rankorderings import RankOrdering  # noqa
 from .requests import Request  # noqa
 from .tagchangelog import TagChangeLog  # noqa
 from .tags import Tag  # noqa
 from .tasks import *  # noqa
 from .teammemberworkloadlog import TeamMemberWorkLoadLog  # noqa
+from .visibilities import ObjectVisibility  # noqa
 from .workflows import *  # noqa
 from .workgroups import WorkGroup, WorkGroupMember  # noqa
 from .workproductivities import WorkProductivityLog  # noqa
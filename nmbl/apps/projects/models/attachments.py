@@ -3,12 +3,15 @@ from authentication.models import BaseModel
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.indexes import GinIndex
 from django.core.exceptions import ValidationError
 from django.core.files.storage import default_storage
 from django.db import models
 from django.utils.crypto import get_random_string
 from django.utils.translation import gettext_lazy as _
 
+from .searchindex import SearchIndexModel
+
 
 def validate_attachment_external_url(value):
     """
@@ -70,12 +73,23 @@ class AttachmentManager(models.Manager):
         return obj
 
 
-class Attachment(BaseModel):
+class Attachment(SearchIndexModel, BaseModel):
     """
     Here attachment/document can be link
         with Document/Project/Workflow
     """
 
+    TEXT_PENDING = 0
+    TEXT_EXTRACTED = 1
+    TEXT_UNSUPPORTED = 2
+    TEXT_FAILED = 3
+    TEXT_STATUS_CHOICES = (
+        (TEXT_PENDING, _("Pending")),
+        (TEXT_EXTRACTED, _("Extracted")),
+        (TEXT_UNSUPPORTED, _("Unsupported")),
+        (TEXT_FAILED, _("Failed")),
+    )
+
     document_name = models.CharField(
         max_length=254,
         null=True,
@@ -171,9 +185,29 @@ class Attachment(BaseModel):
         on_delete=models.SET_NULL,
         related_name='servicedesk_message_attachment',
     )
+    # text of the document for the search, see projects.documenttext
+    document_text = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name=_('Document Text'),
+    )
+    document_text_status = models.PositiveSmallIntegerField(
+        choices=TEXT_STATUS_CHOICES,
+        default=TEXT_PENDING,
+        db_index=True,
+        editable=False,
+        verbose_name=_('Document Text Status'),
+    )
 
     objects = AttachmentManager()
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='document_search_vector_gin'),
+            GinIndex(fields=['document_name'], name='document_name_trgm', opclasses=['gin_trgm_ops']),
+        ]
+
     def __str__(self):
         return str(self.content_type or self.document)
 
@@ -0,0 +1,55 @@
+from django.contrib.postgres.fields import JSONField
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class DashboardRollup(models.Model):
+    """
+    Dashboard widgets of a user as computed at computed_version, stale
+    once version is bumped by a change of the counted objects or past
+    valid_until when the day they are bucketed on ends.
+    """
+
+    user = models.OneToOneField(
+        'authentication.User',
+        on_delete=models.CASCADE,
+        related_name='dashboard_rollup',
+        verbose_name=_('User'),
+    )
+    data = JSONField(
+        default=dict,
+        verbose_name=_('Data'),
+    )
+    offset_time = models.IntegerField(
+        default=0,
+        verbose_name=_('Offset Time'),
+    )
+    # IANA name, used instead of offset_time when set
+    timezone = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        verbose_name=_('Timezone'),
+    )
+    version = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('Version'),
+    )
+    computed_version = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_('Computed Version'),
+    )
+    valid_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name=_('Valid Until'),
+    )
+    modified_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_('Modified At'),
+    )
+
+    def __str__(self):
+        return '{}: {}'.format(self.user_id, self.computed_version)
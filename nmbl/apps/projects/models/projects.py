@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import connection, models
 from django.utils.translation import ugettext_lazy as _
 from projects.models import (
@@ -10,8 +11,21 @@ from projects.models import (
     default_task_importance,
 )
 
+from .searchindex import SearchIndexModel
+from .taskcounters import TaskCounterModel
+from .visibilities import VisibilityManagerMixin, VisibilityQuerySetMixin
 
-class Project(PFTCommonModel, CustomFieldValueMixin):
+
+class ProjectQuerySet(VisibilityQuerySetMixin, models.QuerySet):
+    visibility_type = 'project'
+
+
+class ProjectManager(VisibilityManagerMixin, models.Manager):
+    def get_queryset(self):
+        return ProjectQuerySet(self.model, using=self._db)
+
+
+class Project(SearchIndexModel, TaskCounterModel, PFTCommonModel, CustomFieldValueMixin):
     """ """
 
     importance = models.IntegerField(
@@ -108,6 +122,14 @@ class Project(PFTCommonModel, CustomFieldValueMixin):
         verbose_name=_('Project template'),
     )
 
+    objects = ProjectManager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='project_search_vector_gin'),
+            GinIndex(fields=['name'], name='project_name_trgm', opclasses=['gin_trgm_ops']),
+        ]
+
     def __str__(self):
         return str(self.name)
 
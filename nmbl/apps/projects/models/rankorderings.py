@@ -0,0 +1,33 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from .visibilities import VISIBILITY_OBJECT_CHOICES
+
+
+class RankOrdering(models.Model):
+    """
+    Users whose rank rows of object_type are materialized, with
+    LAZY_RANK_MATERIALIZATION other users get the default ordering.
+    """
+
+    user = models.ForeignKey(
+        'authentication.User',
+        on_delete=models.CASCADE,
+        related_name='rank_ordering',
+        verbose_name=_('User'),
+    )
+    object_type = models.CharField(
+        max_length=20,
+        choices=VISIBILITY_OBJECT_CHOICES,
+        verbose_name=_('Object Type'),
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('Created At'),
+    )
+
+    class Meta:
+        unique_together = ["user", "object_type"]
+
+    def __str__(self):
+        return '{}: {}'.format(self.user_id, self.object_type)
@@ -0,0 +1,20 @@
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class SearchIndexModel(models.Model):
+    """
+    Full-text document of the object used by the global search, kept up
+    to date by projects.searchindex as the object, its tags and custom
+    field values change.
+    """
+
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name=_('Search Vector'),
+    )
+
+    class Meta:
+        abstract = True
@@ -1,4 +1,5 @@
 from authentication.models import BaseModel
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
@@ -19,5 +20,10 @@ class Tag(BaseModel):
         verbose_name=_('Tag'),
     )
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=['tag'], name='tag_tag_trgm', opclasses=['gin_trgm_ops']),
+        ]
+
     def __str__(self):
         return str(self.tag)
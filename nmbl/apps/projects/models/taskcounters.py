@@ -0,0 +1,43 @@
+from django.db import models, transaction
+from django.utils.translation import gettext_lazy as _
+
+TASK_COUNTER_FIELDS = ('total_task', 'completed_task', 'passed_due')
+
+
+class TaskCounterModel(models.Model):
+    """
+    Task counters of a project or workflow, kept up to date by
+    projects.counters as tasks are saved and deleted.
+    """
+
+    total_task = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('Total Tasks'),
+    )
+    completed_task = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('Completed Tasks'),
+    )
+    passed_due = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('Passed Due Tasks'),
+    )
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # counters are only written with F() updates, an instance loaded
+        # before a task changed must not put its stale counters back
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in TASK_COUNTER_FIELDS
+            ]
+        # a workflow moved to another project commits with its counters moved
+        with transaction.atomic():
+            super(TaskCounterModel, self).save(*args, **kwargs)
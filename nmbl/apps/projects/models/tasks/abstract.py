@@ -1,4 +1,4 @@
-from authentication.models import GroupAndPermission
+from authentication.permission_snapshot import permission_snapshot
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.postgres.fields import JSONField
 from django.core.exceptions import ValidationError
@@ -10,38 +10,28 @@ from projects.models import IMPORTANCE_CHOICES, PFTCommonModel
 
 class TaskAbstractQuerySet(models.QuerySet):
     def dependency_permission(self, user):
-        # model_name = self.model._meta.model_name
+        """
+        Open tasks the user can pick as prior/after task. Task overrides it
+        with visible_to, the fixtures have no ObjectVisibility rows.
+        """
         model_name = 'task'
         company = user.company
         group = user.group
         view_all_slug = model_name + '_' + model_name + '-view-all'
         view_mine_slug = model_name + '_' + model_name + '-view'
-        task_queryset = self.none()
-        if GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug=view_all_slug
-        ).exists():
-            q_obj = Q()
-            q_obj.add(
-                Q(is_private=True, organization=company)
-                & Q(Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user)),
-                Q.OR,
-            )
-            q_obj.add(Q(is_private=False, organization=company), Q.OR)
-            task_queryset = self.filter(q_obj).exclude(status__in=[3, 4]).distinct('id')
-        elif GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug=view_mine_slug
-        ).exists():
-            task_queryset = (
-                self.filter(
-                    Q(organization=company),
-                    Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
-                )
-                .exclude(status__in=[3, 4])
-                .distinct('id')
-            )
+        # semi-join on the workgroups, the membership join would repeat the rows
+        related_q = (
+            Q(assigned_to=user)
+            | Q(created_by=user)
+            | Q(id__in=self.model.objects.filter(assigned_to_group__group_members=user).values('id'))
+        )
+        if permission_snapshot(group, company).has(view_all_slug):
+            task_queryset = self.filter(Q(organization=company), Q(is_private=False) | related_q)
+        elif permission_snapshot(group, company).has(view_mine_slug):
+            task_queryset = self.filter(Q(organization=company), related_q)
         else:
-            pass
-        return task_queryset
+            return self.none()
+        return task_queryset.exclude(status__in=[3, 4])
 
 
 class TaskAbstractManager(models.Manager):
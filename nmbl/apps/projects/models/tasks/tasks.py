@@ -1,14 +1,26 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 
-from .abstract import TaskAbstract, TaskAbstractManager
+from ..searchindex import SearchIndexModel
+from ..visibilities import VisibilityManagerMixin, VisibilityQuerySetMixin
+from .abstract import TaskAbstract, TaskAbstractManager, TaskAbstractQuerySet
 
 
-class TaskManager(TaskAbstractManager):
-    pass
+class TaskQuerySet(VisibilityQuerySetMixin, TaskAbstractQuerySet):
+    visibility_type = 'task'
+    private_visibility = True
 
+    def dependency_permission(self, user):
+        return self.visible_to(user).exclude(status__in=[3, 4])
 
-class Task(TaskAbstract):
+
+class TaskManager(VisibilityManagerMixin, TaskAbstractManager):
+    def get_queryset(self):
+        return TaskQuerySet(self.model, using=self._db)
+
+
+class Task(SearchIndexModel, TaskAbstract):
     """
     Task model
     """
@@ -32,3 +44,12 @@ class Task(TaskAbstract):
     class Meta:
         verbose_name = _('Task')
         verbose_name_plural = _('Tasks')
+        indexes = [
+            GinIndex(fields=['search_vector'], name='task_search_vector_gin'),
+            GinIndex(fields=['name'], name='task_name_trgm', opclasses=['gin_trgm_ops']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # the workflow and project counters updated on post_save commit with the task
+        with transaction.atomic():
+            super(Task, self).save(*args, **kwargs)
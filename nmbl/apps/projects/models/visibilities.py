@@ -0,0 +1,91 @@
+from authentication.permission_snapshot import get_permission_snapshot
+from django.db import models
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+VISIBILITY_OBJECT_CHOICES = (
+    ('project', _('Project')),
+    ('workflow', _('Workflow')),
+    ('task', _('Task')),
+)
+
+
+class ObjectVisibility(models.Model):
+    """
+    Users related to a project, workflow or task through owner,
+    assigned_to(_users), created_by or a workgroup membership.
+    """
+
+    user = models.ForeignKey(
+        'authentication.User',
+        on_delete=models.CASCADE,
+        related_name='object_visibility',
+        verbose_name=_('User'),
+    )
+    object_type = models.CharField(
+        max_length=20,
+        choices=VISIBILITY_OBJECT_CHOICES,
+        verbose_name=_('Object Type'),
+    )
+    object_id = models.PositiveIntegerField(
+        verbose_name=_('Object ID'),
+    )
+
+    class Meta:
+        unique_together = ["user", "object_type", "object_id"]
+        index_together = [["object_type", "object_id"]]
+
+    def __str__(self):
+        return '{} {}: {}'.format(self.object_type, self.object_id, self.user_id)
+
+
+class VisibilityQuerySetMixin(object):
+    """
+    visibility_type is the ObjectVisibility.object_type of the model,
+    private_visibility is True when non members can't see private objects.
+    """
+
+    visibility_type = None
+    private_visibility = False
+
+    def _related_q(self, user):
+        return Q(
+            id__in=ObjectVisibility.objects.filter(user=user, object_type=self.visibility_type).values('object_id')
+        )
+
+    def related_to(self, user):
+        """
+        objects of user's company the user is related to.
+        """
+        return self.filter(Q(organization=user.company), self._related_q(user))
+
+    def company_visible_to(self, user):
+        """
+        objects of user's company visible with the view-all permission.
+        """
+        if self.private_visibility:
+            return self.filter(Q(organization=user.company), Q(is_private=False) | self._related_q(user))
+        return self.filter(organization=user.company)
+
+    def visible_to(self, user):
+        """
+        objects the user can see through the view-all or view permission.
+        """
+        model_name = self.visibility_type
+        snapshot = get_permission_snapshot(user)
+        if snapshot.has(model_name + '_' + model_name + '-view-all'):
+            return self.company_visible_to(user)
+        elif snapshot.has(model_name + '_' + model_name + '-view'):
+            return self.related_to(user)
+        return self.none()
+
+
+class VisibilityManagerMixin(object):
+    def related_to(self, user):
+        return self.get_queryset().related_to(user)
+
+    def company_visible_to(self, user):
+        return self.get_queryset().company_visible_to(user)
+
+    def visible_to(self, user):
+        return self.get_queryset().visible_to(user)
@@ -1,10 +1,23 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from ..searchindex import SearchIndexModel
+from ..taskcounters import TaskCounterModel
+from ..visibilities import VisibilityManagerMixin, VisibilityQuerySetMixin
 from .abstract import WorkflowAbstract
 
 
-class Workflow(WorkflowAbstract):
+class WorkflowQuerySet(VisibilityQuerySetMixin, models.QuerySet):
+    visibility_type = 'workflow'
+
+
+class WorkflowManager(VisibilityManagerMixin, models.Manager):
+    def get_queryset(self):
+        return WorkflowQuerySet(self.model, using=self._db)
+
+
+class Workflow(SearchIndexModel, TaskCounterModel, WorkflowAbstract):
     project = models.ForeignKey(
         'projects.Project',
         null=True,
@@ -18,3 +31,11 @@ class Workflow(WorkflowAbstract):
         through='WorkflowRank',
         related_name='%(class)s_ranks',
     )
+
+    objects = WorkflowManager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='workflow_search_vector_gin'),
+            GinIndex(fields=['name'], name='workflow_name_trgm', opclasses=['gin_trgm_ops']),
+        ]
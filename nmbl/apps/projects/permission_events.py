@@ -0,0 +1,67 @@
+from authentication.models import User
+from authentication.permission_snapshot import invalidate_permission_snapshot
+
+from .dashboard import expire_dashboard_rollups, workgroup_rollup_user_ids
+from .helpers import workgroup_assigned_notification
+from .models import DashboardRollup, WorkGroup
+from .tasks import run_permission_group_update, user_permission_update
+from .visibility import refresh_user_visibility
+
+MEMBERSHIP_EVENTS = ['workgroup_member_added', 'workgroup_member_removed']
+
+
+def _event_user(event):
+    return User.objects.select_related('group', 'company').filter(id=event.payload.get('user_id')).first()
+
+
+def invalidate_caches(event):
+    # bumped again once the change is committed, a snapshot loaded
+    # before the commit may hold the old slugs under the new version
+    invalidate_permission_snapshot(event.payload['group_id'])
+
+
+def refresh_visibility(event):
+    user = _event_user(event)
+    if user:
+        refresh_user_visibility(user)
+
+
+def sync_ranks(event):
+    if event.event_type == 'group_permissions':
+        run_permission_group_update(event.payload['group_id'])
+        return
+    user = _event_user(event)
+    if user and user.company:
+        user_permission_update(user)
+
+
+def expire_dashboards(event):
+    if event.event_type == 'group_permissions':
+        user_ids = set(
+            DashboardRollup.objects.filter(user__group_id=event.payload['group_id']).values_list('user_id', flat=True)
+        )
+    else:
+        user_ids = {event.payload.get('user_id')}
+    if event.event_type in MEMBERSHIP_EVENTS:
+        # our/their tasks of the other members count the user's tasks
+        user_ids |= workgroup_rollup_user_ids([event.payload.get('workgroup_id')])
+    expire_dashboard_rollups(user_ids - {None})
+
+
+def notify_members(event):
+    user = _event_user(event)
+    added_by = User.objects.filter(id=event.payload.get('added_by_id')).first()
+    workgroup = WorkGroup.objects.filter(id=event.payload.get('workgroup_id')).first()
+    if user and added_by and workgroup:
+        workgroup_assigned_notification(added_by, user, workgroup)
+
+
+# consumer name, event types and handler run in this order for every event,
+# handled_by keeps a consumer that succeeded from running again on retries
+PERMISSION_EVENT_CONSUMERS = (
+    ('caches', ['group_permissions'], invalidate_caches),
+    ('visibility', MEMBERSHIP_EVENTS, refresh_visibility),
+    ('ranks', ['group_permissions', 'user_group'] + MEMBERSHIP_EVENTS, sync_ranks),
+    ('dashboards', ['group_permissions', 'user_group'] + MEMBERSHIP_EVENTS, expire_dashboards),
+    ('notifications', ['workgroup_member_added'], notify_members),
+)
@@ -1,8 +1,10 @@
-from authentication.models import GroupAndPermission
+from authentication.permission_snapshot import permission_snapshot
 from rest_framework import permissions
 
 from customers.models import Feature, FeatureName
 
+from .authorization import has_object_permissions
+
 permission_map = {
     'importance': 'change-importance',
     'attachments': 'upload-docs',
@@ -17,6 +19,78 @@ permission_map = {
 
 }
 
+# fields any group with the update permission may change
+UPDATE_OPEN_FIELDS = frozenset([
+    'project_tags', 'workflow_tags', 'task_tags', 'document_tags',
+    'description', 'is_private', 'completed_percentage', 'start_date',
+    'prior_task', 'after_task', 'custom_fields_value', 'name',
+    'assigned_to_group',
+])
+PRIVILEGE_FIELDS = frozenset([
+    'attorney_client_privilege', 'work_product_privilege',
+    'confidential_privilege',
+])
+# status values open to everyone with the update permission
+UPDATE_OPEN_STATUSES = {
+    'task': [2] + list(range(5, 35)),
+    'default': [4, 5],
+}
+# status values gated by a permission, '{}' is the category
+UPDATE_STATUS_PERMISSIONS = {
+    'task': {1: 'reopen-task', 3: 'mark-as-completed', 4: '{}-delete'},
+    'default': {2: 'mark-as-completed', 3: '{}-delete'},
+}
+
+
+class UpdatePermissions(object):
+    """
+    Fields and status values a group may change on a category,
+    compiled from its permission snapshot.
+    """
+
+    def __init__(self, snapshot, category):
+        app_slug = category + "_"
+        self.can_update = snapshot.has(app_slug + category + '-update')
+        fields = set(UPDATE_OPEN_FIELDS)
+        if snapshot.has(app_slug + "create-edit-privilege-selector"):
+            fields |= PRIVILEGE_FIELDS
+        for field, permission_attr in permission_map.items():
+            if type(permission_attr) == str and snapshot.has(app_slug + permission_attr):
+                fields.add(field)
+        statuses = set(UPDATE_OPEN_STATUSES.get(category, UPDATE_OPEN_STATUSES['default']))
+        status_permissions = UPDATE_STATUS_PERMISSIONS.get(category, UPDATE_STATUS_PERMISSIONS['default'])
+        for status, permission_attr in status_permissions.items():
+            if snapshot.has(app_slug + permission_attr.format(category)):
+                statuses.add(status)
+        # status is checked by value, it comes either as a number or a string
+        fields.add('status')
+        self.fields = frozenset(fields)
+        self.statuses = frozenset(statuses) | frozenset(str(status) for status in statuses)
+
+    def permits(self, data):
+        if not self.can_update:
+            return False
+        if not self.fields.issuperset(data.keys()):
+            return False
+        if 'status' in data:
+            try:
+                return data.get('status') in self.statuses
+            except TypeError:
+                return False
+        return True
+
+
+def update_permissions(snapshot, category):
+    return snapshot.compiled(('update_permissions', category), lambda snapshot: UpdatePermissions(snapshot, category))
+
+
+def update_permitted(snapshot, category, data):
+    """
+    True when a group with snapshot may partially update an object of
+    category with data, for views updating objects outside CustomPermission.
+    """
+    return update_permissions(snapshot, category).permits(data)
+
 
 class CustomPermission(permissions.BasePermission):
     """
@@ -32,7 +106,7 @@ class CustomPermission(permissions.BasePermission):
         model = view.model
         if not all([group, company, model]):
             return False
-        model_name = permission_category = model._meta.model_name
+        permission_category = model._meta.model_name
         method_name = view.action
         # print('permission_category, method_name: ', permission_category,
         #       method_name)
@@ -43,25 +117,15 @@ class CustomPermission(permissions.BasePermission):
             if slug in \
                     [permission_category + "_" +
                      permission_category + '-create']:
-                group_permission = GroupAndPermission.objects.filter(
-                    group=group,
-                    company=company,
-                    permission__permission_category=permission_category,
-                    permission__slug=slug,
-                    has_permission=True).exists()
+                group_permission = permission_snapshot(group, company).has(slug)
                 if group_permission:
                     if self.has_privilege_keys(request):
                         # check if the group has create/edit
                         #  privileges permission
                         privilege_slug = permission_category + "_" + \
                                          "create-edit-privilege-selector"
-                        category = permission_category
-                        privilege_permission = \
-                            GroupAndPermission.objects.filter(
-                                group=group, company=company,
-                                permission__permission_category=category,
-                                permission__slug=privilege_slug,
-                                has_permission=True).exists()
+                        privilege_permission = permission_snapshot(
+                            group, company).has(privilege_slug)
                         return privilege_permission
                     return True
 
@@ -72,145 +136,18 @@ class CustomPermission(permissions.BasePermission):
                 slug_all = \
                     permission_category + "_" + \
                     permission_category + '-view-all'
-                group_permission = GroupAndPermission.objects.filter(
-                    group=group,
-                    company=company,
-                    permission__permission_category=permission_category,
-                    permission__slug=slug_mine,
-                    has_permission=True
-                ).exists() or GroupAndPermission.objects.filter(
-                    group=group,
-                    company=company,
-                    permission__permission_category=permission_category,
-                    permission__slug=slug_all,
-                    has_permission=True).exists()
+                group_permission = permission_snapshot(
+                    group, company).has_any(slug_mine, slug_all)
                 if not group_permission:
                     return False
                 else:
                     return True
         elif method_name == 'partial_update':
-            slug = permission_category + "_" + permission_category + '-update'
-            group_permission = GroupAndPermission.objects.filter(
-                group=group, company=company,
-                permission__permission_category=permission_category,
-                permission__slug=slug, has_permission=True).exists()
-            if group_permission:
-                #     If user have update permission
-                if request.data:
-                    all_permissions = list(GroupAndPermission.objects.filter(
-                        group=group,
-                        company=company,
-                        permission__permission_category=permission_category,
-                        has_permission=True
-                    ).values_list('permission__slug', flat=True))
-                    # print('all_permissions: ', all_permissions)
-                    app_slug = permission_category + "_"
-                    app_slug_delete = permission_category + "_"
-                    change_value_count = len(request.data)
-                    change_permission_count = 0
-                    for data_key, data_value in request.data.items():
-                        if data_key in ['project_tags', 'workflow_tags',
-                                        'task_tags', 'document_tags',
-                                        'description', 'is_private',
-                                        'completed_percentage', 'start_date',
-                                        'prior_task', 'after_task', 'custom_fields_value']:
-                            change_permission_count += 1
-                            continue
-                        # check if name exists in the request data
-                        if data_key == 'name':
-                            change_permission_count += 1
-                            continue
-                        if data_key == 'status':
-                            if model_name == 'task':
-                                if data_value in ['2', 2, 5, '5', 6, '6',
-                                                  7, '7', 8, '8', 9, '9',
-                                                  10, '10', 11, '11',
-                                                  12, '12', 13, '13',
-                                                  14, '14', 15, '15',
-                                                  16, '16', 17, '17',
-                                                  18, '18', 19, '19',
-                                                  20, '20', 21, '21',
-                                                  22, '22', 23, '23',
-                                                  24, '24', 25, '25',
-                                                  26, '26', 27, '27',
-                                                  28, '28', 29, '29',
-                                                  30, '30', 31, '31',
-                                                  32, '32', 33, '33',
-                                                  34, '34']:
-                                    change_permission_count += 1
-                                    continue
-                                if data_value in ['1', 1] and app_slug + \
-                                        'reopen-task' in all_permissions:
-                                    change_permission_count += 1
-                                    continue
-                                if data_value in ['3', 3] and app_slug + \
-                                        'mark-as-completed' in all_permissions:
-                                    change_permission_count += 1
-                                    continue
-                                if data_value in ['4', 4] and \
-                                        app_slug_delete + \
-                                        model_name + '-delete' in \
-                                        all_permissions:
-                                    change_permission_count += 1
-                                    continue
-                            else:
-                                if data_value in ['4', 4, 5, '5']:
-                                    change_permission_count += 1
-                                    continue
-                                if data_value in ['2', 2] and app_slug + \
-                                        'mark-as-completed' in all_permissions:
-                                    change_permission_count += 1
-                                    continue
-                                if data_value in ['3', 3] and \
-                                        app_slug_delete + \
-                                        model_name + '-delete' in \
-                                        all_permissions:
-                                    change_permission_count += 1
-                                    continue
-                        # increase change count per privileges present in data
-                        if data_key == 'attorney_client_privilege':
-                            if model_name + "_" + \
-                                    "create-edit-privilege-selector" in \
-                                    all_permissions:
-                                change_permission_count += 1
-                                continue
-                        if data_key == 'work_product_privilege':
-                            if model_name + "_" + \
-                                    "create-edit-privilege-selector" in \
-                                    all_permissions:
-                                change_permission_count += 1
-                                continue
-                        if data_key == 'confidential_privilege':
-                            if model_name + "_" + \
-                                    "create-edit-privilege-selector" in \
-                                    all_permissions:
-                                change_permission_count += 1
-                                continue
-                        if data_key == 'assigned_to_group':
-                            change_permission_count += 1
-                            continue
-                        else:
-                            permission_attr = permission_map.get(data_key)
-                            if permission_attr and \
-                                    type(permission_attr) == str:
-                                if app_slug + permission_attr in \
-                                        all_permissions:
-                                    change_permission_count += 1
-                                    continue
-                        # self.message = "You don't have permission
-                        #                 to update {}".format(data_key)
-                    # print(change_value_count, change_permission_count)
-                    if change_permission_count == change_value_count:
-                        return True
-                else:
-                    return True
+            return update_permitted(permission_snapshot(group, company), permission_category, request.data)
 
         elif method_name == 'swap_rank':
             slug = permission_category + "_" + "set-rank-drag-drop"
-            group_permission = GroupAndPermission.objects.filter(
-                group=group, company=company,
-                permission__permission_category=permission_category,
-                permission__slug=slug, has_permission=True).exists()
+            group_permission = permission_snapshot(group, company).has(slug)
             # print('group_permission: ', group_permission)
             if group_permission:
                 # If user have update permission
@@ -220,10 +157,7 @@ class CustomPermission(permissions.BasePermission):
         elif method_name == 'rename_title':
             slug = slug = permission_category + "_" + permission_category + \
                           '-edit-name'
-            group_permission = GroupAndPermission.objects.filter(
-                group=group, company=company,
-                permission__permission_category=permission_category,
-                permission__slug=slug, has_permission=True).exists()
+            group_permission = permission_snapshot(group, company).has(slug)
             if group_permission:
                 return True
         elif method_name in ['request_associate_to_task',
@@ -270,12 +204,7 @@ class RankPermission(permissions.BasePermission):
                     return False
                 model = view.model._meta.model_name
                 slug = model + "_" + "set-rank-drag-drop"
-                group_permission = GroupAndPermission.objects.filter(
-                    group=group,
-                    company=company,
-                    permission__permission_category=model,
-                    permission__slug=slug,
-                    has_permission=True).exists()
+                group_permission = permission_snapshot(group, company).has(slug)
                 if group_permission:
                     # If user have update permission
                     return True
@@ -286,6 +215,22 @@ class RankPermission(permissions.BasePermission):
         return obj.user == request.user
 
 
+class ObjectListPermission(permissions.BasePermission):
+    """
+    For actions working on many projects, workflows or tasks at once.
+    The view lists them in object_permission_actions and returns the
+    (model, id) pairs of a request from get_permission_objects(request),
+    all of them are checked together with one query per model type.
+    """
+    message = "You are not authorized to access these resources"
+
+    def has_permission(self, request, view):
+        if view.action not in getattr(view, 'object_permission_actions', ()):
+            return True
+        scope = getattr(view, 'object_permission_scope', 'visible')
+        return has_object_permissions(request.user, view.get_permission_objects(request), scope)
+
+
 class WorkGoupPermission(permissions.BasePermission):
 
     def has_permission(self, request, view):
@@ -344,12 +289,7 @@ class RequestPermission(permissions.BasePermission):
                            'destroy', 'bulk_task_creation',
                            'create_new_request',
                            'task_request_create']:
-            if GroupAndPermission.objects.filter(
-                    group=group,
-                    company=company,
-                    permission__permission_category='request',
-                    permission__slug='request_request-view',
-                    has_permission=True).exists():
+            if permission_snapshot(group, company).has('request_request-view'):
                 return True
             return False
         else:
@@ -0,0 +1,314 @@
+from authentication.permission_snapshot import get_permission_snapshot
+from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max, Min, Window
+from django.db.models.functions import RowNumber
+
+from .models import RankOrdering
+
+# spacing left between rank keys, a moved item takes a key between its new neighbours
+RANK_GAP = 1024
+RANK_CHUNK_SIZE = 1000
+
+RANK_OBJECT_FIELDS = {
+    'taskrank': 'task',
+    'workflowrank': 'workflow',
+    'projectrank': 'project',
+}
+# statuses listed only with the view-archived permission
+RANK_ARCHIVED_STATUS = {
+    'taskrank': [3, 4],
+    'workflowrank': [2, 3],
+    'projectrank': [2, 3],
+}
+# completed and archived tasks are ranked 0
+RANK_CLOSED_STATUS = {
+    'taskrank': [3, 4],
+}
+# workflows and projects keep a rank only while in one of these statuses
+RANK_OPEN_STATUS = {
+    'workflowrank': [1, 4, 5],
+    'projectrank': [1, 4, 5],
+}
+
+
+def _rank_queryset(model, user):
+    queryset = model.objects.filter(user=user)
+    if model._meta.model_name == 'taskrank':
+        # rank 0 is kept for completed and archived tasks
+        queryset = queryset.exclude(rank=0)
+    return queryset
+
+
+def rank_key_between(model, user, instance, new_rank):
+    """
+    Return the rank key putting instance where the item ranked new_rank is,
+    or None when no free key is left between the new neighbours.
+    """
+    old_rank = instance.rank
+    others = _rank_queryset(model, user).exclude(id=instance.id)
+    if new_rank < old_rank:
+        target = others.filter(rank__gte=new_rank).aggregate(Min('rank'))['rank__min']
+        if target is None or target > old_rank:
+            return old_rank
+        lower = others.filter(rank__lt=target).aggregate(Max('rank'))['rank__max'] or 0
+        upper = target
+    elif new_rank > old_rank:
+        target = others.filter(rank__lte=new_rank).aggregate(Max('rank'))['rank__max']
+        if target is None or target < old_rank:
+            return old_rank
+        upper = others.filter(rank__gt=target).aggregate(Min('rank'))['rank__min']
+        if upper is None:
+            return target + RANK_GAP
+        lower = target
+    else:
+        return old_rank
+    if upper - lower < 2:
+        return None
+    return (lower + upper) // 2
+
+
+def bulk_create_ranks(model, rows, closed_ids=(), progress=None, lazy=True):
+    """
+    Create the rank rows of (user_id, object_id) pairs appended after each
+    user's last active rank, objects in closed_ids get rank 0.
+    The last ranks are read in one query and rows inserted in chunks,
+    progress(done, total) is called after every chunk.
+    With lazy, rows of users whose ranks aren't materialized are skipped.
+    """
+    rows = list(dict.fromkeys(rows))
+    object_type = RANK_OBJECT_FIELDS[model._meta.model_name]
+    if rows and lazy and lazy_ranks_enabled():
+        materialized = set(
+            RankOrdering.objects.filter(
+                user_id__in={user_id for user_id, object_id in rows}, object_type=object_type
+            ).values_list('user_id', flat=True)
+        )
+        rows = [(user_id, object_id) for user_id, object_id in rows if user_id in materialized]
+    if not rows:
+        return 0
+    object_field = object_type + '_id'
+    last_ranks = dict(
+        model.objects.filter(user_id__in={user_id for user_id, object_id in rows}, is_active=True)
+        .order_by()
+        .values('user_id')
+        .annotate(last_rank=Max('rank'))
+        .values_list('user_id', 'last_rank')
+    )
+    closed_ids = set(closed_ids)
+    total = len(rows)
+    for start in range(0, total, RANK_CHUNK_SIZE):
+        objs = []
+        for user_id, object_id in rows[start : start + RANK_CHUNK_SIZE]:
+            if object_id in closed_ids:
+                rank = 0
+            else:
+                rank = (last_ranks.get(user_id) or 0) + RANK_GAP
+                last_ranks[user_id] = rank
+            objs.append(model(user_id=user_id, rank=rank, **{object_field: object_id}))
+        model.objects.bulk_create(objs)
+        if progress:
+            progress(start + len(objs), total)
+    return total
+
+
+def lazy_ranks_enabled():
+    return getattr(settings, 'LAZY_RANK_MATERIALIZATION', False)
+
+
+def lazy_rank_ordering():
+    # default ordering of users who never reordered: importance, due date, id
+    return [F('importance').desc(), F('due_date').asc(nulls_last=True), F('id').asc()]
+
+
+def visible_rank_objects(model, user):
+    """
+    Objects of the rank model the user gets a rank row for.
+    """
+    model_name = model._meta.model_name
+    object_type = RANK_OBJECT_FIELDS[model_name]
+    objects = model._meta.get_field(object_type).related_model.objects.visible_to(user)
+    if not get_permission_snapshot(user).has(object_type + '_view-archived'):
+        objects = objects.exclude(status__in=RANK_ARCHIVED_STATUS[model_name])
+    return objects
+
+
+def ranks_materialized(user, model):
+    if not lazy_ranks_enabled():
+        return True
+    object_type = RANK_OBJECT_FIELDS[model._meta.model_name]
+    materialized = user.__dict__.setdefault('_materialized_ranks', {})
+    if object_type not in materialized:
+        materialized[object_type] = RankOrdering.objects.filter(user=user, object_type=object_type).exists()
+    return materialized[object_type]
+
+
+def materialize_ranks(user, model):
+    """
+    Write the user's rank rows in the default ordering, done the first
+    time the user reorders or favorites so untouched lists stay rowless.
+    """
+    if ranks_materialized(user, model):
+        return False
+    model_name = model._meta.model_name
+    object_type = RANK_OBJECT_FIELDS[model_name]
+    with transaction.atomic():
+        ordering, created = RankOrdering.objects.get_or_create(user=user, object_type=object_type)
+        if created:
+            closed_status = RANK_CLOSED_STATUS.get(model_name, [])
+            objects = list(
+                visible_rank_objects(model, user)
+                .exclude(id__in=model.objects.filter(user=user).values(object_type + '_id'))
+                .order_by(*lazy_rank_ordering())
+                .values_list('id', 'status')
+            )
+            bulk_create_ranks(
+                model,
+                [(user.id, object_id) for object_id, status in objects],
+                [object_id for object_id, status in objects if status in closed_status],
+                lazy=False,
+            )
+    user.__dict__.setdefault('_materialized_ranks', {})[object_type] = True
+    return created
+
+
+def lazy_rank_keys(model, user, object_ids):
+    """
+    Rank keys materialize_ranks would give the objects, in one query.
+    """
+    objects = visible_rank_objects(model, user)
+    closed_status = RANK_CLOSED_STATUS.get(model._meta.model_name)
+    if closed_status:
+        objects = objects.exclude(status__in=closed_status)
+    ordered = objects.annotate(position=Window(expression=RowNumber(), order_by=lazy_rank_ordering())).values(
+        'id', 'position'
+    )
+    ordered_sql, ordered_params = ordered.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT "id", "position" * %s FROM ({ordered}) AS ordered WHERE "id" = ANY(%s)'.format(
+                ordered=ordered_sql
+            ),
+            [RANK_GAP] + list(ordered_params) + [list(object_ids)],
+        )
+        return dict(cursor.fetchall())
+
+
+def lazy_ranks(model, user, objects, annotations=()):
+    """
+    Unsaved rank instances standing in for the rank rows of a user without
+    materialized ranks, their id is the negated object id.
+    """
+    objects = list(objects)
+    object_type = RANK_OBJECT_FIELDS[model._meta.model_name]
+    keys = lazy_rank_keys(model, user, [obj.id for obj in objects])
+    ranks = []
+    for obj in objects:
+        rank = model(id=-obj.id, user=user, rank=keys.get(obj.id, 0), **{object_type: obj})
+        for name in annotations:
+            setattr(rank, name, getattr(obj, name))
+        ranks.append(rank)
+    return ranks
+
+
+def materialized_rank_id(model, user, rank_id):
+    """
+    Stored rank id for a rank id of a lazy list, negative ids are object ids.
+    """
+    rank_id = int(rank_id)
+    if rank_id >= 0:
+        return rank_id
+    materialize_ranks(user, model)
+    object_type = RANK_OBJECT_FIELDS[model._meta.model_name]
+    return model.objects.filter(user=user, **{object_type + '_id': -rank_id}).values_list('id', flat=True).first()
+
+
+def bulk_create_rank_sets(rank_sets, progress=None):
+    """
+    bulk_create_ranks over (model, rows, closed_ids) sets with
+    progress(done, total) counted across all of them.
+    """
+    total = sum(len(rows) for model, rows, closed_ids in rank_sets)
+    done = 0
+    for model, rows, closed_ids in rank_sets:
+        offset = done
+        done += bulk_create_ranks(
+            model,
+            rows,
+            closed_ids,
+            progress=progress and (lambda count, rows_total: progress(offset + count, total)),
+        )
+    return done
+
+
+def shift_ranks(model, user, old_rank, new_rank):
+    queryset = _rank_queryset(model, user)
+    if new_rank < old_rank:
+        queryset.filter(rank__gte=new_rank, rank__lt=old_rank).update(rank=F('rank') + 1)
+    elif new_rank > old_rank:
+        queryset.filter(rank__lte=new_rank, rank__gt=old_rank).update(rank=F('rank') - 1)
+
+
+def move_rank(model, user, instance, new_rank):
+    """
+    Return the rank key instance should be saved with to land at new_rank,
+    only instance itself is written unless the keys around new_rank are exhausted.
+    """
+    rank_key = rank_key_between(model, user, instance, new_rank)
+    if rank_key is not None:
+        return rank_key
+    # no gap left: shift the rows in between and spread the user's keys again
+    shift_ranks(model, user, instance.rank, new_rank)
+    model_name = model._meta.model_name
+    transaction.on_commit(lambda: rebalance_ranks.delay(model_name, user.id))
+    return new_rank
+
+
+def active_rank_queryset(model, user_ids):
+    """
+    Rank rows of the given users that take part in ordering.
+    """
+    model_name = model._meta.model_name
+    field = RANK_OBJECT_FIELDS[model_name]
+    queryset = model.objects.filter(user__in=user_ids)
+    if model_name in RANK_CLOSED_STATUS:
+        queryset = queryset.exclude(**{'%s__status__in' % field: RANK_CLOSED_STATUS[model_name]})
+    if model_name in RANK_OPEN_STATUS:
+        queryset = queryset.filter(**{'%s__status__in' % field: RANK_OPEN_STATUS[model_name]})
+    return queryset
+
+
+def renumber_ranks(queryset, is_active=True):
+    """
+    Renumber the rank rows of queryset RANK_GAP apart per user keeping their
+    order, with a single UPDATE ... FROM (SELECT ROW_NUMBER() OVER ...).
+    """
+    model = queryset.model
+    ordered = queryset.annotate(
+        position=Window(
+            expression=RowNumber(),
+            partition_by=[F('user_id')],
+            order_by=[F('rank').asc(), F('id').asc()],
+        )
+    ).values('id', 'position')
+    ordered_sql, ordered_params = ordered.query.sql_with_params()
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE {table} AS ranked SET "rank" = ordered.position * %s, "is_active" = %s '
+            'FROM ({ordered}) AS ordered WHERE ranked."id" = ordered."id"'.format(table=table, ordered=ordered_sql),
+            [RANK_GAP, is_active] + list(ordered_params),
+        )
+        return cursor.rowcount
+
+
+@shared_task
+def rebalance_ranks(model_name, user_id):
+    """
+    Renumber the user's ranks of model_name to RANK_GAP apart keys
+    keeping their order, in a single statement.
+    """
+    model = apps.get_model('projects', model_name)
+    renumber_ranks(active_rank_queryset(model, [user_id]))
@@ -0,0 +1,189 @@
+"""
+Full-text search index of projects, workflows, tasks and documents.
+
+Each object keeps a tsvector of its name (weight A), tags (B),
+description (C) and custom field values (D) in search_vector, documents
+their name, tags and file text (D, see projects.documenttext), with a GIN
+index, rebuilt in one UPDATE when the object, its tags or its custom
+field values change. The 'simple' configuration doesn't stem, names of
+matters and clients are searched as typed. The typeahead suggestions
+match names and tags on their pg_trgm indexes instead.
+"""
+import re
+
+from base.db.lookups import like_pattern
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    SearchVectorField,
+    TrigramSimilarity,
+)
+from django.db.models import F, Func, IntegerField, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Cast
+
+from .models import Attachment, GlobalCustomFieldValue, Project, Tag, Task, Workflow
+from .statistics import visible_objects
+
+SEARCH_CONFIG = 'simple'
+SEARCH_RANK_SCALE = 1000000
+
+# object type -> (model, tags field, [(text field, weight)], custom fields)
+SEARCH_INDEX = {
+    'project': (Project, 'project_tags', [('name', 'A'), ('description', 'C')], True),
+    'workflow': (Workflow, 'workflow_tags', [('name', 'A'), ('description', 'C')], True),
+    'task': (Task, 'task_tags', [('name', 'A'), ('description', 'C')], True),
+    'document': (Attachment, 'document_tags', [('document_name', 'A'), ('document_text', 'D')], False),
+}
+SEARCH_INDEX_TYPES = {model: object_type for object_type, (model, *rest) in SEARCH_INDEX.items()}
+
+# shorter suggestion searches match the start of the names, they have no trigram
+SUGGEST_MIN_SUBSTRING = 3
+SUGGEST_LIMIT = 10
+SUGGEST_MAX_LIMIT = 50
+
+
+class SearchVectorConcat(Func):
+    arg_joiner = ' || '
+    template = '(%(expressions)s)'
+    output_field = SearchVectorField()
+
+
+class JSONSearchVector(Func):
+    """
+    Weighted tsvector of the string values of a jsonb column.
+    """
+
+    template = "COALESCE(setweight(to_tsvector('%(config)s'::regconfig, %(expressions)s), '%(weight)s'), ''::tsvector)"
+    output_field = SearchVectorField()
+
+    def __init__(self, expression, weight):
+        super(JSONSearchVector, self).__init__(expression, config=SEARCH_CONFIG, weight=weight)
+
+
+def _text_subquery(queryset, group_field, text_field):
+    return Subquery(
+        queryset.order_by().values(group_field).annotate(text=StringAgg(text_field, ' ')).values('text'),
+        output_field=TextField(),
+    )
+
+
+def search_document(object_type):
+    """
+    search_vector expression of object_type, to use in an update.
+    """
+    model, tags_field, text_fields, custom_fields = SEARCH_INDEX[object_type]
+    vectors = [SearchVector(field, weight=weight, config=SEARCH_CONFIG) for field, weight in text_fields]
+    tags = _text_subquery(Tag.objects.filter(**{tags_field: OuterRef('pk')}), tags_field, 'tag')
+    # after the name, in the order of the 0076 backfill so both give the same lexeme positions
+    vectors.insert(1, SearchVector(tags, weight='B', config=SEARCH_CONFIG))
+    if custom_fields:
+        vectors.append(JSONSearchVector(F('custom_fields_value'), 'D'))
+        values = GlobalCustomFieldValue.objects.filter(
+            content_type=ContentType.objects.get_for_model(model), object_id=OuterRef('pk'), is_archive=False
+        )
+        vectors.append(SearchVector(_text_subquery(values, 'object_id', 'value'), weight='D', config=SEARCH_CONFIG))
+    return SearchVectorConcat(*vectors)
+
+
+def refresh_search_index(object_type, object_ids):
+    object_ids = [object_id for object_id in object_ids if object_id]
+    if object_ids:
+        model = SEARCH_INDEX[object_type][0]
+        model.objects.filter(id__in=object_ids).update(search_vector=search_document(object_type))
+
+
+def refresh_tag_search_index(tag_ids):
+    """
+    Rebuild the objects tagged with the tags, used once a tag is renamed.
+    """
+    for object_type, (model, tags_field, text_fields, custom_fields) in SEARCH_INDEX.items():
+        through = getattr(model, tags_field).through
+        refresh_search_index(
+            object_type,
+            through.objects.filter(tag_id__in=tag_ids).values_list(model._meta.model_name + '_id', flat=True),
+        )
+
+
+def search_query(text):
+    """
+    tsquery matching every word of text as a prefix, None when text has
+    no word to search.
+    """
+    terms = re.findall(r'[^\W_]+', (text or '').lower())
+    if not terms:
+        return None
+    return SearchQuery(' & '.join(term + ':*' for term in terms), config=SEARCH_CONFIG, search_type='raw')
+
+
+def search_rank(query):
+    """
+    ts_rank scaled to an integer, a float4 rank doesn't survive the round
+    trip through a pagination cursor.
+    """
+    return Cast(SearchRank(F('search_vector'), query) * SEARCH_RANK_SCALE, IntegerField())
+
+
+def search_objects(queryset, object_type, text):
+    """
+    Objects of queryset matching text, annotated with their search_rank.
+    Text without any word is matched as typed on the name.
+    """
+    query = search_query(text)
+    if query is None:
+        name_field = SEARCH_INDEX[object_type][2][0][0]
+        return queryset.filter(**{name_field + '__icontains': text}).annotate(
+            search_rank=Value(0, output_field=IntegerField())
+        )
+    return queryset.filter(search_vector=query).annotate(search_rank=search_rank(query))
+
+
+def tagged_with(queryset, object_type, tag_ids):
+    """
+    Objects of queryset with any of the tags, as a subquery so the rows
+    aren't repeated per matching tag.
+    """
+    model, tags_field = SEARCH_INDEX[object_type][:2]
+    through = getattr(model, tags_field).through
+    return queryset.filter(id__in=through.objects.filter(tag_id__in=tag_ids).values(model._meta.model_name + '_id'))
+
+
+def search_suggestions(user, text, object_types, limit):
+    """
+    Up to limit {'id', 'name', 'type'} of the objects of object_types
+    visible to user whose name or a tag matches text, closest names first.
+    Names and tags are matched with ILIKE on their pg_trgm indexes.
+    """
+    pattern = like_pattern(text, prefix=len(text) < SUGGEST_MIN_SUBSTRING)
+    suggestions = []
+    for object_type in object_types:
+        model, tags_field, text_fields = SEARCH_INDEX[object_type][:3]
+        name_field = text_fields[0][0]
+        if object_type == 'document':
+            # documents of the visible projects, workflows and tasks, as the global search
+            queryset = Attachment.objects.filter(organization=user.company, is_delete=False).filter(
+                Q(project_id__in=visible_objects(user, 'project').values('id'))
+                | Q(workflow_id__in=visible_objects(user, 'workflow').values('id'))
+                | Q(task_id__in=visible_objects(user, 'task').values('id'))
+            )
+        else:
+            queryset = visible_objects(user, object_type)
+        tagged = (
+            getattr(model, tags_field)
+            .through.objects.filter(tag__tag__ilike=pattern)
+            .values(model._meta.model_name + '_id')
+        )
+        rows = (
+            queryset.filter(Q(**{name_field + '__ilike': pattern}) | Q(id__in=tagged))
+            .annotate(similarity=TrigramSimilarity(name_field, text))
+            .order_by('-similarity', name_field, 'id')
+            .values_list('id', name_field, 'similarity')[:limit]
+        )
+        suggestions.extend((similarity, object_type, object_id, name) for object_id, name, similarity in rows)
+    suggestions.sort(key=lambda suggestion: -suggestion[0])
+    return [
+        {'id': object_id, 'name': name, 'type': object_type}
+        for similarity, object_type, object_id, name in suggestions[:limit]
+    ]
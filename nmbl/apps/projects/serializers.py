@@ -1,6 +1,5 @@
-import datetime
-
 from authentication.models import Organization, User
+from base.api.serializers import DynamicFieldsMixin, collapsed_id, collapsed_ids
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import Max, Min
 from django.utils.crypto import get_random_string
@@ -49,6 +48,8 @@ from .helpers import (
     update_team_member_workload_history,
     update_work_productivity_log,
 )
+from .counters import task_counters
+from .loaders import ListPageLoader, PageLoaderListSerializer, TaskCountLoader
 from .models import (
     Attachment,
     AuditHistory,
@@ -74,6 +75,7 @@ from .models import (
     WorkflowRank,
     WorkProductivityLog,
 )
+from .ranking import materialize_ranks, materialized_rank_id
 from .tasks import create_projectrank, rerankProject, rerankTask, rerankWorkflow
 
 options = {'size': (170, 170), 'crop': True}
@@ -227,13 +229,24 @@ class WorkflowAttachmentSerializer(serializers.ModelSerializer):
 
     def get_attachments(self, workflow):
         request = self.context['request']
-        return DocumentBaseSerializer(
-            Attachment.objects.filter(workflow=workflow, is_delete=False), many=True, context={'request': request}
-        ).data
+        page_loader = self.context.get('page_loader')
+        if page_loader:
+            attachments = page_loader.workflow_attachments.get(workflow.id, [])
+        else:
+            attachments = Attachment.objects.filter(workflow=workflow, is_delete=False)
+        return DocumentBaseSerializer(attachments, many=True, context={'request': request}).data
 
     def get_task(self, workflow_obj):
+        request = self.context.get('request')
+        page_loader = self.context.get('page_loader')
+        if page_loader:
+            tasks = page_loader.workflow_tasks.get(workflow_obj.id)
+            if tasks:
+                return TaskAttachmentSerializer(
+                    tasks, many=True, context={'request': request, 'page_loader': page_loader}
+                ).data
+            return None
         if workflow_obj.task_workflow.all().exists():
-            request = self.context.get('request')
             return TaskAttachmentSerializer(
                 Task.objects.filter(workflow=workflow_obj), many=True, context={'request': request}
             ).data
@@ -555,6 +568,8 @@ class ProjectRankSwapSerializer(serializers.Serializer):
         request = self.context.get('request')
         from_rank_id = attrs.get('from_rank')
         to_rank_id = attrs.get('to_rank')
+        # lazy list ranks are the keys the materialized rows get
+        materialize_ranks(request.user, ProjectRank)
         if not ProjectRank.objects.filter(user=request.user, rank=from_rank_id).count():
             raise ValidationError({"from_rank": ["Invalid from rank id"]})
         if not ProjectRank.objects.filter(user=request.user, rank=to_rank_id).count():
@@ -562,7 +577,7 @@ class ProjectRankSwapSerializer(serializers.Serializer):
         return attrs
 
 
-class ProjectListSerializer(serializers.ModelSerializer):
+class ProjectListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Project
         fields = (
@@ -578,6 +593,13 @@ class ProjectListSerializer(serializers.ModelSerializer):
             'template_id',
         )
 
+    expandable_fields = {
+        'owner': collapsed_id,
+        'assigned_to_users': collapsed_ids,
+        'attachments': None,
+        'workflow': None,
+    }
+
     owner = UserBasicSerializer()
     assigned_to_users = UserSerializer(many=True)
     attachments = serializers.SerializerMethodField()
@@ -585,27 +607,33 @@ class ProjectListSerializer(serializers.ModelSerializer):
     workflow = serializers.SerializerMethodField()
 
     def get_task(self, project_obj):
-        if 'project_task_data' in self.context:
-            return self.context['project_task_data']
-        if project_obj.workflow_assigned_project.all().exists():
-            date_today = datetime.datetime.utcnow().date()
-            workflow = project_obj.workflow_assigned_project.all().values_list('id', flat=True)[::1]
-            tasks = Task.objects.filter(workflow_id__in=workflow)
-            data = {
-                'total_task': tasks.count(),
-                'completed_task': tasks.filter(status__in=[3, 4]).count(),
-                'passed_due': tasks.filter(due_date__date__lt=date_today).exclude(status__in=[3, 4]).count(),
-            }
-            return data
+        page_loader = self.context.get('page_loader')
+        if page_loader:
+            has_workflows = bool(page_loader.project_workflows.get(project_obj.id))
+        else:
+            has_workflows = project_obj.workflow_assigned_project.all().exists()
+        if has_workflows:
+            return task_counters(project_obj)
         return None
 
     def get_attachments(self, project_obj):
         request = self.context['request']
-        return DocumentBaseSerializer(
-            Attachment.objects.filter(project=project_obj, is_delete=False), many=True, context={'request': request}
-        ).data
+        page_loader = self.context.get('page_loader')
+        if page_loader:
+            attachments = page_loader.project_attachments.get(project_obj.id, [])
+        else:
+            attachments = Attachment.objects.filter(project=project_obj, is_delete=False)
+        return DocumentBaseSerializer(attachments, many=True, context={'request': request}).data
 
     def get_workflow(self, project_obj):
+        page_loader = self.context.get('page_loader')
+        if page_loader:
+            workflows = page_loader.project_workflows.get(project_obj.id)
+            if workflows:
+                return WorkflowAttachmentSerializer(
+                    workflows, many=True, context={'request': self.context.get('request'), 'page_loader': page_loader}
+                ).data
+            return None
         if project_obj.workflow_assigned_project.all().exists():
             request = self.context.get('request')
             return WorkflowAttachmentSerializer(
@@ -622,21 +650,20 @@ class ProjectRankListSerializer(serializers.ModelSerializer):
             'rank',
             'id',
         )
+        list_serializer_class = PageLoaderListSerializer
 
     project = serializers.SerializerMethodField()
 
+    @staticmethod
+    def page_loader(project_ranks):
+        return ListPageLoader(project_ids=[project_rank.project_id for project_rank in project_ranks])
+
     def get_project(self, project_rank):
         request = self.context.get('request')
+        page_loader = self.context.get('page_loader') or self.page_loader([project_rank])
         return ProjectListSerializer(
             project_rank.project,
-            context={
-                'request': request,
-                'project_task_data': {
-                    'total_task': project_rank.total_task,
-                    'completed_task': project_rank.completed_task,
-                    'passed_due': project_rank.passed_due,
-                },
-            },
+            context={'request': request, 'page_loader': page_loader},
         ).data
 
 
@@ -723,6 +750,8 @@ class WorkflowRankSwapSerializer(serializers.Serializer):
         request = self.context.get('request')
         from_rank_id = attrs.get('from_rank')
         to_rank_id = attrs.get('to_rank')
+        # lazy list ranks are the keys the materialized rows get
+        materialize_ranks(request.user, WorkflowRank)
         WorkflowRank.objects.filter(user=request.user, rank__range=sorted([from_rank_id, to_rank_id]))
         if not WorkflowRank.objects.filter(user=request.user, rank=from_rank_id).count():
             raise ValidationError({"from_rank": ["Invalid from rank id"]})
@@ -731,7 +760,7 @@ class WorkflowRankSwapSerializer(serializers.Serializer):
         return attrs
 
 
-class WorkflowListSerializer(serializers.ModelSerializer):
+class WorkflowListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Workflow
         fields = (
@@ -746,20 +775,24 @@ class WorkflowListSerializer(serializers.ModelSerializer):
             'template_id',
         )
 
+    expandable_fields = {
+        'owner': collapsed_id,
+        'task': None,
+    }
+
     owner = UserSerializer()
     due_date = serializers.DateTimeField()
-    total_task = serializers.SerializerMethodField()
-    completed_task = serializers.SerializerMethodField()
     task = serializers.SerializerMethodField()
 
-    def get_total_task(self, workflow_obj):
-        return Task.objects.filter(workflow=workflow_obj).count()
-
-    def get_completed_task(self, workflow_obj):
-        return Task.objects.filter(workflow=workflow_obj, status__in=[3, 4]).count()
-
     def get_task(self, workflow_obj):
         request = self.context.get('request')
+        page_loader = self.context.get('page_loader')
+        if page_loader:
+            return TaskAttachmentSerializer(
+                page_loader.workflow_tasks.get(workflow_obj.id, []),
+                many=True,
+                context={'request': request, 'page_loader': page_loader},
+            ).data
         return TaskAttachmentSerializer(
             Task.objects.filter(workflow=workflow_obj), many=True, context={'request': request}
         ).data
@@ -769,12 +802,19 @@ class WorkflowRankListSerializer(serializers.ModelSerializer):
     class Meta:
         model = WorkflowRank
         fields = ('workflow', 'rank', 'id')
+        list_serializer_class = PageLoaderListSerializer
 
     workflow = serializers.SerializerMethodField()
 
+    @staticmethod
+    def page_loader(workflow_ranks):
+        return ListPageLoader(workflow_ids=[workflow_rank.workflow_id for workflow_rank in workflow_ranks])
+
     def get_workflow(self, workflow_rank):
         request = self.context.get('request')
-        return WorkflowListSerializer(workflow_rank.workflow, context={'request': request}).data
+        return WorkflowListSerializer(
+            workflow_rank.workflow, context={'request': request, 'page_loader': self.context.get('page_loader')}
+        ).data
 
 
 class WorkflowDetailSerializer(serializers.ModelSerializer):
@@ -906,6 +946,8 @@ class TaskRankSwapSerializer(serializers.Serializer):
         request = self.context.get('request')
         from_rank_id = attrs.get('from_rank')
         to_rank_id = attrs.get('to_rank')
+        # lazy list ranks are the keys the materialized rows get
+        materialize_ranks(request.user, TaskRank)
         if not TaskRank.objects.filter(user=request.user, rank=from_rank_id).count():
             raise ValidationError({"from_rank": ["Invalid from rank id"]})
         if not TaskRank.objects.filter(user=request.user, rank=to_rank_id).count():
@@ -977,7 +1019,7 @@ class ProjectRankSerializer(serializers.ModelSerializer):
         validated_data.pop('project', None)
         if self.context.get('request'):
             # re-arrange other project rank
-            rerankProject(self)
+            rerankProject(self, validated_data)
         uobj = super(ProjectRankSerializer, self).update(instance, validated_data)
         return uobj
 
@@ -992,7 +1034,9 @@ class ProjectRankChangeSerializer(serializers.ModelSerializer):
 
     def validate(self, attrs):
         request = self.context.get('request')
-        drop_place = ProjectRank.objects.filter(user=request.user, id=attrs.get('drop_place'))
+        drop_place = ProjectRank.objects.filter(
+            user=request.user, id=materialized_rank_id(ProjectRank, request.user, attrs.get('drop_place'))
+        )
         if drop_place:
             rank = drop_place[0].rank
             request.data['rank'] = rank
@@ -1006,7 +1050,7 @@ class ProjectRankChangeSerializer(serializers.ModelSerializer):
         validated_data.pop('project', None)
         if self.context.get('request'):
             # re-arrange other project rank
-            rerankProject(self)
+            rerankProject(self, validated_data)
         uobj = super(ProjectRankChangeSerializer, self).update(instance, validated_data)
         return uobj
 
@@ -1052,7 +1096,7 @@ class WorkflowRankSerializer(serializers.ModelSerializer):
         validated_data.pop('workflow', None)
         if self.context.get('request'):
             # re-arrange other workflow rank
-            rerankWorkflow(self)
+            rerankWorkflow(self, validated_data)
         uobj = super(WorkflowRankSerializer, self).update(instance, validated_data)
         return uobj
 
@@ -1099,7 +1143,8 @@ class TaskRankSerializer(serializers.ModelSerializer):
             )
             if favourite_task['rank__max']:
                 if attrs['rank'] <= favourite_task['rank__max']:
-                    if favourite_task['rank__max'] >= 25:
+                    # ranks are sparse keys, count the favourites instead of reading the last rank
+                    if TaskRank.objects.filter(user=request.user, is_favorite=True).exclude(rank=0).count() >= 25:
                         TaskRank.objects.filter(
                             user=request.user, is_favorite=True, rank__gte=favourite_task['rank__max']
                         ).update(is_favorite=False)
@@ -2413,24 +2458,18 @@ class GlobalSearchProjectSerializer(serializers.ModelSerializer):
             'due_date',
             'task',
         )
+        list_serializer_class = PageLoaderListSerializer
 
     owner = UserBasicSerializer()
     assigned_to_users = UserSerializer(many=True)
     task = serializers.SerializerMethodField()
 
+    def page_loader(self, projects):
+        return TaskCountLoader(self.context.get("task_qset"), project_ids=[project.id for project in projects])
+
     def get_task(self, project_obj):
-        task_qset = self.context.get("task_qset")
-        if project_obj.workflow_assigned_project.all().exists():
-            date_today = datetime.datetime.utcnow().date()
-            workflow = project_obj.workflow_assigned_project.all().values_list('id', flat=True)[::1]
-            tasks = task_qset.filter(workflow_id__in=workflow)
-            data = {
-                'total_task': tasks.count(),
-                'completed_task': tasks.filter(status__in=[3, 4]).count(),
-                'passed_due': tasks.filter(due_date__date__lt=date_today).exclude(status__in=[3, 4]).count(),
-            }
-            return data
-        return None
+        page_loader = self.context.get('page_loader') or self.page_loader([project_obj])
+        return page_loader.project_task_counts.get(project_obj.id)
 
 
 class WorkflowOwnerUserSerializer(serializers.ModelSerializer):
@@ -2456,19 +2495,25 @@ class GlobalSearchWorkflowSerializer(serializers.ModelSerializer):
             'total_task',
             'completed_task',
         )
+        list_serializer_class = PageLoaderListSerializer
 
     owner = WorkflowOwnerUserSerializer()
     due_date = serializers.DateTimeField()
     total_task = serializers.SerializerMethodField()
     completed_task = serializers.SerializerMethodField()
 
+    def page_loader(self, workflows):
+        return TaskCountLoader(self.context.get("task_qset"), workflow_ids=[workflow.id for workflow in workflows])
+
+    def workflow_task_counts(self, workflow_obj):
+        page_loader = self.context.get('page_loader') or self.page_loader([workflow_obj])
+        return page_loader.workflow_task_counts.get(workflow_obj.id, {})
+
     def get_total_task(self, workflow_obj):
-        task_qset = self.context.get("task_qset")
-        return task_qset.filter(workflow=workflow_obj).count()
+        return self.workflow_task_counts(workflow_obj).get('total_task', 0)
 
     def get_completed_task(self, workflow_obj):
-        task_qset = self.context.get("task_qset")
-        return task_qset.filter(workflow=workflow_obj, status__in=[3, 4]).count()
+        return self.workflow_task_counts(workflow_obj).get('completed_task', 0)
 
 
 class GlobalSearchTaskSerializer(serializers.ModelSerializer):
@@ -1,17 +1,24 @@
 from datetime import timedelta
 
+from authentication.events import publish_permission_event
 from authentication.models import User
 from django.db import transaction
-from django.db.models.signals import m2m_changed, post_save, pre_delete, pre_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.utils.timezone import now
 from projects.tasks import (
     project_change_user,
     task_change_user,
     workflow_change_user,
-    workgroup_add_user,
-    workgroup_remove_user,
 )
 
+from .counters import apply_task_counter_change, move_workflow_counters, task_counter_state
+from .dashboard import (
+    dashboard_changed_fields,
+    dashboard_rollup_user_ids,
+    dashboard_visibility_changed,
+    expire_dashboard_rollups,
+)
+from .documenttext import schedule_document_text
 from .helpers import (
     AuditHistoryCreate,
     audit_due_date_history,
@@ -26,7 +33,9 @@ from .helpers import (
     workflow_assigned_notification,
     workflow_removed_notification,
 )
-from .models import Attachment, Project, Task, Workflow, WorkGroup, WorkGroupMember
+from .models import Attachment, GlobalCustomFieldValue, Project, Tag, Task, Workflow, WorkGroup, WorkGroupMember
+from .searchindex import SEARCH_INDEX, SEARCH_INDEX_TYPES, refresh_search_index, refresh_tag_search_index
+from .visibility import refresh_object_visibility, remove_object_visibility
 
 
 def task_pre_save(sender, instance, *args, **kwargs):
@@ -35,12 +44,18 @@ def task_pre_save(sender, instance, *args, **kwargs):
         PRIVILEGE_CHANGE = False
         old_instance = Task.objects.filter(pk=instance.id).last()
         if old_instance:
+            instance.counter_state = task_counter_state(old_instance)
             pre_save_data = {}
             if old_instance.workflow:
                 pre_save_data['workflow_id'] = old_instance.workflow.id
             if old_instance.assigned_to:
                 pre_save_data['assigned_to_id'] = old_instance.assigned_to.id
             instance.pre_save_data = pre_save_data
+            if (
+                old_instance.assigned_to_id != instance.assigned_to_id
+                or old_instance.created_by_id != instance.created_by_id
+            ):
+                instance.visibility_changed = True
             if old_instance.due_date != instance.due_date:
                 instance.old_due_date = old_instance.due_date
                 audit_due_date_history(
@@ -144,6 +159,123 @@ def create_task_notification(sender, instance, created, **kwargs):
         task_assigned_notification(instance)
 
 
+def task_counters_post_save(sender, instance, created, **kwargs):
+    new_state = task_counter_state(instance)
+    apply_task_counter_change(getattr(instance, 'counter_state', (None, {})), new_state)
+    instance.counter_state = new_state
+
+
+def task_counters_post_delete(sender, instance, **kwargs):
+    apply_task_counter_change(task_counter_state(instance), (None, {}))
+
+
+def workflow_counters_post_save(sender, instance, created, **kwargs):
+    if not created and hasattr(instance, 'old_project_id') and instance.old_project_id != instance.project_id:
+        move_workflow_counters(instance.id, instance.old_project_id, instance.project_id)
+    instance.old_project_id = instance.project_id
+
+
+def object_visibility_post_save(sender, instance, created, **kwargs):
+    if created or getattr(instance, 'visibility_changed', False):
+        refresh_object_visibility(sender._meta.model_name, [instance.id])
+        instance.visibility_changed = False
+
+
+def object_visibility_post_delete(sender, instance, **kwargs):
+    remove_object_visibility(sender._meta.model_name, instance.id)
+
+
+def object_visibility_m2m_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ['post_add', 'post_remove', 'post_clear']:
+        return
+    if not reverse:
+        refresh_object_visibility(instance._meta.model_name, [instance.id])
+    elif pk_set:
+        refresh_object_visibility(model._meta.model_name, pk_set)
+
+
+def dashboard_rollups_pre_save(sender, instance, update_fields=None, **kwargs):
+    object_type = sender._meta.model_name
+    instance.dashboard_changed_fields = dashboard_changed_fields(instance, update_fields)
+    instance.dashboard_user_ids = set()
+    # users counting the object before the change may count it no more
+    if instance.dashboard_changed_fields is not None and dashboard_visibility_changed(
+        object_type, instance.dashboard_changed_fields
+    ):
+        instance.dashboard_user_ids = dashboard_rollup_user_ids(object_type, [instance.pk])
+
+
+def dashboard_rollups_post_save(sender, instance, created, **kwargs):
+    changed_fields = getattr(instance, 'dashboard_changed_fields', None)
+    instance.dashboard_changed_fields = None
+    # nothing the rollups count changed
+    if not created and changed_fields is not None and not changed_fields:
+        return
+    user_ids = dashboard_rollup_user_ids(sender._meta.model_name, [instance.id])
+    expire_dashboard_rollups(user_ids | getattr(instance, 'dashboard_user_ids', set()))
+    instance.dashboard_user_ids = set()
+
+
+def dashboard_rollups_pre_delete(sender, instance, **kwargs):
+    expire_dashboard_rollups(dashboard_rollup_user_ids(sender._meta.model_name, [instance.id]))
+
+
+def dashboard_rollups_m2m_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if not reverse:
+        object_type, object_ids = instance._meta.model_name, [instance.id]
+    elif pk_set:
+        object_type, object_ids = model._meta.model_name, list(pk_set)
+    else:
+        return
+    if action in ['pre_add', 'pre_remove', 'pre_clear']:
+        instance.dashboard_user_ids = dashboard_rollup_user_ids(object_type, object_ids)
+    elif action in ['post_add', 'post_remove', 'post_clear']:
+        user_ids = dashboard_rollup_user_ids(object_type, object_ids)
+        expire_dashboard_rollups(user_ids | getattr(instance, 'dashboard_user_ids', set()))
+        instance.dashboard_user_ids = set()
+
+
+def search_index_post_save(sender, instance, created, **kwargs):
+    refresh_search_index(SEARCH_INDEX_TYPES[sender], [instance.id])
+
+
+def search_index_tags_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ['post_add', 'post_remove', 'post_clear']:
+        return
+    if not reverse:
+        refresh_search_index(SEARCH_INDEX_TYPES[type(instance)], [instance.id])
+    elif pk_set:
+        refresh_search_index(SEARCH_INDEX_TYPES[model], pk_set)
+
+
+def search_index_tag_post_save(sender, instance, created, **kwargs):
+    if not created:
+        refresh_tag_search_index([instance.id])
+
+
+def search_index_tag_pre_delete(sender, instance, **kwargs):
+    # the tagged objects are rebuilt once the tag rows are gone
+    instance.search_index_ids = {
+        object_type: list(
+            getattr(model, tags_field)
+            .through.objects.filter(tag_id=instance.id)
+            .values_list(model._meta.model_name + '_id', flat=True)
+        )
+        for object_type, (model, tags_field, text_fields, custom_fields) in SEARCH_INDEX.items()
+    }
+
+
+def search_index_tag_post_delete(sender, instance, **kwargs):
+    for object_type, object_ids in getattr(instance, 'search_index_ids', {}).items():
+        refresh_search_index(object_type, object_ids)
+
+
+def search_index_custom_field_value_changed(sender, instance, **kwargs):
+    model = instance.content_type.model_class()
+    if model in SEARCH_INDEX_TYPES:
+        refresh_search_index(SEARCH_INDEX_TYPES[model], [instance.object_id])
+
+
 def assigned_to_users_changed(sender, **kwargs):
     action = kwargs.get('action')
     project = kwargs.get('instance')
@@ -196,6 +328,10 @@ def project_due_date_change(sender, instance, *args, **kwargs):
             or old_instance.attorney_client_privilege != instance.attorney_client_privilege
         ):
             privilege_log_history.delay(instance, "project")
+        if old_instance and (
+            old_instance.owner_id != instance.owner_id or old_instance.created_by_id != instance.created_by_id
+        ):
+            instance.visibility_changed = True
         if old_instance:
             if old_instance and (
                 old_instance.owner != instance.owner
@@ -209,6 +345,8 @@ def project_due_date_change(sender, instance, *args, **kwargs):
 def workflow_due_date_change(sender, instance, *args, **kwargs):
     if instance:
         old_instance = Workflow.objects.filter(pk=instance.id).last()
+        if old_instance:
+            instance.old_project_id = old_instance.project_id
         if old_instance and old_instance.due_date != instance.due_date:
             instance.old_due_date = old_instance.due_date
             audit_due_date_history(
@@ -237,6 +375,10 @@ def workflow_due_date_change(sender, instance, *args, **kwargs):
             or old_instance.attorney_client_privilege != instance.attorney_client_privilege
         ):
             privilege_log_history.delay(instance, "workflow")
+        if old_instance and (
+            old_instance.owner_id != instance.owner_id or old_instance.created_by_id != instance.created_by_id
+        ):
+            instance.visibility_changed = True
         if old_instance:
             if old_instance and (
                 old_instance.owner != instance.owner
@@ -257,6 +399,27 @@ def pre_save_attachment(sender, instance, *args, **kwargs):
             instance.task = Task.objects.get(pk=instance.object_id)
 
 
+def document_text_pre_save(sender, instance, *args, **kwargs):
+    # new, copied and replaced files are read by a celery task once saved
+    document_name = instance.document.name if instance.document else None
+    if instance.pk:
+        stored_name = Attachment.objects.filter(pk=instance.pk).values_list('document', flat=True).first()
+        if (stored_name or None) == document_name:
+            return
+        instance.document_text = ''
+    if document_name:
+        instance.document_text_status = Attachment.TEXT_PENDING
+        instance.document_text_changed = True
+    else:
+        instance.document_text_status = Attachment.TEXT_UNSUPPORTED
+
+
+def document_text_post_save(sender, instance, created, **kwargs):
+    if getattr(instance, 'document_text_changed', False):
+        instance.document_text_changed = False
+        schedule_document_text(instance.pk)
+
+
 def assigned_to_group_changed_project(sender, **kwargs):
     action = kwargs.get('action')
     project = kwargs.get('instance')
@@ -316,26 +479,79 @@ def assigned_to_group_changed_task(sender, **kwargs):
 
 
 def workgroup_add_member(sender, instance, created, *args, **kwargs):
-    if created:
-        workgroup_add_user(instance)
+    if created and instance.group_member_id:
+        # added_by is set by the views adding members, the user is notified by the worker
+        publish_permission_event(
+            'workgroup_member_added',
+            user_id=instance.group_member_id,
+            workgroup_id=instance.work_group_id,
+            added_by_id=getattr(instance, 'added_by_id', None),
+        )
 
 
-def workgroup_remove_member(sender, instance, *args, **kwargs):
-    workgroup_remove_user(instance)
+def workgroup_member_removed(sender, instance, *args, **kwargs):
+    # published after the membership row is gone so the user's objects are recomputed without it
+    if instance.group_member_id:
+        publish_permission_event(
+            'workgroup_member_removed', user_id=instance.group_member_id, workgroup_id=instance.work_group_id
+        )
 
 
 pre_save.connect(project_due_date_change, sender=Project)
 pre_save.connect(workflow_due_date_change, sender=Workflow)
 pre_save.connect(task_pre_save, sender=Task)
 post_save.connect(create_task_notification, sender=Task)
+post_save.connect(task_counters_post_save, sender=Task)
+post_delete.connect(task_counters_post_delete, sender=Task)
+post_save.connect(workflow_counters_post_save, sender=Workflow)
 m2m_changed.connect(assigned_to_users_workflow, sender=Workflow.assigned_to_users.through)
 m2m_changed.connect(assigned_to_users_changed, sender=Project.assigned_to_users.through)
 pre_save.connect(pre_save_attachment, sender=Attachment)
+pre_save.connect(document_text_pre_save, sender=Attachment)
+post_save.connect(document_text_post_save, sender=Attachment)
 m2m_changed.connect(assigned_to_group_changed_project, sender=Project.assigned_to_group.through)
 m2m_changed.connect(assigned_to_group_changed_workflow, sender=Workflow.assigned_to_group.through)
 m2m_changed.connect(assigned_to_group_changed_task, sender=Task.assigned_to_group.through)
 post_save.connect(workgroup_add_member, sender=WorkGroupMember)
-pre_delete.connect(workgroup_remove_member, sender=WorkGroupMember)
+post_delete.connect(workgroup_member_removed, sender=WorkGroupMember)
+for visibility_sender in [Project, Workflow, Task]:
+    post_save.connect(object_visibility_post_save, sender=visibility_sender)
+    post_delete.connect(object_visibility_post_delete, sender=visibility_sender)
+for visibility_sender in [
+    Project.assigned_to_users.through,
+    Project.assigned_to_group.through,
+    Workflow.assigned_to_users.through,
+    Workflow.assigned_to_group.through,
+    Task.assigned_to_group.through,
+]:
+    m2m_changed.connect(object_visibility_m2m_changed, sender=visibility_sender)
+for search_index_sender in SEARCH_INDEX_TYPES:
+    post_save.connect(search_index_post_save, sender=search_index_sender)
+for search_index_sender in [
+    Project.project_tags.through,
+    Workflow.workflow_tags.through,
+    Task.task_tags.through,
+    Attachment.document_tags.through,
+]:
+    m2m_changed.connect(search_index_tags_changed, sender=search_index_sender)
+post_save.connect(search_index_tag_post_save, sender=Tag)
+pre_delete.connect(search_index_tag_pre_delete, sender=Tag)
+post_delete.connect(search_index_tag_post_delete, sender=Tag)
+post_save.connect(search_index_custom_field_value_changed, sender=GlobalCustomFieldValue)
+post_delete.connect(search_index_custom_field_value_changed, sender=GlobalCustomFieldValue)
+# after the visibility handlers so the users related after the change are expired
+for dashboard_sender in [Project, Workflow, Task]:
+    pre_save.connect(dashboard_rollups_pre_save, sender=dashboard_sender)
+    post_save.connect(dashboard_rollups_post_save, sender=dashboard_sender)
+    pre_delete.connect(dashboard_rollups_pre_delete, sender=dashboard_sender)
+for dashboard_sender in [
+    Project.assigned_to_users.through,
+    Project.assigned_to_group.through,
+    Workflow.assigned_to_users.through,
+    Workflow.assigned_to_group.through,
+    Task.assigned_to_group.through,
+]:
+    m2m_changed.connect(dashboard_rollups_m2m_changed, sender=dashboard_sender)
 
 
 def _create_tasks_base_on_workflow(task_fixtures, user, workflow):
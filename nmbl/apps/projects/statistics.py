@@ -0,0 +1,95 @@
+from authentication.permission_snapshot import get_permission_snapshot
+from django.db.models import Count, Q
+
+from .visibility import VISIBILITY_MODELS
+
+CLOSED_TASK_STATUSES = [3, 4]
+
+# statuses left out of the statistics without the <type>_view-archived permission
+ARCHIVED_STATUSES = {
+    'project': [2, 3],
+    'workflow': [2, 3],
+    'task': CLOSED_TASK_STATUSES,
+}
+
+
+def distinct_rows(queryset):
+    """
+    Rows of queryset once each, the visibility joins repeat them.
+    """
+    return queryset.model.objects.filter(pk__in=queryset.order_by().values('pk'))
+
+
+def visible_objects(user, object_type):
+    """
+    Objects of object_type the statistics of user count.
+    """
+    queryset = VISIBILITY_MODELS[object_type].objects.visible_to(user)
+    if not get_permission_snapshot(user).has(object_type + '_view-archived'):
+        queryset = queryset.exclude(status__in=ARCHIVED_STATUSES[object_type])
+    return queryset
+
+
+def conditional_counts(queryset, **buckets):
+    """
+    Number of distinct rows of queryset matching each Q of buckets in one
+    aggregate query, a None bucket counts every row.
+    """
+    counts = distinct_rows(queryset).aggregate(
+        **{name: Count('pk', filter=condition) for name, condition in buckets.items()}
+    )
+    # aggregates of an empty set come back as None
+    return {name: counts[name] or 0 for name in buckets}
+
+
+def task_importance_counts(tasks, date_today):
+    """
+    Task statistics as tasks_statistic returns them.
+    """
+    active = ~Q(status__in=CLOSED_TASK_STATUSES)
+    return conditional_counts(
+        tasks,
+        high=active & Q(importance=3),
+        med=active & Q(importance=2),
+        low=active & Q(importance=1),
+        completed=Q(status__in=CLOSED_TASK_STATUSES),
+        total_task=None,
+        due_today=active & Q(due_date__date=date_today),
+        total_due=active & Q(due_date__date__lt=date_today),
+    )
+
+
+def task_totals(tasks, date_today):
+    """
+    Task statistics as workflows_statistic and projects_statistic return them.
+    """
+    counts = task_importance_counts(tasks, date_today)
+    return {
+        'total_task': counts['total_task'],
+        'completed_task': counts['completed'],
+        'low': counts['low'],
+        'mid': counts['med'],
+        'high': counts['high'],
+        'due_today': counts['due_today'],
+        'total_due': counts['total_due'],
+    }
+
+
+def grouped_task_counts(tasks, group_by, group_ids, date_today):
+    """
+    {group id: {total_task, completed_task, passed_due}} of the tasks
+    whose group_by is in group_ids, counted in one grouped query. Groups
+    without tasks are left out.
+    """
+    rows = (
+        distinct_rows(tasks)
+        .filter(**{group_by + '__in': group_ids})
+        .order_by()
+        .values(group_by)
+        .annotate(
+            total_task=Count('pk'),
+            completed_task=Count('pk', filter=Q(status__in=CLOSED_TASK_STATUSES)),
+            passed_due=Count('pk', filter=Q(due_date__date__lt=date_today) & ~Q(status__in=CLOSED_TASK_STATUSES)),
+        )
+    )
+    return {row.pop(group_by): row for row in rows}
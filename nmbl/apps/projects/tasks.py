@@ -3,13 +3,18 @@ from __future__ import absolute_import, unicode_literals
 
 import datetime
 
-from authentication.models import GroupAndPermission
-from authentication.models import User
+from authentication.events import publish_permission_event
+from authentication.models import Group, User
+from authentication.permission_snapshot import get_permission_snapshot, invalidate_permission_snapshot
 from celery import shared_task
 from customers.models import Client
-from django.db.models import F, Q
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
 from django_tenants.utils import schema_context
 
+from .counters import rollover_passed_due
+from .dashboard import refresh_expired_dashboard_rollups
 from .helpers import project_due_date_notification, \
     workflow_due_date_notification, \
     task_due_date_notification, \
@@ -18,6 +23,7 @@ from .models import Project, Task, Workflow, \
     ServiceDeskUserInformation
 from .models import TaskRank, WorkflowRank, ProjectRank, \
     ServiceDeskAttachment
+from .ranking import active_rank_queryset, bulk_create_ranks, move_rank, renumber_ranks
 
 
 # celery -A nmbl beat -l info
@@ -90,84 +96,53 @@ def project_due_date_check_tenant_specific(tenant_sc_name):
     return ''
 
 
+@shared_task
+def task_counters_rollover():
+    """
+    Recount passed_due of every tenant once tasks due yesterday are
+    passed due, the counters only follow task saves during the day.
+    """
+    with schema_context('public'):
+        schema_names = list(
+            Client.objects.values_list('schema_name', flat=True))
+    for schema_name in schema_names:
+        with schema_context(schema_name):
+            rollover_passed_due()
+
+
+@shared_task
+def dashboard_rollups_rollover():
+    """
+    Recompute the dashboard rollups of every tenant whose day ended in
+    utc or at the user's offset, runs every quarter hour for the offsets.
+    """
+    with schema_context('public'):
+        schema_names = list(
+            Client.objects.values_list('schema_name', flat=True))
+    for schema_name in schema_names:
+        with schema_context(schema_name):
+            refresh_expired_dashboard_rollups()
+
+
 def rerankTask(self, validated_data):
     request = self.context.get('request')
-    task_obj = self.instance
-    old_rank = task_obj.rank
-    new_rank = validated_data.get('rank')
-    if new_rank < old_rank:
-        TaskRank.objects.filter(
-            user=request.user,
-            rank__gte=new_rank,
-            rank__lt=old_rank).exclude(
-            rank=0).update(rank=F('rank') + 1)
-        # 1(new- small value) -> 3(old- large value)
-        # for i in range(old_rank, new_rank, 1):
-        #     TaskRank.objects.filter(
-        #     user=request.user, rank=i + 1,
-        #     is_active=True).update(rank=i)
-    elif new_rank > old_rank:
-        TaskRank.objects.filter(
-            user=request.user,
-            rank__lte=new_rank,
-            rank__gt=old_rank).exclude(
-            rank=0).update(rank=F('rank') - 1)
-        # 3(old- large value) -> 1(new- small value)
-        # for i in reversed(range(new_rank, old_rank, 1)):
-        #     TaskRank.objects.filter(user=request.user,
-        #     rank=i, is_active=True).update(rank=i + 1)
+    validated_data['rank'] = move_rank(
+        TaskRank, request.user, self.instance,
+        validated_data.get('rank'))
 
 
-def rerankWorkflow(self):
+def rerankWorkflow(self, validated_data):
     request = self.context.get('request')
-    workflow_obj = self.instance
-    old_rank = workflow_obj.rank
-    new_rank = request.data.get('rank')
-    if new_rank < old_rank:
-        WorkflowRank.objects.filter(
-            user=request.user,
-            rank__gte=new_rank,
-            rank__lt=old_rank).update(rank=F('rank') + 1)
-        # 1(new- small value) -> 3(old- large value)
-        # for i in range(old_rank, new_rank, 1):
-        #     WorkflowRank.objects.filter(
-        #     user=request.user, rank=i + 1,
-        #     is_active=True).update(rank=i)
-    elif new_rank > old_rank:
-        WorkflowRank.objects.filter(
-            user=request.user,
-            rank__lte=new_rank,
-            rank__gt=old_rank).update(rank=F('rank') - 1)
-        # 3(old- large value) -> 1(new- small value)
-        # for i in reversed(range(new_rank,
-        #   old_rank, 1)):
-        #     WorkflowRank.objects.filter(user=request.user,
-        #     rank=i, is_active=True).update(rank=i + 1)
+    validated_data['rank'] = move_rank(
+        WorkflowRank, request.user, self.instance,
+        validated_data.get('rank'))
 
 
-def rerankProject(self):
+def rerankProject(self, validated_data):
     request = self.context.get('request')
-    project_obj = self.instance
-    old_rank = project_obj.rank
-    new_rank = request.data.get('rank')
-    if new_rank < old_rank:
-        ProjectRank.objects.filter(
-            user=request.user,
-            rank__gte=new_rank,
-            rank__lt=old_rank).update(rank=F('rank') + 1)
-        # 1(new- small value) -> 3(old- large value)
-        # for i in range(old_rank, new_rank, 1):
-        #     ProjectRank.objects.filter(user=request.user,
-        #     rank=i + 1, is_active=True).update(rank=i)
-    elif new_rank > old_rank:
-        ProjectRank.objects.filter(
-            user=request.user,
-            rank__lte=new_rank,
-            rank__gt=old_rank).update(rank=F('rank') - 1)
-        # 3(old- large value) -> 1(new- small value)
-        # for i in reversed(range(new_rank, old_rank, 1)):
-        #     ProjectRank.objects.filter(user=request.user,
-        #     rank=i, is_active=True).update(rank=i + 1)
+    validated_data['rank'] = move_rank(
+        ProjectRank, request.user, self.instance,
+        validated_data.get('rank'))
 
 
 def create_workflowrank(instance):
@@ -219,16 +194,8 @@ def create_workflowrank(instance):
                     group_member in view_permission_user):
                 related_users.append(group_member)
     # create workflow rank for task related user
-    for user in related_users:
-        user_workflow_last_rank = WorkflowRank.objects.filter(
-            user=user, is_active=True).order_by('-rank').first()
-        if not user_workflow_last_rank:
-            WorkflowRank.objects.create(
-                user=user, workflow=workflow, rank=1)
-        else:
-            WorkflowRank.objects.create(
-                user=user, workflow=workflow,
-                rank=int(user_workflow_last_rank.rank) + 1)
+    bulk_create_ranks(
+        WorkflowRank, [(user.id, workflow.id) for user in related_users])
     return instance
 
 
@@ -280,16 +247,8 @@ def create_projectrank(instance):
                     group_member in view_permission_user):
                 related_users.append(group_member)
     # create task rank for task related user
-    for user in related_users:
-        user_project_last_rank = ProjectRank.objects.filter(
-            user=user, is_active=True).order_by('-rank').first()
-        if not user_project_last_rank:
-            ProjectRank.objects.create(
-                user=user, project=project, rank=1)
-        else:
-            ProjectRank.objects.create(
-                user=user, project=project,
-                rank=int(user_project_last_rank.rank) + 1)
+    bulk_create_ranks(
+        ProjectRank, [(user.id, project.id) for user in related_users])
     return instance
 
 
@@ -338,17 +297,8 @@ def create_taskrank(instance):
                     group_member in view_permission_user):
                 related_users.append(group_member)
     # create task rank for task related user
-    for user in related_users:
-        user_task_last_rank = TaskRank.objects.filter(
-            user=user, is_active=True
-        ).order_by('-rank').first()
-        if not user_task_last_rank:
-            TaskRank.objects.create(
-                user=user, task=task, rank=1)
-        else:
-            TaskRank.objects.create(
-                user=user, task=task,
-                rank=int(user_task_last_rank.rank) + 1)
+    bulk_create_ranks(
+        TaskRank, [(user.id, task.id) for user in related_users])
     return instance
 
 
@@ -422,27 +372,13 @@ def project_change_user(instance):
         id__in=existing_project_rank_user).exclude(
         id__in=related_users)
     # create project rank for task related user
-    for user in new_assigned_user:
-        user_project_last_rank = ProjectRank.objects.filter(
-            user=user, is_active=True
-        ).order_by('-rank').first()
-        if not user_project_last_rank:
-            ProjectRank.objects.create(
-                user=user, project=project, rank=1)
-        else:
-            ProjectRank.objects.create(
-                user=user, project=project,
-                rank=int(user_project_last_rank.rank) + 1)
+    bulk_create_ranks(
+        ProjectRank, [(user.id, project.id) for user in new_assigned_user])
     # remove project rank user which don't
     # have permission and re-rank it
-    for user in removed_user:
-        ProjectRank.objects.filter(
-            user=user, project=project).delete()
-        for index, active_proojectrank in enumerate(
-                ProjectRank.objects.filter(user=user).order_by('rank')):
-            active_proojectrank.rank = index + 1
-            active_proojectrank.is_active = True
-            active_proojectrank.save()
+    ProjectRank.objects.filter(
+        user__in=removed_user, project=project).delete()
+    renumber_ranks(active_rank_queryset(ProjectRank, removed_user))
 
 
 def workflow_change_user(instance):
@@ -516,26 +452,12 @@ def workflow_change_user(instance):
         id__in=existing_workflow_rank_user).exclude(
         id__in=related_users)
     # create task rank for task related user
-    for user in new_assigned_user:
-        user_workflow_last_rank = WorkflowRank.objects.filter(
-            user=user, is_active=True
-        ).order_by('-rank').first()
-        if not user_workflow_last_rank:
-            WorkflowRank.objects.create(
-                user=user, workflow=workflow, rank=1)
-        else:
-            WorkflowRank.objects.create(
-                user=user, workflow=workflow,
-                rank=int(user_workflow_last_rank.rank) + 1)
+    bulk_create_ranks(
+        WorkflowRank, [(user.id, workflow.id) for user in new_assigned_user])
     # remove task rank user which dont have permission and rerank it
-    for user in removed_user:
-        WorkflowRank.objects.filter(
-            user=user, workflow=workflow).delete()
-        for index, active_workflowrank in enumerate(
-                WorkflowRank.objects.filter(user=user).order_by('rank')):
-            active_workflowrank.rank = index + 1
-            active_workflowrank.is_active = True
-            active_workflowrank.save()
+    WorkflowRank.objects.filter(
+        user__in=removed_user, workflow=workflow).delete()
+    renumber_ranks(active_rank_queryset(WorkflowRank, removed_user))
 
 
 def task_change_user(instance):
@@ -623,428 +545,135 @@ def task_change_user(instance):
         id__in=existing_task_rank_user).exclude(
         id__in=related_users)
     # remove task rank user which don't have permission and rerank it
-    for user in removed_user:
-        user_remove_task = TaskRank.objects.filter(
-            user=user, task=task).first()
-        if user_remove_task and user_remove_task.rank != 0:
-            TaskRank.objects.filter(
-                user=user, rank__gt=user_remove_task.rank
-            ).exclude(rank=0).update(rank=F('rank') - 1)
-        user_remove_task.delete()
-        # for index, active_taskrank in enumerate(
-        #         TaskRank.objects.filter(user=user
-        #         ).exclude(rank=0).order_by('rank')):
-        #     active_taskrank.rank = index + 1
-        #     active_taskrank.is_active = True
-        #     active_taskrank.save()
+    removed_user_ids = list(removed_user.values_list('id', flat=True))
+    TaskRank.objects.filter(
+        user__in=removed_user_ids, task=task).delete()
+    renumber_ranks(TaskRank.objects.filter(
+        user__in=removed_user_ids).exclude(rank=0))
     if task.status in [3, 4]:
-        users = TaskRank.objects.filter(
-            task=instance).values_list('user_id', flat=True)
-        for user in users:
-            user_completed_task = TaskRank.objects.filter(
-                task=instance, user_id=user).first()
-            if user_completed_task and user_completed_task.rank != 0:
-                TaskRank.objects.filter(
-                    user__id=user,
-                    rank__gt=user_completed_task.rank).exclude(
-                    rank=0).update(rank=F('rank') - 1)
+        users = list(TaskRank.objects.filter(
+            task=instance).values_list('user_id', flat=True))
         TaskRank.objects.filter(task=instance).update(rank=0)
-        for user in new_assigned_user:
-            TaskRank.objects.create(user=user, task=task, rank=0)
+        renumber_ranks(TaskRank.objects.filter(
+            user__in=users).exclude(rank=0))
+        bulk_create_ranks(
+            TaskRank, [(user.id, task.id) for user in new_assigned_user],
+            [task.id])
     else:
         # create task rank for task related user
-        for user in new_assigned_user:
-            user_task_last_rank = TaskRank.objects.filter(
-                user=user).exclude(rank=0).order_by('-rank').first()
-            if not user_task_last_rank:
-                TaskRank.objects.create(user=user, task=task, rank=1)
-            else:
-                TaskRank.objects.create(
-                    user=user, task=task,
-                    rank=int(user_task_last_rank.rank) + 1)
-
-
-def permission_group_update(instance):
+        bulk_create_ranks(
+            TaskRank, [(user.id, task.id) for user in new_assigned_user])
+
+
+# rank model, object model, object field and statuses hidden without view-archived
+PERMISSION_RANK_MODELS = (
+    (TaskRank, Task, 'task', [3, 4]),
+    (ProjectRank, Project, 'project', [2, 3]),
+    (WorkflowRank, Workflow, 'workflow', [2, 3]),
+)
+PERMISSION_UPDATE_TIMEOUT = 60 * 60
+
+
+def sync_user_ranks(user):
+    """
+    Sync the ranks of user with what the user can see, ranks of objects
+    no longer visible are deleted and newly visible ones appended in bulk.
+    """
+    snapshot = get_permission_snapshot(user)
+    for rank_model, model, field, archived_status in \
+            PERMISSION_RANK_MODELS:
+        permitted = model.objects.visible_to(user)
+        if not snapshot.has(field + '_view-archived'):
+            permitted = permitted.exclude(status__in=archived_status)
+        user_ranks = rank_model.objects.filter(user=user)
+        # remove rank of objects the user can't see anymore
+        user_ranks.exclude(
+            **{field + '__in': permitted.values('id')}).delete()
+        # add rank of newly visible objects, completed task get rank 0
+        new_objects = list(permitted.exclude(
+            id__in=user_ranks.values(field + '_id')
+        ).values_list('id', 'status'))
+        bulk_create_ranks(
+            rank_model,
+            [(user.id, object_id) for object_id, status in new_objects],
+            [object_id for object_id, status in new_objects
+             if field == 'task' and status in archived_status])
+
+
+def user_permission_update(user):
+    """
+    Sync the ranks of a user whose group or workgroups changed.
+    """
+    sync_user_ranks(user)
+    for rank_model, model, field, archived_status in PERMISSION_RANK_MODELS:
+        renumber_ranks(active_rank_queryset(rank_model, [user.id]))
+
+
+def permission_group_update(instance, progress=None):
+    """
+    Sync the ranks of the group's users with the group permissions,
+    every rank list is renumbered in one statement at the end.
+    """
     group = instance
     organization = group.organization
-    instance_user = User.objects.filter(
-        group=group, company=organization)
-    for user in instance_user:
-        group = user.group
-        company = user.company
-        # Task rank update start
-        """
-        variable
-        u_p_t_l > user permitted task list
-        u_e_t_r > user existing task rank
-        n_t_a_u > new task assigned to user
-        r_t_a > list of task which removed access for user
-
-        """
-        if GroupAndPermission.objects.filter(
-                group=user.group,
-                company=user.company,
-                has_permission=True,
-                permission__slug='task_task-view-all').exists():
-            q_obj = Q()
-            q_obj.add(Q(is_private=True, organization=company) &
-                      Q(Q(assigned_to=user) |
-                        Q(created_by=user) |
-                        Q(assigned_to_group__group_members=user)), Q.OR)
-            q_obj.add(Q(is_private=False, organization=company), Q.OR)
-            queryset = Task.objects.filter(
-                q_obj).values_list('id', flat=True).distinct()
-            if not GroupAndPermission.objects.filter(
-                    group=group,
-                    company=company,
-                    permission__permission_category='task',
-                    permission__slug='task_view-archived',
-                    has_permission=True).exists():
-                queryset = queryset.exclude(status__in=[3, 4])
-            u_p_t_l = list(queryset)
-        elif GroupAndPermission.objects.filter(
-                group=user.group,
-                company=user.company,
-                has_permission=True,
-                permission__slug='task_task-view').exists():
-            queryset = Task.objects.filter(
-                Q(organization=user.company),
-                Q(assigned_to=user) |
-                Q(created_by=user) |
-                Q(assigned_to_group__group_members=user)
-            ).values_list('id', flat=True).distinct()
-            if not GroupAndPermission.objects.filter(
-                    group=group,
-                    company=company,
-                    permission__permission_category='task',
-                    permission__slug='task_view-archived',
-                    has_permission=True).exists():
-                queryset = queryset.exclude(status__in=[3, 4])
-            u_p_t_l = list(queryset)
-        else:
-            u_p_t_l = []
-        # get list of existing task rank
-        u_e_t_r = list(TaskRank.objects.filter(
-            user=user).values_list(
-            'task__id', flat=True).distinct())
-        # get removed task from user
-        removed_task = Task.objects.filter(
-            id__in=u_e_t_r).exclude(
-            id__in=u_p_t_l)
-        r_t_a = list(removed_task.values_list('id', flat=True).distinct())
-        # r_t_a = [x for x in u_e_t_r if x not in u_p_t_l]
-        TaskRank.objects.filter(
-            user=user, task__id__in=r_t_a).delete()
-        for index, active_taskrank in enumerate(
-                TaskRank.objects.filter(user=user).exclude(
-                    task__status__in=[3, 4]).order_by('rank')):
-            active_taskrank.rank = index + 1
-            active_taskrank.is_active = True
-            active_taskrank.save()
-        # get new task where user have permission
-        new_assign_task = Task.objects.filter(
-            id__in=u_p_t_l).exclude(
-            id__in=u_e_t_r)
-        for completed_task in new_assign_task.filter(status__in=[3, 4]):
-            TaskRank.objects.create(
-                user=user, task=completed_task, rank=0)
-        # n_t_a_u = [x for x in u_p_t_l if x not in u_e_t_r]
-        for task in new_assign_task.exclude(status__in=[3, 4]):
-            user_task_last_rank = TaskRank.objects.filter(
-                user=user, is_active=True).order_by('-rank').first()
-            if not user_task_last_rank:
-                TaskRank.objects.create(
-                    user=user, task=task, rank=1)
-            else:
-                TaskRank.objects.create(
-                    user=user, task=task,
-                    rank=int(user_task_last_rank.rank) + 1)
-        # Task rank update end
-
-        # project rank update start
-        if GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='project',
-                has_permission=True,
-                permission__slug='project_project-view-all').exists():
-            project_queryset = Project.objects.filter(
-                organization=company)
-            if not GroupAndPermission.objects.filter(
-                    group=group,
-                    company=company,
-                    permission__permission_category='project',
-                    permission__slug='project_view-archived',
-                    has_permission=True).exists():
-                project_queryset = project_queryset.exclude(status__in=[2, 3])
-            project_queryset_ids = list(
-                project_queryset.values_list('id', flat=True).distinct())
-        elif GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='project',
-                has_permission=True,
-                permission__slug='project_project-view').exists():
-            project_queryset = Project.objects.filter(
-                Q(organization=company),
-                Q(owner=user) |
-                Q(assigned_to_users=user) |
-                Q(created_by=user) |
-                Q(assigned_to_group__group_members=user))
-            if not GroupAndPermission.objects.filter(
-                    group=group,
-                    company=company,
-                    permission__permission_category='project',
-                    permission__slug='project_view-archived',
-                    has_permission=True).exists():
-                project_queryset = project_queryset.exclude(status__in=[2, 3])
-            project_queryset_ids = list(
-                project_queryset.values_list('id', flat=True).distinct())
-        else:
-            project_queryset_ids = []
-        # get list of existing project rank
-        existing_project_rank_id = list(ProjectRank.objects.filter(
-            user=user).values_list(
-            'project__id', flat=True).distinct())
-        # get removed project from user
-        removed_project_rank = Project.objects.filter(
-            id__in=existing_project_rank_id).exclude(
-            id__in=project_queryset_ids)
-        removed_project_rank_id = list(
-            removed_project_rank.values_list('id', flat=True).distinct())
-        ProjectRank.objects.filter(
-            user=user, project__id__in=removed_project_rank_id
-        ).delete()
-        for index, active_projectrank in enumerate(
-                ProjectRank.objects.filter(user=user).order_by('rank')):
-            active_projectrank.rank = index + 1
-            active_projectrank.is_active = True
-            active_projectrank.save()
-        # get new project where user have permission
-        new_assign_project = Project.objects.filter(
-            id__in=project_queryset_ids).exclude(
-            id__in=existing_project_rank_id)
-        for project in new_assign_project:
-            user_project_last_rank = ProjectRank.objects.filter(
-                user=user, is_active=True
-            ).order_by('-rank').first()
-            if not user_project_last_rank:
-                ProjectRank.objects.create(
-                    user=user, project=project, rank=1)
-            else:
-                ProjectRank.objects.create(
-                    user=user, project=project,
-                    rank=int(user_project_last_rank.rank) + 1)
-        # project rank update end
-
-        # workflow rank update start
-        if GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='workflow',
-                has_permission=True,
-                permission__slug='workflow_workflow-view-all'
-        ).exists():
-            workflow_queryset = Workflow.objects.filter(
-                organization=company)
-            if not GroupAndPermission.objects.filter(
-                    group=group,
-                    company=company,
-                    permission__permission_category='workflow',
-                    permission__slug='workflow_view-archived',
-                    has_permission=True).exists():
-                workflow_queryset = workflow_queryset.exclude(
-                    status__in=[2, 3])
-            workflow_queryset_ids = list(
-                workflow_queryset.values_list(
-                    "id", flat=True).distinct())
-        elif GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='workflow',
-                has_permission=True,
-                permission__slug='workflow_workflow-view').exists():
-            workflow_queryset = Workflow.objects.filter(
-                Q(organization=company),
-                Q(owner=user) |
-                Q(assigned_to_users=user) |
-                Q(created_by=user) |
-                Q(assigned_to_group__group_members=user))
-            if not GroupAndPermission.objects.filter(
-                    group=group,
-                    company=company,
-                    permission__permission_category='workflow',
-                    permission__slug='workflow_view-archived',
-                    has_permission=True).exists():
-                workflow_queryset = workflow_queryset.exclude(
-                    status__in=[2, 3])
-            workflow_queryset_ids = list(
-                workflow_queryset.values_list(
-                    "id", flat=True).distinct())
-        else:
-            workflow_queryset_ids = []
-        # get list of existing workflow rank
-        existing_workflow_rank_id = list(WorkflowRank.objects.filter(
-            user=user).values_list(
-            'workflow__id', flat=True).distinct())
-        # get removed workflow from user
-        removed_workflow_rank = Workflow.objects.filter(
-            id__in=existing_workflow_rank_id).exclude(
-            id__in=workflow_queryset_ids)
-        removed_workflow_rank_id = list(
-            removed_workflow_rank.values_list('id', flat=True).distinct())
-        WorkflowRank.objects.filter(
-            user=user,
-            workflow__id__in=removed_workflow_rank_id
-        ).delete()
-        for index, active_workflowrank in enumerate(
-                WorkflowRank.objects.filter(user=user).order_by('rank')):
-            active_workflowrank.rank = index + 1
-            active_workflowrank.is_active = True
-            active_workflowrank.save()
-        # get new workflow where user have permission
-        new_assign_workflow = Workflow.objects.filter(
-            id__in=workflow_queryset_ids).exclude(
-            id__in=existing_workflow_rank_id)
-        for workflow in new_assign_workflow:
-            user_workflow_last_rank = WorkflowRank.objects.filter(
-                user=user, is_active=True).order_by('-rank').first()
-            if not user_workflow_last_rank:
-                WorkflowRank.objects.create(
-                    user=user, workflow=workflow, rank=1)
-            else:
-                WorkflowRank.objects.create(
-                    user=user, workflow=workflow,
-                    rank=int(user_workflow_last_rank.rank) + 1)
-
-
-def workgroup_add_user(instance):
-    user = instance.group_member
-    workgroup = instance.work_group
-    # task rank create
-    # get task id which is related to this workgroup
-    # and get task id which have already rank
-    task_instance = Task.objects.filter(
-        assigned_to_group=workgroup).values_list(
-        'id', flat=True).distinct()
-    existing_rank = TaskRank.objects.filter(
-        user=user).values_list(
-        'task__id', flat=True).distinct()
-    # remove those task which have rank
-    new_task = Task.objects.filter(
-        id__in=task_instance).exclude(id__in=existing_rank)
-    # create task rank
-    for completed_task in new_task.filter(status__in=[3, 4]):
-        TaskRank.objects.create(user=user, task=completed_task, rank=0)
-    for task in new_task.exclude(status__in=[3, 4]):
-        user_task_last_rank = TaskRank.objects.filter(
-            user=user, is_active=True).order_by('-rank').first()
-        if not user_task_last_rank:
-            TaskRank.objects.create(user=user, task=task, rank=1)
-        else:
-            TaskRank.objects.create(
-                user=user, task=task,
-                rank=int(user_task_last_rank.rank) + 1)
-    # project rank create
-    # get project which is related to this workgroup
-    # and get project which have already rank
-    project_instance = Project.objects.filter(
-        assigned_to_group=workgroup).values_list(
-        'id', flat=True).distinct()
-    existing_rank = ProjectRank.objects.filter(
-        user=user).values_list(
-        'project__id', flat=True).distinct()
-    # remove those project which have rank
-    new_project = Project.objects.filter(
-        id__in=project_instance).exclude(id__in=existing_rank)
-    # create project rank
-    for project in new_project:
-        user_project_last_rank = ProjectRank.objects.filter(
-            user=user, is_active=True).order_by('-rank').first()
-        if not user_project_last_rank:
-            ProjectRank.objects.create(
-                user=user, project=project, rank=1)
-        else:
-            ProjectRank.objects.create(
-                user=user, project=project,
-                rank=int(user_project_last_rank.rank) + 1)
-    # workflow rank create
-    # get workflow which is related to this workgroup
-    # and get workflow which have already rank
-    workflow_instance = Workflow.objects.filter(
-        assigned_to_group=workgroup
-    ).values_list('id', flat=True).distinct()
-    existing_rank = WorkflowRank.objects.filter(
-        user=user).values_list(
-        'workflow__id', flat=True).distinct()
-    # remove those workflow which have rank
-    new_workflow = Workflow.objects.filter(
-        id__in=workflow_instance).exclude(id__in=existing_rank)
-    # create workflow rank
-    for workflow in new_workflow:
-        user_workflow_last_rank = WorkflowRank.objects.filter(
-            user=user, is_active=True).order_by('-rank').first()
-        if not user_workflow_last_rank:
-            WorkflowRank.objects.create(
-                user=user, workflow=workflow, rank=1)
-        else:
-            WorkflowRank.objects.create(
-                user=user, workflow=workflow,
-                rank=int(user_workflow_last_rank.rank) + 1)
-
-
-def workgroup_remove_user(instance):
-    user = instance.group_member
-    workgroup = instance.work_group
-    # remove task rank
-    # get task which have this work group and
-    #  not direct assign with this user
-    task_instance = Task.objects.filter(
-        assigned_to_group=workgroup).exclude(
-        Q(assigned_to=user) | Q(created_by=user)
-    ).values_list('id', flat=True).distinct()
-    TaskRank.objects.filter(user=user,
-                            task__id__in=task_instance).delete()
-    # re-rank of available task
-    for index, active_taskrank in enumerate(
-            TaskRank.objects.filter(user=user).exclude(
-                task__status__in=[3, 4]).order_by('rank')):
-        active_taskrank.rank = index + 1
-        active_taskrank.is_active = True
-        active_taskrank.save()
-    # remove project rank
-    # get project which have this workgroup and
-    #   not direct assign with this user
-    project_instance = Project.objects.filter(
-        assigned_to_group=workgroup).exclude(
-        Q(assigned_to_users=user) | Q(created_by=user) |
-        Q(created_by=user)).values_list('id', flat=True).distinct()
-    ProjectRank.objects.filter(
-        user=user, project__id__in=project_instance).delete()
-    # re-rank of available project
-    for index, active_projectrank in enumerate(
-            ProjectRank.objects.filter(user=user).order_by('rank')):
-        active_projectrank.rank = index + 1
-        active_projectrank.is_active = True
-        active_projectrank.save()
-    # remove workflow rank
-    # get workflow which have this workgroup and
-    #   not direct assign with this user
-    workflow_instance = Workflow.objects.filter(
-        assigned_to_group=workgroup).exclude(
-        Q(assigned_to_users=user) | Q(created_by=user) |
-        Q(created_by=user)
-    ).values_list('id', flat=True).distinct()
-    WorkflowRank.objects.filter(
-        user=user,
-        workflow__id__in=workflow_instance).delete()
-    # rerank of available task
-    for index, active_workflowrank in enumerate(
-            WorkflowRank.objects.filter(
-                user=user).order_by('rank')):
-        active_workflowrank.rank = index + 1
-        active_workflowrank.is_active = True
-        active_workflowrank.save()
+    invalidate_permission_snapshot(group)
+    users = list(User.objects.filter(
+        group=group, company=organization).select_related(
+        'group', 'company'))
+    for index, user in enumerate(users):
+        sync_user_ranks(user)
+        if progress:
+            progress(index + 1, len(users))
+    user_ids = [user.id for user in users]
+    for rank_model, model, field, archived_status in PERMISSION_RANK_MODELS:
+        renumber_ranks(active_rank_queryset(rank_model, user_ids))
+
+
+def _permission_update_key(group_id):
+    return 'permission_group_update:status:{}'.format(group_id)
+
+
+def _set_permission_update_status(group_id, **status):
+    cache.set(_permission_update_key(group_id), status,
+              PERMISSION_UPDATE_TIMEOUT)
+
+
+def permission_group_update_status(group_id):
+    return cache.get(_permission_update_key(group_id)) or {
+        'state': 'idle'}
+
+
+def schedule_permission_group_update(group):
+    """
+    Publish the permission change of group, the worker syncs the ranks
+    of its users through the permission event consumers.
+    """
+    invalidate_permission_snapshot(group)
+    _set_permission_update_status(
+        group.id, state='queued', queued_at=timezone.now().isoformat())
+    return publish_permission_event('group_permissions', group_id=group.id)
+
+
+def run_permission_group_update(group_id):
+    started_at = timezone.now().isoformat()
+
+    def progress(done, total):
+        _set_permission_update_status(
+            group_id, state='running', started_at=started_at,
+            done=done, total=total)
+
+    try:
+        group = Group.objects.filter(id=group_id).first()
+        progress(0, None)
+        if group:
+            permission_group_update(group, progress=progress)
+    except Exception as e:
+        _set_permission_update_status(
+            group_id, state='failed', started_at=started_at, error=str(e))
+        raise
+    _set_permission_update_status(
+        group_id, state='done', started_at=started_at,
+        finished_at=timezone.now().isoformat())
 
 
 def task_rerank_alluser(instance):
@@ -1126,42 +755,24 @@ def task_rerank_alluser(instance):
         id__in=related_users)
     # remove task rank user which don't
     # have permission and re-rank it
-    for user in removed_user:
-        TaskRank.objects.filter(
-            user=user, task=task).delete()
-        for index, active_taskrank in enumerate(
-                TaskRank.objects.filter(
-                    user=user).exclude(rank=0).order_by('rank')):
-            active_taskrank.rank = index + 1
-            active_taskrank.is_active = True
-            active_taskrank.save()
+    removed_user_ids = list(removed_user.values_list('id', flat=True))
+    TaskRank.objects.filter(
+        user__in=removed_user_ids, task=task).delete()
+    renumber_ranks(TaskRank.objects.filter(
+        user__in=removed_user_ids).exclude(rank=0))
     if task.status in [3, 4]:
-        users = TaskRank.objects.filter(
-            task=instance).values_list('user_id', flat=True)
-        for user in users:
-            TaskRank.objects.filter(user__id=user,
-                                    task=task).update(rank=0)
-            for index, active_taskrank in enumerate(
-                    TaskRank.objects.filter(
-                        user__id=user
-                    ).exclude(rank=0).order_by('rank')):
-                active_taskrank.rank = index + 1
-                active_taskrank.is_active = True
-                active_taskrank.save()
-        for user in new_assigned_user:
-            TaskRank.objects.create(user=user, task=task, rank=0)
+        users = list(TaskRank.objects.filter(
+            task=instance).values_list('user_id', flat=True))
+        TaskRank.objects.filter(task=instance).update(rank=0)
+        renumber_ranks(TaskRank.objects.filter(
+            user__in=users).exclude(rank=0))
+        bulk_create_ranks(
+            TaskRank, [(user.id, task.id) for user in new_assigned_user],
+            [task.id])
     else:
         # create task rank for task related user
-        for user in new_assigned_user:
-            user_task_last_rank = TaskRank.objects.filter(
-                user=user).exclude(rank=0).order_by('-rank').first()
-            if not user_task_last_rank:
-                TaskRank.objects.create(
-                    user=user, task=task, rank=1)
-            else:
-                TaskRank.objects.create(
-                    user=user, task=task,
-                    rank=int(user_task_last_rank.rank) + 1)
+        bulk_create_ranks(
+            TaskRank, [(user.id, task.id) for user in new_assigned_user])
 
 
 @shared_task
@@ -1 +1,982 @@
-# from django.test import TestCase
+import datetime
+import importlib
+import io
+import json
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from authentication.events import (
+    PERMISSION_EVENT_MAX_ATTEMPTS,
+    pending_permission_events,
+    process_permission_events,
+    publish_permission_event,
+)
+from authentication.models import Group, GroupAndPermission, Organization, Permission, PermissionEvent, User
+from authentication.permission_snapshot import get_permission_snapshot
+from base.api.pagination import RankCursorPagination, _after_q, _ordering_keys
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F, Q
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_tenants.test.cases import TenantTestCase
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import permission_events, ranking
+from .api.views.tasks import TaskStatisticsViewSet
+from .counters import rollover_passed_due, stale_task_counters, task_counters
+from .dashboard import DashboardSummary, load_dashboard_rollup
+from .helpers import archive_project, archive_workflow, complete_project, complete_workflow
+from .models import (
+    Attachment,
+    DashboardRollup,
+    GlobalCustomField,
+    GlobalCustomFieldValue,
+    Project,
+    ProjectRank,
+    Tag,
+    Task,
+    TaskRank,
+    WorkGroup,
+    WorkGroupMember,
+    Workflow,
+    WorkflowRank,
+)
+from .permission_events import PERMISSION_EVENT_CONSUMERS
+from .ranking import RANK_GAP, materialize_ranks, move_rank, rank_key_between
+from .searchindex import SEARCH_INDEX, refresh_search_index, search_objects
+from .views import (
+    GlobalSearchViewSet,
+    ProjectStatisticsViewSet,
+    ProjectViewSet,
+    WorkflowStatisticsViewSet,
+    WorkflowViewSet,
+)
+
+VIEW_ALL_PERMISSIONS = ['project_project-view-all', 'workflow_workflow-view-all', 'task_task-view-all']
+VIEW_PERMISSIONS = ['project_project-view', 'workflow_workflow-view', 'task_task-view']
+ARCHIVED_PERMISSIONS = ['project_view-archived', 'workflow_view-archived', 'task_view-archived']
+
+
+class ProjectsTestCase(TenantTestCase):
+    """
+    A company of the test tenant with helpers building its groups, users,
+    projects, workflows and tasks, and calling the api as one of its users.
+    """
+
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Test'
+        tenant.paid_until = datetime.date(2100, 1, 1)
+        tenant.on_trial = False
+        tenant.owner_email = 'owner@example.com'
+        tenant.owner_password = 'password'
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.company = Organization.objects.create(
+            name='Test Company', owner_email='owner@example.com', owner_name='Owner'
+        )
+
+    def permission(self, slug):
+        # slugs are built from the category and the name, see Permission.save
+        category, name = slug.split('_', 1)
+        return Permission.objects.filter(slug=slug).first() or Permission.objects.create(
+            name=name, permission_category=category
+        )
+
+    def create_group(self, name, slugs):
+        group = Group.objects.create(name=name, organization=self.company)
+        for slug in slugs:
+            GroupAndPermission.objects.create(
+                group=group, permission=self.permission(slug), company=self.company, has_permission=True
+            )
+        return group
+
+    def create_user(self, name, group):
+        return User.objects.create(
+            email=name + '@example.com', first_name=name, last_name='Test', group=group, company=self.company
+        )
+
+    def create_workgroup(self, name, members):
+        workgroup = WorkGroup.objects.create(name=name, organization=self.company)
+        for member in members:
+            WorkGroupMember.objects.create(work_group=workgroup, group_member=member)
+        return workgroup
+
+    def create_project(self, owner, **kwargs):
+        return Project.objects.create(
+            name=kwargs.pop('name', 'Project'), organization=self.company, owner=owner, created_by=owner, **kwargs
+        )
+
+    def create_workflow(self, project, owner, **kwargs):
+        return Workflow.objects.create(
+            name=kwargs.pop('name', 'Workflow'),
+            project=project,
+            organization=self.company,
+            owner=owner,
+            created_by=owner,
+            **kwargs
+        )
+
+    def create_task(self, workflow, created_by, **kwargs):
+        return Task.objects.create(
+            name=kwargs.pop('name', 'Task'),
+            workflow=workflow,
+            organization=self.company,
+            created_by=created_by,
+            **kwargs
+        )
+
+    def get(self, viewset, user, params=None, actions=None):
+        # a fresh user, its group memoises the permission snapshot of a request
+        user = User.objects.select_related('group', 'company').get(pk=user.pk)
+        request = self.factory.get('/', params or {})
+        force_authenticate(request, user=user)
+        response = viewset.as_view(actions or {'get': 'list'})(request)
+        self.assertEqual(response.status_code, 200, getattr(response, 'data', None))
+        return response
+
+    def count_queries(self, viewset, user, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            self.get(viewset, user, params)
+        return len(queries)
+
+
+class ListQueryCountTests(ProjectsTestCase):
+    """
+    The project and workflow lists run the same queries whatever the page
+    size, the related rows of a page are loaded by ListPageLoader.
+    """
+
+    def setUp(self):
+        super(ListQueryCountTests, self).setUp()
+        self.user = self.create_user('lister', self.create_group('Lister', VIEW_ALL_PERMISSIONS))
+        member = self.create_user('member', self.create_group('Member', VIEW_PERMISSIONS))
+        for n in range(6):
+            project = self.create_project(self.user, name='Project {}'.format(n))
+            project.assigned_to_users.add(member)
+            Attachment.objects.create(
+                document_name='project-{}.txt'.format(n), project=project, organization=self.company
+            )
+            for m in range(2):
+                workflow = self.create_workflow(project, self.user, name='Workflow {}.{}'.format(n, m))
+                workflow.assigned_to_users.add(member)
+                Attachment.objects.create(
+                    document_name='workflow-{}-{}.txt'.format(n, m), workflow=workflow, organization=self.company
+                )
+                for status in [1, 3]:
+                    task = self.create_task(workflow, self.user, assigned_to=member, status=status)
+                    Attachment.objects.create(
+                        document_name='task-{}.txt'.format(task.id), task=task, organization=self.company
+                    )
+
+    def assertPageSizeFree(self, viewset, params=None):
+        params = dict(params or {})
+        # the first request caches the permission snapshot
+        self.get(viewset, self.user, dict(params, limit=1))
+        small = self.count_queries(viewset, self.user, dict(params, limit=2))
+        large = self.count_queries(viewset, self.user, dict(params, limit=6))
+        self.assertEqual(small, large)
+
+    def test_project_list(self):
+        response = self.get(ProjectViewSet, self.user, {'limit': 6})
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertPageSizeFree(ProjectViewSet)
+
+    def test_project_list_fields(self):
+        self.assertPageSizeFree(ProjectViewSet, {'fields': 'id,name,owner,workflow'})
+
+    def test_stored_project_list(self):
+        materialize_ranks(self.user, ProjectRank)
+        self.assertPageSizeFree(ProjectViewSet)
+
+    def test_workflow_list(self):
+        response = self.get(WorkflowViewSet, self.user, {'limit': 6})
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertPageSizeFree(WorkflowViewSet)
+
+    def test_stored_workflow_list(self):
+        materialize_ranks(self.user, WorkflowRank)
+        self.assertPageSizeFree(WorkflowViewSet)
+
+
+def _related_q(user, lookups):
+    q_obj = Q()
+    for lookup in lookups:
+        q_obj |= Q(**{lookup: user})
+    return q_obj
+
+
+def _old_visible_ids(user, model, object_type, lookups, archived_statuses):
+    """
+    Ids the statistics counted before they were aggregated, loaded in
+    python from the permission of user as the endpoints did.
+    """
+    snapshot = get_permission_snapshot(user)
+    if '{0}_{0}-view-all'.format(object_type) in snapshot:
+        queryset = model.objects.filter(organization=user.company)
+        if object_type == 'task':
+            queryset = model.objects.filter(
+                Q(is_private=True, organization=user.company) & _related_q(user, lookups)
+                | Q(is_private=False, organization=user.company)
+            )
+    elif '{0}_{0}-view'.format(object_type) in snapshot:
+        queryset = model.objects.filter(Q(organization=user.company), _related_q(user, lookups))
+    else:
+        return set()
+    if object_type + '_view-archived' not in snapshot:
+        queryset = queryset.exclude(status__in=archived_statuses)
+    return set(queryset.distinct('id').values_list('id', flat=True))
+
+
+def _old_task_totals(task_ids, company, date_today):
+    tasks = Task.objects.filter(pk__in=list(task_ids), organization=company)
+    active = tasks.exclude(status__in=[3, 4])
+    return {
+        'total_task': tasks.count(),
+        'completed_task': tasks.filter(status__in=[3, 4]).count(),
+        'low': active.filter(importance=1).count(),
+        'mid': active.filter(importance=2).count(),
+        'high': active.filter(importance=3).count(),
+        'due_today': active.filter(due_date__date=date_today).count(),
+        'total_due': active.filter(due_date__date__lt=date_today).count(),
+    }
+
+
+def _old_visible_task_ids(user):
+    return _old_visible_ids(
+        user, Task, 'task', ['assigned_to', 'created_by', 'assigned_to_group__group_members'], [3, 4]
+    )
+
+
+def _old_visible_workflow_ids(user):
+    return _old_visible_ids(
+        user,
+        Workflow,
+        'workflow',
+        ['owner', 'assigned_to_users', 'created_by', 'assigned_to_group__group_members'],
+        [2, 3],
+    )
+
+
+def old_task_statistics(tasks, date_today):
+    """
+    tasks_statistic body as the seven counts of the endpoint returned it.
+    """
+    active = tasks.exclude(status__in=[3, 4])
+    return {
+        'high': active.filter(importance=3).count(),
+        'med': active.filter(importance=2).count(),
+        'low': active.filter(importance=1).count(),
+        'completed': tasks.filter(status__in=[3, 4]).count(),
+        'total_task': tasks.count(),
+        'due_today': active.filter(due_date__date=date_today).count(),
+        'total_due': active.filter(due_date__date__lt=date_today).count(),
+    }
+
+
+def old_workflow_statistics(user, workflows, date_today):
+    """
+    workflows_statistic body as the endpoint built it from id lists
+    intersected in python.
+    """
+    workflow_task_ids = set(
+        Task.objects.filter(
+            organization=user.company, workflow_id__in=list(workflows.values_list('id', flat=True))
+        ).values_list('id', flat=True)
+    )
+    task_ids = workflow_task_ids & _old_visible_task_ids(user)
+    return dict(total_workflow=workflows.count(), **_old_task_totals(task_ids, user.company, date_today))
+
+
+def old_project_statistics(user, projects, date_today):
+    """
+    projects_statistic body as the endpoint built it from id lists
+    intersected in python.
+    """
+    project_workflow_ids = set(
+        Workflow.objects.filter(
+            project_id__in=list(projects.values_list('id', flat=True)), organization=user.company
+        ).values_list('id', flat=True)
+    )
+    workflow_ids = project_workflow_ids & _old_visible_workflow_ids(user)
+    workflow_task_ids = set(
+        Task.objects.filter(workflow_id__in=list(workflow_ids), organization=user.company).values_list('id', flat=True)
+    )
+    task_ids = workflow_task_ids & _old_visible_task_ids(user)
+    return dict(
+        total_project=projects.count(),
+        total_workflow=len(workflow_ids),
+        **_old_task_totals(task_ids, user.company, date_today)
+    )
+
+
+class StatisticsTests(ProjectsTestCase):
+    """
+    The aggregated statistics bodies match the ones the endpoints built
+    before, for view-all, view-only and view-archived users and for a
+    member of several workgroups the tasks are assigned to.
+    """
+
+    def setUp(self):
+        super(StatisticsTests, self).setUp()
+        self.admin = self.create_user('admin', self.create_group('Admin', VIEW_ALL_PERMISSIONS))
+        self.viewer = self.create_user('viewer', self.create_group('Viewer', VIEW_PERMISSIONS))
+        self.archivist = self.create_user(
+            'archivist', self.create_group('Archivist', VIEW_ALL_PERMISSIONS + ARCHIVED_PERMISSIONS)
+        )
+        self.member = self.create_user('member', self.create_group('Member', VIEW_PERMISSIONS))
+        self.users = [self.admin, self.viewer, self.archivist, self.member]
+        # the member is in all three, joining the task workgroups repeats each task three times
+        workgroups = [self.create_workgroup('Workgroup {}'.format(n), [self.member]) for n in range(3)]
+        now = timezone.now()
+        due_dates = [None, now, now - datetime.timedelta(days=3), now + datetime.timedelta(days=3)]
+        self.member_task_ids = set()
+        for project_status in [1, 2]:
+            project = self.create_project(self.admin, status=project_status)
+            project.assigned_to_users.add(self.viewer)
+            project.assigned_to_group.add(*workgroups)
+            for workflow_status in [1, 3]:
+                workflow = self.create_workflow(project, self.admin, status=workflow_status)
+                workflow.assigned_to_group.add(*workgroups[:2])
+                if workflow_status == 1:
+                    workflow.assigned_to_users.add(self.viewer)
+                for n, (status, importance) in enumerate([(1, 1), (2, 2), (1, 3), (3, 3), (4, 1), (2, 3)]):
+                    task = self.create_task(
+                        workflow,
+                        self.admin,
+                        status=status,
+                        importance=importance,
+                        due_date=due_dates[n % len(due_dates)],
+                        is_private=n == 2,
+                        assigned_to=self.viewer if n in [0, 3] else self.member if n == 5 else None,
+                    )
+                    if n in [1, 3, 5]:
+                        task.assigned_to_group.add(*workgroups)
+                        self.member_task_ids.add(task.id)
+        other = self.create_project(self.archivist, status=3)
+        self.create_task(self.create_workflow(other, self.archivist), self.archivist, importance=2, is_private=True)
+
+    def date_today(self):
+        return datetime.datetime.utcnow().date()
+
+    def queryset(self, viewset, user):
+        # the objects the endpoint counts for user
+        request = self.factory.get('/')
+        request.user = user
+        return viewset(request=request, action='list').get_queryset()
+
+    def test_task_statistics(self):
+        for user in self.users:
+            with self.subTest(user=user.first_name):
+                expected = old_task_statistics(self.queryset(TaskStatisticsViewSet, user), self.date_today())
+                self.assertEqual(self.get(TaskStatisticsViewSet, user).data, expected)
+
+    def test_workflow_statistics(self):
+        for user in self.users:
+            with self.subTest(user=user.first_name):
+                workflows = self.queryset(WorkflowStatisticsViewSet, user)
+                expected = old_workflow_statistics(user, workflows, self.date_today())
+                self.assertEqual(self.get(WorkflowStatisticsViewSet, user).data, expected)
+
+    def test_project_statistics(self):
+        for user in self.users:
+            with self.subTest(user=user.first_name):
+                projects = self.queryset(ProjectStatisticsViewSet, user)
+                expected = old_project_statistics(user, projects, self.date_today())
+                self.assertEqual(self.get(ProjectStatisticsViewSet, user).data, expected)
+
+    def test_workgroup_tasks_counted_once(self):
+        tasks = Task.objects.filter(id__in=self.member_task_ids).exclude(status__in=[3, 4])
+        data = self.get(TaskStatisticsViewSet, self.member).data
+        self.assertEqual(data['total_task'], tasks.count())
+        self.assertEqual(data['high'] + data['med'] + data['low'], tasks.count())
+        # the archived workflows are left out without workflow_view-archived
+        data = self.get(WorkflowStatisticsViewSet, self.member).data
+        self.assertEqual(data['total_task'], tasks.filter(workflow__status=1).count())
+
+
+class SearchIndexTests(ProjectsTestCase):
+    """
+    search_document builds the search_vector the 0076 migration backfilled.
+    """
+
+    def setUp(self):
+        super(SearchIndexTests, self).setUp()
+        user = self.create_user('searcher', self.create_group('Searcher', VIEW_ALL_PERMISSIONS))
+        tag = Tag.objects.create(tag='Litigation', organization=self.company)
+        project = self.create_project(
+            user,
+            name='Codal Matter',
+            description='Merger of two companies',
+            custom_fields_value={'1': 'Acme Holdings'},
+        )
+        workflow = self.create_workflow(
+            project, user, name='Discovery', description='Depositions', custom_fields_value={'1': 'Phase one'}
+        )
+        task = self.create_task(
+            workflow, user, name='Draft Brief', description='Due to the clerk', custom_fields_value={'1': 'Urgent'}
+        )
+        document = Attachment.objects.create(
+            document_name='engagement-letter.pdf', project=project, organization=self.company
+        )
+        self.objects = {'project': project, 'workflow': workflow, 'task': task, 'document': document}
+        field = GlobalCustomField.objects.create(label='Court', is_required=False)
+        for object_type, instance in self.objects.items():
+            getattr(instance, SEARCH_INDEX[object_type][1]).add(tag)
+            if SEARCH_INDEX[object_type][3]:
+                GlobalCustomFieldValue.objects.create(
+                    global_custom_field=field,
+                    value='Northern District',
+                    object_id=instance.id,
+                    content_type=ContentType.objects.get_for_model(instance),
+                )
+
+    def search_vectors(self):
+        return {
+            object_type: str(type(instance).objects.values_list('search_vector', flat=True).get(pk=instance.pk))
+            for object_type, instance in self.objects.items()
+        }
+
+    def test_backfill_matches_search_document(self):
+        for object_type, instance in self.objects.items():
+            refresh_search_index(object_type, [instance.pk])
+        indexed = self.search_vectors()
+        self.assertIn("'litigation':3B", indexed['project'])
+        self.assertIn("'northern':", indexed['task'])
+        for object_type, instance in self.objects.items():
+            type(instance).objects.filter(pk=instance.pk).update(search_vector=None)
+        migration = importlib.import_module('projects.migrations.0076_search_vectors')
+        with connection.cursor() as cursor:
+            cursor.execute(migration.BACKFILL_SQL)
+        self.assertEqual(self.search_vectors(), indexed)
+
+    def test_words_match_from_their_start(self):
+        projects = Project.objects.filter(organization=self.company)
+        self.assertTrue(search_objects(projects, 'project', 'cod').exists())
+        self.assertTrue(search_objects(projects, 'project', 'matter litig').exists())
+        # infix matches the former icontains search had are lost
+        self.assertFalse(search_objects(projects, 'project', 'dal').exists())
+
+
+class DocumentSearchTests(ProjectsTestCase):
+    """
+    The global search finds documents by their text only through a
+    project, workflow or task the user can see.
+    """
+
+    def setUp(self):
+        super(DocumentSearchTests, self).setUp()
+        owner = self.create_user('owner', self.create_group('Owner', VIEW_ALL_PERMISSIONS))
+        self.user = self.create_user('reader', self.create_group('Reader', VIEW_PERMISSIONS))
+        visible = self.create_project(owner, name='Visible')
+        visible.assigned_to_users.add(self.user)
+        hidden = self.create_project(owner, name='Hidden')
+        self.documents = {}
+        for project in [visible, hidden]:
+            document = Attachment.objects.create(
+                document_name='{}.pdf'.format(project.name.lower()), project=project, organization=self.company
+            )
+            Attachment.objects.filter(pk=document.pk).update(
+                document_text='Settlement of the indemnity claim', document_text_status=Attachment.TEXT_EXTRACTED
+            )
+            refresh_search_index('document', [document.pk])
+            self.documents[project.name] = document
+
+    def search(self, user, text):
+        response = self.get(GlobalSearchViewSet, user, {'search': text, 'model_type': '4'})
+        return [document['id'] for document in response.data['document']]
+
+    def test_text_matches_only_visible_documents(self):
+        self.assertEqual(self.search(self.user, 'indemnity'), [self.documents['Visible'].id])
+
+    def test_text_matches_without_a_matching_parent(self):
+        # neither project's name matches, the view-all user sees both documents
+        viewer = self.create_user('viewer', self.create_group('Viewer', VIEW_ALL_PERMISSIONS))
+        self.assertEqual(
+            sorted(self.search(viewer, 'settlement')), sorted(document.id for document in self.documents.values())
+        )
+
+
+class TaskCounterTests(ProjectsTestCase):
+    """
+    The stored task counters of workflows and projects match a recount of
+    their tasks after every change projects.counters follows.
+    """
+
+    def setUp(self):
+        super(TaskCounterTests, self).setUp()
+        self.user = self.create_user('counter', self.create_group('Counter', VIEW_ALL_PERMISSIONS))
+        self.project = self.create_project(self.user, name='Counted')
+        self.other_project = self.create_project(self.user, name='Other')
+        self.workflow = self.create_workflow(self.project, self.user, name='First')
+        self.other_workflow = self.create_workflow(self.other_project, self.user, name='Second')
+        past = timezone.now() - datetime.timedelta(days=2)
+        self.tasks = [
+            self.create_task(self.workflow, self.user, name='Open'),
+            self.create_task(self.workflow, self.user, name='Late', due_date=past),
+            self.create_task(self.workflow, self.user, name='Done', status=3, due_date=past),
+            self.create_task(self.other_workflow, self.user, name='Elsewhere'),
+        ]
+
+    def assertCountersFresh(self):
+        self.assertEqual(list(stale_task_counters(Workflow, 'workflow')), [])
+        self.assertEqual(list(stale_task_counters(Project, 'workflow__project')), [])
+
+    def counters(self, instance):
+        return task_counters(type(instance).objects.get(pk=instance.pk))
+
+    def test_create(self):
+        self.assertCountersFresh()
+        self.assertEqual(self.counters(self.workflow), {'total_task': 3, 'completed_task': 1, 'passed_due': 1})
+        self.assertEqual(self.counters(self.project), {'total_task': 3, 'completed_task': 1, 'passed_due': 1})
+
+    def test_delete(self):
+        self.tasks[1].delete()
+        self.assertCountersFresh()
+        self.assertEqual(self.counters(self.workflow)['passed_due'], 0)
+
+    def test_status_change(self):
+        task = Task.objects.get(pk=self.tasks[1].pk)
+        task.status = 3
+        task.save()
+        self.assertCountersFresh()
+        self.assertEqual(self.counters(self.workflow), {'total_task': 3, 'completed_task': 2, 'passed_due': 0})
+
+    def test_task_workflow_move(self):
+        task = Task.objects.get(pk=self.tasks[1].pk)
+        task.workflow = self.other_workflow
+        task.save()
+        self.assertCountersFresh()
+        self.assertEqual(self.counters(self.other_project)['total_task'], 2)
+
+    def test_workflow_project_move(self):
+        workflow = Workflow.objects.get(pk=self.workflow.pk)
+        workflow.project = self.other_project
+        workflow.save()
+        self.assertCountersFresh()
+        self.assertEqual(self.counters(self.project)['total_task'], 0)
+
+    def test_bulk_complete_and_archive(self):
+        for bulk_update, instance in [
+            (lambda: complete_workflow(self.workflow, self.user), self.workflow),
+            (lambda: complete_project(self.other_project, self.user), self.other_project),
+            (lambda: archive_workflow(self.workflow), self.workflow),
+            (lambda: archive_project(self.project), self.project),
+        ]:
+            bulk_update()
+            self.assertCountersFresh()
+            self.assertEqual(self.counters(instance)['completed_task'], self.counters(instance)['total_task'])
+
+    def test_rollover_passed_due(self):
+        # a due date passing sends no signal, only the nightly recount sees it
+        Task.objects.filter(pk=self.tasks[0].pk).update(due_date=timezone.now() - datetime.timedelta(days=2))
+        self.assertNotEqual(list(stale_task_counters(Workflow, 'workflow')), [])
+        rollover_passed_due()
+        self.assertCountersFresh()
+        self.assertEqual(self.counters(self.workflow)['passed_due'], 2)
+
+    def test_repair_command(self):
+        Workflow.objects.filter(pk=self.workflow.pk).update(total_task=10, passed_due=5)
+        Project.objects.filter(pk=self.other_project.pk).update(completed_task=7)
+        output = io.StringIO()
+        call_command('repair_task_counters', schemas=[connection.schema_name], stdout=output)
+        self.assertIn('2 stale task counters', output.getvalue())
+        self.assertEqual(self.counters(self.workflow)['total_task'], 10)
+        call_command('repair_task_counters', schemas=[connection.schema_name], fix=True, stdout=io.StringIO())
+        self.assertCountersFresh()
+
+
+class KeysetPaginationTests(ProjectsTestCase):
+    """
+    Walking a list with RankCursorPagination cursors gives the rows of
+    offset pages on the same ordering, none skipped or repeated across
+    ties and NULLs.
+    """
+
+    def setUp(self):
+        super(KeysetPaginationTests, self).setUp()
+        user = self.create_user('pager', self.create_group('Pager', VIEW_ALL_PERMISSIONS))
+        workflow = self.create_workflow(self.create_project(user), user)
+        self.groups = [self.create_workgroup('Group {}'.format(n), [user]) for n in range(2)]
+        due_date = timezone.now().replace(microsecond=0)
+        for n in range(13):
+            task = self.create_task(
+                workflow,
+                user,
+                name='Task {}'.format(n),
+                importance=n % 3 + 1,
+                # a few due dates shared by many tasks, every fourth left empty
+                due_date=None if n % 4 == 0 else due_date + datetime.timedelta(days=n % 2),
+            )
+            task.assigned_to_group.add(*self.groups[: n % 2 + 1])
+        self.tasks = Task.objects.filter(workflow=workflow)
+
+    def page(self, queryset, params):
+        paginator = RankCursorPagination()
+        page = paginator.paginate_queryset(queryset, Request(self.factory.get('/', params)))
+        return paginator, [task.id for task in page]
+
+    def walk(self, queryset, limit=2):
+        ids, cursor = [], ''
+        while True:
+            paginator, page_ids = self.page(queryset, {'cursor': cursor, 'limit': limit})
+            self.assertTrue(paginator.cursor_mode)
+            ids.extend(page_ids)
+            next_link = paginator.get_next_link()
+            if not next_link:
+                return ids
+            cursor = parse_qs(urlparse(next_link).query)['cursor'][0]
+
+    def offset_ids(self, queryset):
+        ids, offset = [], 0
+        while True:
+            paginator, page_ids = self.page(queryset, {'offset': offset, 'limit': 5})
+            ids.extend(page_ids)
+            if not paginator.get_next_link():
+                return ids
+            offset += 5
+
+    def assertSameRows(self, queryset, tie_breaker):
+        ids = self.walk(queryset)
+        self.assertEqual(len(ids), len(set(ids)))
+        # offset pages are only stable once the id tie breaker the cursor adds is explicit
+        self.assertEqual(ids, self.offset_ids(queryset.order_by(*queryset.query.order_by, tie_breaker)))
+
+    def test_ascending_keys(self):
+        self.assertEqual(
+            _ordering_keys(self.tasks.order_by('importance', 'due_date')),
+            [('importance', False, True), ('due_date', False, True), ('id', False, True)],
+        )
+        self.assertSameRows(self.tasks.order_by('importance', 'due_date'), 'id')
+
+    def test_descending_keys(self):
+        # descending keys sort NULLs first, as postgres does
+        self.assertEqual(
+            _ordering_keys(self.tasks.order_by('-importance', '-due_date')),
+            [('importance', True, False), ('due_date', True, False), ('id', True, False)],
+        )
+        self.assertSameRows(self.tasks.order_by('-importance', '-due_date'), '-id')
+
+    def test_mixed_keys(self):
+        queryset = self.tasks.order_by(F('due_date').asc(nulls_first=True), '-importance')
+        self.assertEqual(
+            _ordering_keys(queryset), [('due_date', False, False), ('importance', True, False), ('id', True, False)]
+        )
+        self.assertSameRows(queryset, '-id')
+
+    def test_after_q_on_ties(self):
+        keys = _ordering_keys(self.tasks.order_by('importance', 'due_date'))
+        task = self.tasks.filter(due_date__isnull=True).order_by('importance', 'id').first()
+        after = self.tasks.filter(_after_q(keys, [task.importance, None, task.id]))
+        expected = self.tasks.filter(Q(importance__gt=task.importance) | Q(importance=task.importance, due_date=None))
+        self.assertEqual(set(after), set(expected.filter(~Q(importance=task.importance) | Q(id__gt=task.id))))
+
+    def test_distinct_on(self):
+        # tasks of both workgroups are joined twice, DISTINCT ON id keeps them once
+        queryset = (
+            self.tasks.filter(assigned_to_group__in=self.groups).distinct('id').order_by('due_date', '-importance')
+        )
+        ids = self.walk(queryset)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(
+            ids, self.offset_ids(self.tasks.order_by(F('due_date').asc(nulls_last=True), '-importance', '-id'))
+        )
+
+    def test_invalid_cursor(self):
+        queryset = self.tasks.order_by('importance')
+        for cursor in ['not a cursor', RankCursorPagination().encode_cursor([1]), 'W10=']:
+            with self.assertRaises(NotFound) as raised:
+                self.page(queryset, {'cursor': cursor})
+            self.assertEqual(raised.exception.status_code, 404)
+
+
+class RankMoveTests(ProjectsTestCase):
+    """
+    move_rank gives the moved row a key between its new neighbours so the
+    list ordered by rank has it where the target was, the other rows
+    keep their keys until no key is left between them.
+    """
+
+    def setUp(self):
+        super(RankMoveTests, self).setUp()
+        self.user = self.create_user('ranker', self.create_group('Ranker', VIEW_ALL_PERMISSIONS))
+        workflow = self.create_workflow(self.create_project(self.user), self.user)
+        tasks = [self.create_task(workflow, self.user, name='Task {}'.format(n)) for n in range(5)]
+        closed = self.create_task(workflow, self.user, name='Closed', status=3)
+        TaskRank.objects.filter(user=self.user).delete()
+        self.ranks = [
+            TaskRank.objects.create(user=self.user, task=task, rank=(n + 1) * RANK_GAP) for n, task in enumerate(tasks)
+        ]
+        self.closed_rank = TaskRank.objects.create(user=self.user, task=closed, rank=0)
+
+    def ordered(self):
+        # order_by_rank=rank, rank 0 rows are the closed tasks listed apart
+        return list(TaskRank.objects.filter(user=self.user).exclude(rank=0).order_by('rank', 'id'))
+
+    def move(self, position, new_position):
+        ranks = self.ordered()
+        instance = ranks[position]
+        instance.rank = move_rank(TaskRank, self.user, instance, ranks[new_position].rank)
+        instance.save()
+        expected = [rank.id for rank in ranks]
+        expected.insert(new_position, expected.pop(position))
+        self.assertEqual([rank.id for rank in self.ordered()], expected)
+        return instance
+
+    def assertOnlyMoved(self, instance, keys):
+        # every other row kept its key
+        self.assertEqual(
+            {rank.id: rank.rank for rank in self.ordered() if rank.id != instance.id},
+            {rank_id: key for rank_id, key in keys.items() if rank_id != instance.id},
+        )
+
+    def keys(self):
+        return {rank.id: rank.rank for rank in self.ordered()}
+
+    def test_move_up(self):
+        keys = self.keys()
+        instance = self.move(3, 1)
+        self.assertEqual(instance.rank, RANK_GAP + RANK_GAP // 2)
+        self.assertOnlyMoved(instance, keys)
+
+    def test_move_down(self):
+        keys = self.keys()
+        instance = self.move(0, 3)
+        self.assertEqual(instance.rank, 4 * RANK_GAP + RANK_GAP // 2)
+        self.assertOnlyMoved(instance, keys)
+
+    def test_move_to_the_ends(self):
+        keys = self.keys()
+        top = self.move(2, 0)
+        # the top key is taken between 0, kept for closed tasks, and the first key
+        self.assertEqual(top.rank, RANK_GAP // 2)
+        bottom = self.move(1, 4)
+        self.assertEqual(bottom.rank, 6 * RANK_GAP)
+        self.assertOnlyMoved(top, dict(keys, **{bottom.id: bottom.rank}))
+
+    def test_same_position(self):
+        instance = self.ordered()[2]
+        self.assertEqual(move_rank(TaskRank, self.user, instance, instance.rank), instance.rank)
+
+    def test_exhausted_gap_rebalances(self):
+        for n, rank in enumerate(self.ranks):
+            TaskRank.objects.filter(pk=rank.pk).update(rank=n + 1)
+        instance = self.ordered()[4]
+        self.assertIsNone(rank_key_between(TaskRank, self.user, instance, 1))
+        callbacks = []
+        with mock.patch.object(ranking.transaction, 'on_commit', callbacks.append):
+            instance.rank = move_rank(TaskRank, self.user, instance, 1)
+        instance.save()
+        # the rows in between were shifted to make room
+        self.assertEqual(self.ordered()[0].id, instance.id)
+        with mock.patch.object(ranking, 'rebalance_ranks') as rebalance:
+            for callback in callbacks:
+                callback()
+        rebalance.delay.assert_called_once_with('taskrank', self.user.id)
+        order = [rank.id for rank in self.ordered()]
+        ranking.rebalance_ranks('taskrank', self.user.id)
+        self.assertEqual([rank.id for rank in self.ordered()], order)
+        self.assertEqual([rank.rank for rank in self.ordered()], [(n + 1) * RANK_GAP for n in range(5)])
+        self.closed_rank.refresh_from_db()
+        self.assertEqual(self.closed_rank.rank, 0)
+
+    def test_closed_rank_stays_reserved(self):
+        # dense keys with the first at 1 leave no key above 0 for the top
+        for n, rank in enumerate(self.ranks):
+            TaskRank.objects.filter(pk=rank.pk).update(rank=n + 1)
+        with mock.patch.object(ranking.transaction, 'on_commit'):
+            instance = self.move(3, 0)
+        self.assertEqual(instance.rank, 1)
+        self.closed_rank.refresh_from_db()
+        self.assertEqual(self.closed_rank.rank, 0)
+
+
+class PermissionEventTests(ProjectsTestCase):
+    """
+    The permission event outbox runs each consumer once per event, retries
+    the failed one on later drains and coalesces identical events.
+    """
+
+    def setUp(self):
+        super(PermissionEventTests, self).setUp()
+        PermissionEvent.objects.all().delete()
+        self.calls = []
+        # consumer name -> failures left, None fails forever
+        self.failures = {}
+
+    def handler(self, name):
+        def handle(event):
+            self.calls.append((name, event.id))
+            if name in self.failures and self.failures[name] != 0:
+                if self.failures[name] is not None:
+                    self.failures[name] -= 1
+                raise ValueError('{} is down'.format(name))
+
+        return handle
+
+    def drain(self):
+        consumers = tuple(
+            (name, event_types, self.handler(name)) for name, event_types, handler in PERMISSION_EVENT_CONSUMERS
+        )
+        with mock.patch.object(permission_events, 'PERMISSION_EVENT_CONSUMERS', consumers):
+            return process_permission_events()
+
+    def test_failed_consumer_is_retried_alone(self):
+        event = publish_permission_event('workgroup_member_added', user_id=1, workgroup_id=2, added_by_id=3)
+        self.failures['ranks'] = 1
+        self.assertEqual(self.drain(), 0)
+        event.refresh_from_db()
+        self.assertEqual(event.handled_by, ['caches', 'visibility'])
+        self.assertEqual(event.attempts, 1)
+        self.assertTrue(event.last_error.startswith('ranks:'))
+        self.assertIsNone(event.processed_at)
+        self.assertEqual(self.drain(), 1)
+        # caches doesn't take membership events, visibility already handled it
+        self.assertEqual(
+            [name for name, event_id in self.calls], ['visibility', 'ranks', 'ranks', 'dashboards', 'notifications']
+        )
+        event.refresh_from_db()
+        self.assertEqual(event.handled_by, [name for name, event_types, handler in PERMISSION_EVENT_CONSUMERS])
+        self.assertIsNotNone(event.processed_at)
+
+    def test_gives_up_after_max_attempts(self):
+        event = publish_permission_event('user_group', user_id=1)
+        self.failures['dashboards'] = None
+        for n in range(PERMISSION_EVENT_MAX_ATTEMPTS + 2):
+            self.drain()
+        event.refresh_from_db()
+        self.assertEqual(event.attempts, PERMISSION_EVENT_MAX_ATTEMPTS)
+        self.assertIsNone(event.processed_at)
+        self.assertFalse(pending_permission_events().exists())
+        self.assertEqual(self.calls.count(('dashboards', event.id)), PERMISSION_EVENT_MAX_ATTEMPTS)
+        self.assertEqual(self.calls.count(('ranks', event.id)), 1)
+
+    def test_duplicates_are_coalesced(self):
+        events = [publish_permission_event('user_group', user_id=1) for n in range(3)]
+        other = publish_permission_event('user_group', user_id=2)
+        self.assertEqual(self.drain(), 2)
+        self.assertEqual(
+            sorted(self.calls),
+            sorted(
+                [('ranks', events[0].id), ('dashboards', events[0].id), ('ranks', other.id), ('dashboards', other.id)]
+            ),
+        )
+        self.assertFalse(pending_permission_events().exists())
+        for event in events[1:]:
+            event.refresh_from_db()
+            self.assertEqual(event.handled_by, [name for name, event_types, handler in PERMISSION_EVENT_CONSUMERS])
+            self.assertIsNotNone(event.processed_at)
+
+
+class DashboardRollupExpiryTests(ProjectsTestCase):
+    """
+    A change to what a dashboard counts expires the rollups of the users
+    counting it, their next load matches a fresh DashboardSummary.
+    """
+
+    zone = datetime.timedelta(0)
+
+    def setUp(self):
+        super(DashboardRollupExpiryTests, self).setUp()
+        view_all = self.create_group('Viewer', VIEW_ALL_PERMISSIONS)
+        self.viewer = self.create_user('viewer', view_all)
+        self.member = self.create_user('member', view_all)
+        self.other = self.create_user('other', view_all)
+        self.third = self.create_user('third', view_all)
+        # only counts the tasks related to them
+        self.related = self.create_user('related', self.create_group('Related', VIEW_PERMISSIONS))
+        self.users = [self.viewer, self.member, self.other, self.third, self.related]
+        self.workgroup = self.create_workgroup('Team', [self.member, self.other])
+        self.project = self.create_project(self.viewer)
+        self.workflow = self.create_workflow(self.project, self.viewer)
+        tomorrow = timezone.now() + datetime.timedelta(days=1)
+        self.tasks = {
+            user.first_name: self.create_task(
+                self.workflow, self.viewer, name=user.first_name, assigned_to=user, due_date=tomorrow, importance=2
+            )
+            for user in [self.member, self.other, self.third, self.related]
+        }
+        self.tasks['other'].assigned_to_group.add(self.workgroup)
+        # the memberships above are applied before the rollups are computed
+        process_permission_events()
+        for user in self.users:
+            load_dashboard_rollup(self.fresh(user), self.zone)
+        self.assertFalse(DashboardRollup.objects.filter(computed_version__lt=F('version')).exists())
+
+    def fresh(self, user):
+        return User.objects.select_related('group', 'company').get(pk=user.pk)
+
+    def assertExpired(self, *users):
+        stale = DashboardRollup.objects.filter(computed_version__lt=F('version')).values_list('user_id', flat=True)
+        self.assertTrue({user.id for user in users} <= set(stale))
+
+    def assertRollupsMatch(self):
+        for user in self.users:
+            user = self.fresh(user)
+            load_dashboard_rollup(user, self.zone)
+            dashboard = DashboardSummary(user)
+            fresh = {
+                'task': dashboard.task(),
+                'assigned_task': dashboard.assigned_task(),
+                'upcoming_week': dashboard.upcoming_week(self.zone),
+            }
+            # the stored sections went through json
+            self.assertEqual(
+                DashboardRollup.objects.get(user=user).data, json.loads(json.dumps(fresh)), user.first_name
+            )
+
+    def test_task_create(self):
+        self.create_task(self.workflow, self.viewer, assigned_to=self.member, importance=3)
+        self.assertExpired(self.viewer, self.member, self.other, self.third)
+        self.assertRollupsMatch()
+
+    def test_task_reassign(self):
+        task = Task.objects.get(pk=self.tasks['related'].pk)
+        task.assigned_to = self.member
+        task.save()
+        self.assertExpired(self.viewer, self.member, self.other, self.third, self.related)
+        self.assertRollupsMatch()
+
+    def test_task_status_change(self):
+        task = Task.objects.get(pk=self.tasks['member'].pk)
+        task.status = 3
+        task.save()
+        self.assertExpired(self.viewer, self.member, self.other, self.third)
+        self.assertRollupsMatch()
+
+    def test_task_delete(self):
+        Task.objects.get(pk=self.tasks['other'].pk).delete()
+        self.assertExpired(self.viewer, self.member, self.other, self.third)
+        self.assertRollupsMatch()
+
+    def test_bulk_complete_and_archive(self):
+        complete_workflow(Workflow.objects.get(pk=self.workflow.pk), self.viewer)
+        self.assertExpired(*self.users)
+        self.assertRollupsMatch()
+        archive_project(Project.objects.get(pk=self.project.pk))
+        self.assertExpired(*self.users)
+        self.assertRollupsMatch()
+
+    def test_workgroup_membership(self):
+        membership = WorkGroupMember.objects.create(work_group=self.workgroup, group_member=self.third)
+        process_permission_events()
+        # the other members count the tasks of third as theirs
+        self.assertExpired(self.member, self.other, self.third)
+        self.assertRollupsMatch()
+        membership.delete()
+        process_permission_events()
+        self.assertExpired(self.member, self.other, self.third)
+        self.assertRollupsMatch()
+
+    def test_recomputed_after_valid_until(self):
+        rollups = DashboardRollup.objects.filter(user=self.viewer)
+        rollups.update(data={'task': {}})
+        # still valid, the stored sections are served as they are
+        self.assertEqual(load_dashboard_rollup(self.fresh(self.viewer), self.zone), {'task': {}})
+        rollups.update(valid_until=timezone.now() - datetime.timedelta(minutes=1))
+        self.assertRollupsMatch()
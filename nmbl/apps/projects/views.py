@@ -8,15 +8,20 @@ import uuid
 from datetime import timedelta
 
 import requests
-from authentication.models import GroupAndPermission, Organization, User
+from authentication.models import Organization, User
+from authentication.permission_snapshot import permission_snapshot
 from authentication.permissions import PermissionManagerPermission
 from authentication.utils import get_client_ip
+from base.api.pagination import RankCursorPagination
+from base.api.parsers import FastJSONParser
+from base.api.serializers import field_expanded, field_requested
+from base.db.localtime import client_zone, local_datetime
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.files import File
 from django.core.files.storage import default_storage
-from django.db import IntegrityError, models
-from django.db.models import Avg, Count, ExpressionWrapper, F, Prefetch, Q, fields
+from django.db import IntegrityError
+from django.db.models import Avg, Count, ExpressionWrapper, F, Q, fields
 from django.db.models.functions import Coalesce
 from django.http import Http404
 from django.shortcuts import get_object_or_404
@@ -69,11 +74,13 @@ from rest_framework import status, viewsets
 from rest_framework.decorators import action, list_route
 from rest_framework.filters import OrderingFilter, SearchFilter
 from rest_framework.mixins import ListModelMixin
-from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .conditional import ConditionalDetailMixin
+from .dashboard import DASHBOARD_ROLLUP_SECTIONS, DASHBOARD_SECTIONS, DashboardSummary, load_dashboard_rollup
 from .filters import (
     AttachmentFilterSet,
     CompanyWorkGroupFilterSet,
@@ -88,6 +95,7 @@ from .filters import (
     WorkProductivityLogFilterSet,
 )
 from .globalcustomfields.api.views import *  # noqa
+from .globalsearch import paginate_search_results, stream_search_results
 from .helpers import (
     AuditHistoryCreate,
     ReformatAuditHistory,
@@ -118,14 +126,15 @@ from .helpers import (
     workflow_new_message_notification,
     workflow_notify_user_for_new_message,
     workflow_send_notification_to_servicedeskuser,
-    workgroup_assigned_notification,
 )
+from .lazy_ranks import LazyRankListMixin, MaterializedRankMixin
 from .permissions import (
     AttachmentPermission,
     CompanyWorkGroupPermission,
     CustomPermission,
     EfficiencyPermission,
     GroupWorkLoadReportPermission,
+    ObjectListPermission,
     PendingRequestPermission,
     RankPermission,
     RequestPermission,
@@ -196,11 +205,14 @@ from .serializers import (
     WorkflowRankListSerializer,
     WorkflowRankSerializer,
 )
+from .searchindex import SUGGEST_LIMIT, SUGGEST_MAX_LIMIT, search_objects, search_suggestions, tagged_with
+from .statistics import CLOSED_TASK_STATUSES, conditional_counts, task_totals, visible_objects
 from .tasksapp.api.views import *  # noqa
 from .templates.api.views import *  # noqa
+from .visibility import VISIBILITY_MODELS
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(ConditionalDetailMixin, LazyRankListMixin, viewsets.ModelViewSet):
     """
     list:
     API to list all project of my organization
@@ -307,33 +319,30 @@ class ProjectViewSet(viewsets.ModelViewSet):
     permission_classes = (CustomPermission,)
     filterset_class = ProjectFilterSet
     filter_backends = (filters.DjangoFilterBackend, OrderingFilter, SearchFilter)
+    pagination_class = RankCursorPagination
     ordering_fields = ['project__importance', 'project__name', 'project__due_date', 'rank', 'project__owner']
     search_fields = [
         'project__name',
     ]
+    rank_model = ProjectRank
+    detail_object_type = 'project'
+    member_lookups = (
+        'assigned_to_users__id__in',
+        'assigned_to_group__group_members__id__in',
+        'owner__id__in',
+    )
+    group_lookup = 'assigned_to_group__id__in'
 
     def get_queryset(self):
-        date_today = datetime.datetime.utcnow().date()
         user = self.request.user
         company = user.company
         group = user.group
-        queryset = ProjectRank.objects.select_related('project', 'project__owner').prefetch_related(
-            'project__assigned_to_users',
-            Prefetch('project__attachments', Attachment.objects.active()),
-        )
-        if self.action == 'list':
-            queryset = queryset.annotate(
-                total_task=Count('project__workflow_assigned_project__task_workflow__id'),
-                completed_task=Count(
-                    'project__workflow_assigned_project__task_workflow__id',
-                    filter=models.Q(project__workflow_assigned_project__task_workflow__status__in=[3, 4]),
-                ),
-                passed_due=Count(
-                    'project__workflow_assigned_project__task_workflow__id',
-                    filter=models.Q(project__workflow_assigned_project__task_workflow__due_date__date__lt=date_today),
-                    exclude=models.Q(project__workflow_assigned_project__task_workflow__status__in=[3, 4]),
-                ),
-            )
+        # attachments and workflows of a page come from ListPageLoader
+        queryset = ProjectRank.objects.select_related('project')
+        if field_requested(self.request, 'owner'):
+            queryset = queryset.select_related('project__owner')
+        if field_requested(self.request, 'assigned_to_users'):
+            queryset = queryset.prefetch_related('project__assigned_to_users')
         if company and user_permission_check(user, 'project'):
             queryset = (
                 queryset.filter(project__organization=company, user=user)
@@ -342,23 +351,11 @@ class ProjectViewSet(viewsets.ModelViewSet):
             )
         else:
             queryset = (
-                queryset.filter(
-                    Q(project__organization=company, user=user),
-                    Q(project__owner=user)
-                    | Q(project__assigned_to_users=user)
-                    | Q(project__created_by=user)
-                    | Q(project__assigned_to_group__group_members=user),
-                )
+                queryset.filter(user=user, project__in=Project.objects.related_to(user))
                 .distinct('project_id')
                 .order_by('-project_id')
             )
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='project',
-            permission__slug='project_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('project_view-archived'):
             queryset = queryset.exclude(project__status__in=[2, 3])
         user_ids = []
         group_ids = []
@@ -408,7 +405,17 @@ class ProjectViewSet(viewsets.ModelViewSet):
             return MessageDeleteSerializer
         return ProjectRankListSerializer
 
+    def get_lazy_queryset(self):
+        queryset = super(ProjectViewSet, self).get_lazy_queryset()
+        if field_requested(self.request, 'owner'):
+            queryset = queryset.select_related('owner')
+        if field_requested(self.request, 'assigned_to_users'):
+            queryset = queryset.prefetch_related('assigned_to_users')
+        return queryset
+
     def list(self, request, *args, **kwargs):
+        if self.ranks_are_lazy():
+            return self.lazy_list(request)
         queryset = self.filter_queryset(self.get_queryset()).distinct()
         context = self.paginate_queryset(queryset)
         serializer = ProjectRankListSerializer(context, many=True, context={'request': request})
@@ -470,10 +477,11 @@ class ProjectViewSet(viewsets.ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         if not str(kwargs.get('pk')).isdigit():
             raise Http404
-        instance = get_object_or_404(self.get_queryset(), project_id=int(kwargs.get('pk')))
-        AuditHistoryCreate("project", instance.project_id, self.request.user, "Viewed By")
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        if self.ranks_are_lazy():
+            instance = self.get_lazy_rank(int(kwargs.get('pk')))
+        else:
+            instance = get_object_or_404(self.get_queryset(), project_id=int(kwargs.get('pk')))
+        return self.conditional_retrieve(instance)
 
     @action(
         detail=True,
@@ -649,13 +657,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 | Q(created_by=user)
                 | Q(assigned_to_group__group_members=user),
             ).distinct('id')
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='project',
-            permission__slug='project_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('project_view-archived'):
             queryset = queryset.exclude(project__status__in=[2, 3])
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid(raise_exception=True):
@@ -784,13 +786,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 | Q(created_by=user)
                 | Q(assigned_to_group__group_members=user),
             ).distinct('id')
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='project',
-            permission__slug='project_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('project_view-archived'):
             queryset = queryset.exclude(status__in=[2, 3])
         project_obj = get_object_or_404(queryset, pk=int(kwargs.get('pk')))
         serializer = self.get_serializer(data=request.data)
@@ -808,10 +804,11 @@ class ProjectViewSet(viewsets.ModelViewSet):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ProjectRankViewSet(viewsets.ModelViewSet):
+class ProjectRankViewSet(MaterializedRankMixin, viewsets.ModelViewSet):
     model = Project
     permission_classes = (RankPermission,)
     queryset = ProjectRank.objects.all()
+    rank_model = ProjectRank
 
     def get_queryset(self):
         queryset = super(ProjectRankViewSet, self).get_queryset()
@@ -829,10 +826,11 @@ class ProjectRankViewSet(viewsets.ModelViewSet):
         return None
 
 
-class ProjectRankChangeViewSet(viewsets.ModelViewSet):
+class ProjectRankChangeViewSet(MaterializedRankMixin, viewsets.ModelViewSet):
     model = Project
     permission_classes = (RankPermission,)
     queryset = ProjectRank.objects.all()
+    rank_model = ProjectRank
 
     def get_queryset(self):
         queryset = super(ProjectRankChangeViewSet, self).get_queryset()
@@ -850,7 +848,7 @@ class ProjectRankChangeViewSet(viewsets.ModelViewSet):
         return None
 
 
-class WorkflowViewSet(viewsets.ModelViewSet):
+class WorkflowViewSet(ConditionalDetailMixin, LazyRankListMixin, viewsets.ModelViewSet):
     """
     create:
     API to create new workflow
@@ -957,8 +955,23 @@ class WorkflowViewSet(viewsets.ModelViewSet):
     permission_classes = (CustomPermission,)
     filterset_class = WorkflowFilterSet
     filter_backends = (filters.DjangoFilterBackend, OrderingFilter, SearchFilter)
+    pagination_class = RankCursorPagination
     ordering_fields = ['workflow__importance', 'workflow__name', 'workflow__due_date', 'rank', 'workflow__owner']
     search_fields = ['workflow__name']
+    rank_model = WorkflowRank
+    detail_object_type = 'workflow'
+    member_lookups = (
+        'assigned_to_users__id__in',
+        'assigned_to_group__group_members__id__in',
+        'owner__id__in',
+    )
+    group_lookup = 'assigned_to_group__id__in'
+
+    def get_lazy_queryset(self):
+        queryset = super(WorkflowViewSet, self).get_lazy_queryset()
+        if field_requested(self.request, 'owner'):
+            queryset = queryset.select_related('owner')
+        return queryset
 
     def get_queryset(self):
         queryset = WorkflowRank.objects.none()
@@ -968,29 +981,19 @@ class WorkflowViewSet(viewsets.ModelViewSet):
         if company:
             if user_permission_check(user, 'workflow'):
                 queryset = (
-                    WorkflowRank.objects.filter(workflow__organization=company, user=user)
+                    WorkflowRank.objects.select_related('workflow', 'workflow__owner')
+                    .filter(workflow__organization=company, user=user)
                     .distinct('workflow_id')
                     .order_by('-workflow_id')
                 )
             else:
                 queryset = (
-                    WorkflowRank.objects.filter(
-                        Q(workflow__organization=company, user=user),
-                        Q(workflow__owner=user)
-                        | Q(workflow__assigned_to_users=user)
-                        | Q(workflow__created_by=user)
-                        | Q(workflow__assigned_to_group__group_members=user),
-                    )
+                    WorkflowRank.objects.select_related('workflow', 'workflow__owner')
+                    .filter(user=user, workflow__in=Workflow.objects.related_to(user))
                     .distinct('workflow_id')
                     .order_by('-workflow_id')
                 )
-            if not GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='workflow',
-                permission__slug='workflow_view-archived',
-                has_permission=True,
-            ).exists():
+            if not permission_snapshot(group, company).has('workflow_view-archived'):
                 queryset = queryset.exclude(workflow__status__in=[2, 3])
             user_ids = []
             group_ids = []
@@ -1043,6 +1046,8 @@ class WorkflowViewSet(viewsets.ModelViewSet):
         return WorkflowRankListSerializer
 
     def list(self, request, *args, **kwargs):
+        if self.ranks_are_lazy():
+            return self.lazy_list(request)
         queryset = self.filter_queryset(self.get_queryset())
         context = self.paginate_queryset(queryset)
         serializer = WorkflowRankListSerializer(context, many=True, context={'request': request})
@@ -1104,10 +1109,11 @@ class WorkflowViewSet(viewsets.ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         if not str(kwargs.get('pk')).isdigit():
             raise Http404
-        instance = get_object_or_404(self.get_queryset(), workflow_id=int(kwargs.get('pk')))
-        AuditHistoryCreate("workflow", instance.workflow_id, request.user, "Viewed By")
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        if self.ranks_are_lazy():
+            instance = self.get_lazy_rank(int(kwargs.get('pk')))
+        else:
+            instance = get_object_or_404(self.get_queryset(), workflow_id=int(kwargs.get('pk')))
+        return self.conditional_retrieve(instance)
 
     @action(
         detail=True,
@@ -1184,13 +1190,7 @@ class WorkflowViewSet(viewsets.ModelViewSet):
                 | Q(created_by=user)
                 | Q(assigned_to_group__group_members=user),
             ).distinct('id')
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='workflow',
-            permission__slug='workflow_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('workflow_view-archived'):
             queryset = queryset.exclude(status__in=[2, 3])
         instance = get_object_or_404(queryset, pk=pk)
         if instance.status in [2, 3] or ServiceDeskExternalRequest.objects.filter(workflow=instance).exists():
@@ -1291,88 +1291,16 @@ class WorkflowViewSet(viewsets.ModelViewSet):
         ```
         """
         user = self.request.user
-        company = user.company
-        group = user.group
-        if user_permission_check(user, 'workflow'):
-
-            queryset = Workflow.objects.filter(organization=company)
-        else:
-            queryset = Workflow.objects.filter(
-                Q(organization=company),
-                Q(owner=user)
-                | Q(assigned_to_users=user)
-                | Q(created_by=user)
-                | Q(assigned_to_group__group_members=user),
-            ).distinct('id')
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='workflow',
-            permission__slug='workflow_view-archived',
-            has_permission=True,
-        ).exists():
-            queryset = queryset.exclude(status__in=[2, 3])
-        workflow_obj = get_object_or_404(queryset, pk=pk)
-        task_queryset = Task.objects.filter(workflow=workflow_obj)
-        # check if user has view all permission
-        if GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            has_permission=True,
-            permission__slug='task_task-view-all',
-        ).exists():
-            if not GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='task',
-                permission__slug='task_view-archived',
-                has_permission=True,
-            ).exists():
-                task_queryset = task_queryset.exclude(status__in=[3, 4])
-        elif GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            has_permission=True,
-            permission__slug='task_task-view',
-        ).exists():
-            task_queryset = task_queryset.filter(
-                Q(organization=user.company),
-                Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
-            )
-            if not GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='task',
-                permission__slug='task_view-archived',
-                has_permission=True,
-            ).exists():
-                task_queryset = task_queryset.exclude(status__in=[3, 4])
-        else:
-            context = {
-                'low': 0,
-                'med': 0,
-                'high': 0,
-                'all_task': 0,
-                'completed_task': 0,
-            }
-            return Response(context, status=status.HTTP_200_OK)
-        accessible_task_qset = Task.objects.filter(
-            pk__in=task_queryset.values_list('id', flat=True).distinct(), organization=company
+        workflow_obj = get_object_or_404(visible_objects(user, 'workflow'), pk=pk)
+        active = ~Q(status__in=CLOSED_TASK_STATUSES)
+        context = conditional_counts(
+            visible_objects(user, 'task').filter(workflow=workflow_obj),
+            low=active & Q(importance=1),
+            med=active & Q(importance=2),
+            high=active & Q(importance=3),
+            all_task=None,
+            completed_task=Q(status__in=CLOSED_TASK_STATUSES),
         )
-        low = accessible_task_qset.filter(importance=1).exclude(status__in=[3, 4]).count()
-        med = accessible_task_qset.filter(importance=2).exclude(status__in=[3, 4]).count()
-        high = accessible_task_qset.filter(importance=3).exclude(status__in=[3, 4]).count()
-        all_task = accessible_task_qset.count()
-        comp_task = accessible_task_qset.filter(status__in=[3, 4]).count()
-        context = {
-            'low': low,
-            'med': med,
-            'high': high,
-            'all_task': all_task,
-            'completed_task': comp_task,
-        }
         return Response(context, status=status.HTTP_200_OK)
 
     @action(
@@ -1395,13 +1323,7 @@ class WorkflowViewSet(viewsets.ModelViewSet):
                 | Q(created_by=user)
                 | Q(assigned_to_group__group_members=user),
             ).distinct('id')
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='workflow',
-            permission__slug='workflow_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('workflow_view-archived'):
             queryset = queryset.exclude(status__in=[2, 3])
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid(raise_exception=True):
@@ -1530,13 +1452,7 @@ class WorkflowViewSet(viewsets.ModelViewSet):
                 | Q(created_by=user)
                 | Q(assigned_to_group__group_members=user),
             ).distinct('id')
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='workflow',
-            permission__slug='workflow_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('workflow_view-archived'):
             queryset = queryset.exclude(status__in=[2, 3])
         workflow_obj = get_object_or_404(queryset, pk=int(kwargs.get('pk')))
         serializer = self.get_serializer(data=request.data)
@@ -1578,26 +1494,7 @@ class WorkflowViewSet(viewsets.ModelViewSet):
         ```
         """
         user = self.request.user
-        company = user.company
-        group = user.group
-        if user_permission_check(user, 'workflow'):
-            queryset = Workflow.objects.filter(organization=company)
-        else:
-            queryset = Workflow.objects.filter(
-                Q(organization=company),
-                Q(owner=user)
-                | Q(assigned_to_users=user)
-                | Q(created_by=user)
-                | Q(assigned_to_group__group_members=user),
-            ).distinct('id')
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='workflow',
-            permission__slug='workflow_view-archived',
-            has_permission=True,
-        ).exists():
-            queryset = queryset.exclude(status__in=[2, 3])
+        queryset = visible_objects(user, 'workflow')
         workflow_obj = get_object_or_404(queryset, pk=pk)
         if not workflow_obj.project:
             context = {
@@ -1608,43 +1505,7 @@ class WorkflowViewSet(viewsets.ModelViewSet):
                 }
             }
             return Response(context, status=status.HTTP_200_OK)
-        project_qset = Project.objects.none()
-        if GroupAndPermission.objects.filter(
-            group=self.request.user.group,
-            company=company,
-            permission__permission_category='project',
-            has_permission=True,
-            permission__slug='project_project-view-all',
-        ).exists():
-            project_qset = Project.objects.filter(organization=company).values_list('id', flat=True)
-        elif GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='project',
-            has_permission=True,
-            permission__slug='project_project-view',
-        ).exists():
-            project_qset = (
-                Project.objects.filter(
-                    Q(organization=company),
-                    Q(owner=user)
-                    | Q(assigned_to_users=user)
-                    | Q(created_by=user)
-                    | Q(assigned_to_group__group_members=user),
-                )
-                .values_list('id', flat=True)
-                .distinct('id')
-            )
-        else:
-            pass
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='project',
-            permission__slug='project_view-archived',
-            has_permission=True,
-        ).exists():
-            project_qset = project_qset.exclude(status__in=[2, 3])
+        project_qset = visible_objects(user, 'project')
         if project_qset.filter(id=workflow_obj.project.id).exists():
             context = {
                 'project': {
@@ -1664,10 +1525,11 @@ class WorkflowViewSet(viewsets.ModelViewSet):
         return Response(context, status=status.HTTP_200_OK)
 
 
-class WorkflowRankViewSet(viewsets.ModelViewSet):
+class WorkflowRankViewSet(MaterializedRankMixin, viewsets.ModelViewSet):
     model = Workflow
     permission_classes = (RankPermission,)
     queryset = WorkflowRank.objects.all()
+    rank_model = WorkflowRank
 
     def get_queryset(self):
         queryset = super(WorkflowRankViewSet, self).get_queryset()
@@ -1722,13 +1584,7 @@ class WorkflowStatisticsViewSet(ListModelMixin, viewsets.GenericViewSet):
                 | Q(created_by=user)
                 | Q(assigned_to_group__group_members=user),
             ).distinct('id')
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='workflow',
-            permission__slug='workflow_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('workflow_view-archived'):
             queryset = queryset.exclude(status__in=[2, 3])
         return queryset
 
@@ -1736,120 +1592,13 @@ class WorkflowStatisticsViewSet(ListModelMixin, viewsets.GenericViewSet):
         return None
 
     def list(self, request, *args, **kwargs):
-        user = self.request.user
-        company = user.company
-        group = user.group
         queryset = self.filter_queryset(self.get_queryset())
-        # find total number of workflow based on permission
-        total_workflow = queryset.count()
-        # total number of task under workflows
-        total_task = Task.objects.filter(
-            organization=company, workflow_id__in=queryset.values_list('id', flat=True)[::1]
-        ).values_list('id', flat=True)[::1]
-        if not total_task:
-            response = {
-                'total_workflow': total_workflow,
-                'total_task': 0,
-                'completed_task': 0,
-                'low': 0,
-                'mid': 0,
-                'high': 0,
-                'due_today': 0,
-                'total_due': 0,
-            }
-            return Response(dict(response))
-        # total number of task under workflow based on my permission
-        if GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            has_permission=True,
-            permission__slug='task_task-view-all',
-        ).exists():
-            q_obj = Q()
-            q_obj.add(
-                Q(is_private=True, organization=company)
-                & Q(Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user)),
-                Q.OR,
-            )
-            q_obj.add(Q(is_private=False, organization=company), Q.OR)
-            task_queryset = Task.objects.filter(q_obj).distinct('id').values_list('id', flat=True)
-            if not GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='task',
-                permission__slug='task_view-archived',
-                has_permission=True,
-            ).exists():
-                task_queryset = task_queryset.exclude(status__in=[3, 4])
-            task_ids = task_queryset[::1]
-        elif GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            has_permission=True,
-            permission__slug='task_task-view',
-        ).exists():
-            task_queryset = (
-                Task.objects.filter(
-                    Q(organization=user.company),
-                    Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
-                )
-                .distinct('id')
-                .values_list('id', flat=True)
-            )
-            if not GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='task',
-                permission__slug='task_view-archived',
-                has_permission=True,
-            ).exists():
-                task_queryset = task_queryset.exclude(status__in=[3, 4])
-            task_ids = task_queryset[::1]
-        else:
-            task_ids = []
-        if not task_ids:
-            response = {
-                'total_workflow': total_workflow,
-                'total_task': 0,
-                'completed_task': 0,
-                'low': 0,
-                'mid': 0,
-                'high': 0,
-                'due_today': 0,
-                'total_due': 0,
-            }
-            return Response(dict(response))
-        # to get total task that user has permission to vew
-        accessible_task_ids = list(set(total_task).intersection(set(task_ids)))
-        if not accessible_task_ids:
-            response = {
-                'total_workflow': total_workflow,
-                'total_task': 0,
-                'completed_task': 0,
-                'low': 0,
-                'mid': 0,
-                'high': 0,
-                'due_today': 0,
-                'total_due': 0,
-            }
-            return Response(dict(response))
-        accessible_task_qset = Task.objects.filter(pk__in=accessible_task_ids, organization=company).values_list(
-            'id', flat=True
+        # tasks of the workflows the user has permission to view
+        task_queryset = visible_objects(self.request.user, 'task').filter(workflow_id__in=queryset.values('id'))
+        response = dict(
+            total_workflow=queryset.count(),
+            **task_totals(task_queryset, datetime.datetime.utcnow().date())
         )
-        active_accessible_task_qset = accessible_task_qset.exclude(status__in=[3, 4])
-        date_today = datetime.datetime.utcnow().date()
-        response = {
-            'total_workflow': total_workflow,
-            'total_task': accessible_task_qset.count(),
-            'completed_task': accessible_task_qset.filter(status__in=[3, 4]).count() or 0,
-            'low': active_accessible_task_qset.filter(importance=1).count() or 0,
-            'mid': active_accessible_task_qset.filter(importance=2).count() or 0,
-            'high': active_accessible_task_qset.filter(importance=3).count() or 0,
-            'due_today': active_accessible_task_qset.filter(due_date__date=date_today).count() or 0,
-            'total_due': active_accessible_task_qset.filter(due_date__date__lt=date_today).count() or 0,
-        }
         return Response(dict(response))
 
 
@@ -1891,13 +1640,7 @@ class ProjectStatisticsViewSet(ListModelMixin, viewsets.GenericViewSet):
                 | Q(created_by=user)
                 | Q(assigned_to_group__group_members=user),
             ).distinct('id')
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='project',
-            permission__slug='project_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('project_view-archived'):
             queryset = queryset.exclude(status__in=[2, 3])
         return queryset
 
@@ -1906,215 +1649,15 @@ class ProjectStatisticsViewSet(ListModelMixin, viewsets.GenericViewSet):
 
     def list(self, request, *args, **kwargs):
         user = self.request.user
-        company = user.company
-        group = user.group
         queryset = self.filter_queryset(self.get_queryset())
-        # find total number of project based on permission
-        total_project = queryset.count()
-        # total number of workflow under that project
-        total_workflow_ids = Workflow.objects.filter(
-            project_id__in=queryset.values_list('id', flat=True)[::1], organization=company
-        ).values_list('id', flat=True)[::1]
-        if not total_workflow_ids:
-            response = {
-                'total_project': total_project,
-                'total_workflow': 0,
-                'total_task': 0,
-                'completed_task': 0,
-                'low': 0,
-                'mid': 0,
-                'high': 0,
-                'due_today': 0,
-                'total_due': 0,
-            }
-            return Response(dict(response))
-        # find total number of workflow's that user has access of
-        if GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='workflow',
-            has_permission=True,
-            permission__slug='workflow_workflow-view-all',
-        ).exists():
-            workflow_queryset = Workflow.objects.filter(organization=company).values_list('id', flat=True)
-            if not GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='workflow',
-                permission__slug='workflow_view-archived',
-                has_permission=True,
-            ).exists():
-                workflow_queryset = workflow_queryset.exclude(status__in=[2, 3])
-            workflow_ids = workflow_queryset[::1]
-        elif GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='workflow',
-            has_permission=True,
-            permission__slug='workflow_workflow-view',
-        ).exists():
-            workflow_queryset = (
-                Workflow.objects.filter(
-                    Q(organization=company),
-                    Q(owner=user)
-                    | Q(assigned_to_users=user)
-                    | Q(created_by=user)
-                    | Q(assigned_to_group__group_members=user),
-                )
-                .distinct('id')
-                .values_list('id', flat=True)
-            )
-            if not GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='workflow',
-                permission__slug='workflow_view-archived',
-                has_permission=True,
-            ).exists():
-                workflow_queryset = workflow_queryset.exclude(status__in=[2, 3])
-            workflow_ids = workflow_queryset[::1]
-        else:
-            workflow_ids = []
-        if not workflow_ids:
-            response = {
-                'total_project': total_project,
-                'total_workflow': 0,
-                'total_task': 0,
-                'completed_task': 0,
-                'low': 0,
-                'mid': 0,
-                'high': 0,
-                'due_today': 0,
-                'total_due': 0,
-            }
-            return Response(dict(response))
-        # to get total workflow that user has permission to vew
-        accessible_workflow_ids = list(set(total_workflow_ids).intersection(set(workflow_ids)))
-        if not accessible_workflow_ids:
-            response = {
-                'total_project': total_project,
-                'total_workflow': 0,
-                'total_task': 0,
-                'completed_task': 0,
-                'low': 0,
-                'mid': 0,
-                'high': 0,
-                'due_today': 0,
-                'total_due': 0,
-            }
-            return Response(dict(response))
-        total_tasks_ids = Task.objects.filter(
-            workflow_id__in=accessible_workflow_ids, organization=company
-        ).values_list('id', flat=True)[::1]
-        if not total_tasks_ids:
-            response = {
-                'total_project': total_project,
-                'total_workflow': len(accessible_workflow_ids),
-                'total_task': 0,
-                'completed_task': 0,
-                'low': 0,
-                'mid': 0,
-                'high': 0,
-                'due_today': 0,
-                'total_due': 0,
-            }
-            return Response(dict(response))
-        if GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            has_permission=True,
-            permission__slug='task_task-view-all',
-        ).exists():
-            q_obj = Q()
-            q_obj.add(
-                Q(is_private=True, organization=company)
-                & Q(Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user)),
-                Q.OR,
-            )
-            q_obj.add(Q(is_private=False, organization=company), Q.OR)
-            task_queryset = Task.objects.filter(q_obj).distinct('id')
-            if not GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='task',
-                permission__slug='task_view-archived',
-                has_permission=True,
-            ).exists():
-                task_queryset = task_queryset.exclude(status__in=[3, 4])
-            task_ids = task_queryset[::1]
-        elif GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            has_permission=True,
-            permission__slug='task_task-view',
-        ).exists():
-            task_queryset = (
-                Task.objects.filter(
-                    Q(organization=user.company),
-                    Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
-                )
-                .distinct('id')
-                .values_list('id', flat=True)
-            )
-            if not GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='task',
-                permission__slug='task_view-archived',
-                has_permission=True,
-            ).exists():
-                task_queryset = task_queryset.exclude(status__in=[3, 4])
-            task_ids = task_queryset[::1]
-        else:
-            task_ids = []
-        if not task_ids:
-            if not total_tasks_ids:
-                response = {
-                    'total_project': total_project,
-                    'total_workflow': len(accessible_workflow_ids),
-                    'total_task': 0,
-                    'completed_task': 0,
-                    'low': 0,
-                    'mid': 0,
-                    'high': 0,
-                    'due_today': 0,
-                    'total_due': 0,
-                }
-                return Response(dict(response))
-        # to get total task that user has permission to vew
-        accessible_task_ids = list(set(total_tasks_ids).intersection(set(task_ids)))
-        if not accessible_task_ids:
-            response = {
-                'total_project': total_project,
-                'total_workflow': len(accessible_workflow_ids),
-                'total_task': 0,
-                'completed_task': 0,
-                'low': 0,
-                'mid': 0,
-                'high': 0,
-                'due_today': 0,
-                'total_due': 0,
-            }
-
-            return Response(dict(response))
-        accessible_task_qset = Task.objects.filter(pk__in=accessible_task_ids, organization=company).values_list(
-            'id', flat=True
+        # workflows of the projects the user has permission to view
+        workflow_queryset = visible_objects(user, 'workflow').filter(project_id__in=queryset.values('id'))
+        task_queryset = visible_objects(user, 'task').filter(workflow_id__in=workflow_queryset.values('id'))
+        response = dict(
+            total_project=queryset.count(),
+            total_workflow=workflow_queryset.count(),
+            **task_totals(task_queryset, datetime.datetime.utcnow().date())
         )
-        active_accessible_task_qset = accessible_task_qset.exclude(status__in=[3, 4])
-        date_today = datetime.datetime.utcnow().date()
-        response = {
-            'total_project': total_project,
-            'total_workflow': len(accessible_workflow_ids),
-            'total_task': accessible_task_qset.count(),
-            'completed_task': accessible_task_qset.filter(status__in=[3, 4]).count() or 0,
-            'low': active_accessible_task_qset.filter(importance=1).count() or 0,
-            'mid': active_accessible_task_qset.filter(importance=2).count() or 0,
-            'high': active_accessible_task_qset.filter(importance=3).count() or 0,
-            'due_today': active_accessible_task_qset.filter(due_date__date=date_today).count() or 0,
-            'total_due': active_accessible_task_qset.filter(due_date__date__lt=date_today).count() or 0,
-        }
         return Response(dict(response))
 
 
@@ -2172,6 +1715,25 @@ class GlobalSearchViewSet(ListModelMixin, viewsets.GenericViewSet):
     To filter single Tags > tags=1
     To filter multiple Tags > tags=2,3
     ```
+
+    * Pagination
+    ```
+    each type returns its first `limit` results (30 by default, at most 100)
+    pagination.<type>.next ==> url of the next results of that type only
+    To count the results of every type > count=exact
+    To estimate them from the query plan > count=estimate
+    To get every result in one streamed response > stream=true
+    ```
+
+    * Matching
+    ```
+    each word of search matches the start of a word of the name, tags,
+    description, custom field values or document text
+    "cod" finds "codal" but "dal" doesn't, unlike the former icontains search
+    emails and host names are indexed as one word while the search is split
+    on punctuation, "jane@example.com" and "example.com" find nothing
+    a search without letters or digits is looked up in the names as typed
+    ```
     """
 
     permission_classes = (IsAuthenticated,)
@@ -2199,114 +1761,6 @@ class GlobalSearchViewSet(ListModelMixin, viewsets.GenericViewSet):
         # define usable variable
         user = request.user
         company = request.user.company
-        group = request.user.group
-        # make empty queryset
-        docs_qset = Q()
-        # make default queryset for search
-        if search:
-            q_project_filter = Q(name__icontains=search) | Q(project_tags__tag__icontains=search)
-            q_workflow_filter = Q(name__icontains=search) | Q(workflow_tags__tag__icontains=search)
-            q_task_filter = Q(name__icontains=search) | Q(task_tags__tag__icontains=search)
-            q_document_filter = Q(document_tags__tag__icontains=search) | Q(document_name__icontains=search)
-        else:
-            q_project_filter = Q()
-            q_workflow_filter = Q()
-            q_task_filter = Q()
-            q_document_filter = Q()
-        # get all projects based on user permission
-        if '1' in model_list or '5' in model_list:
-            if GroupAndPermission.objects.filter(
-                group=group, company=company, has_permission=True, permission__slug='project_project-view-all'
-            ).exists():
-                project_qset = Project.objects.filter(organization=company)
-            elif GroupAndPermission.objects.filter(
-                group=group, company=company, has_permission=True, permission__slug='project_project-view'
-            ).exists():
-                project_qset = Project.objects.filter(
-                    Q(organization=company),
-                    Q(owner=user)
-                    | Q(assigned_to_users=user)
-                    | Q(created_by=user)
-                    | Q(assigned_to_group__group_members=user),
-                )
-            else:
-                project_qset = Project.objects.none()
-            if not GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='project',
-                permission__slug='project_view-archived',
-                has_permission=True,
-            ).exists():
-                project_qset = project_qset.exclude(status__in=[2, 3])
-            if search:
-                project_qset = project_qset.filter(q_project_filter)
-        else:
-            project_qset = Project.objects.none()
-        # get all workflows based on user permission
-        if '2' in model_list or '5' in model_list:
-            if GroupAndPermission.objects.filter(
-                group=group, company=company, has_permission=True, permission__slug='workflow_workflow-view-all'
-            ).exists():
-                workflow_qset = Workflow.objects.filter(organization=company)
-            elif GroupAndPermission.objects.filter(
-                group=group, company=company, has_permission=True, permission__slug='workflow_workflow-view'
-            ).exists():
-                workflow_qset = Workflow.objects.filter(
-                    Q(organization=company),
-                    Q(owner=user)
-                    | Q(assigned_to_users=user)
-                    | Q(created_by=user)
-                    | Q(assigned_to_group__group_members=user),
-                )
-            else:
-                workflow_qset = Workflow.objects.none()
-            if not GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='workflow',
-                permission__slug='workflow_view-archived',
-                has_permission=True,
-            ).exists():
-                workflow_qset = workflow_qset.exclude(status__in=[2, 3])
-            if search:
-                workflow_qset = workflow_qset.filter(q_workflow_filter)
-        else:
-            workflow_qset = Workflow.objects.none()
-        # get all task based on user permission
-        if '3' in model_list or '5' in model_list:
-            if GroupAndPermission.objects.filter(
-                group=group, company=company, has_permission=True, permission__slug='task_task-view-all'
-            ).exists():
-                q_obj = Q()
-                q_obj.add(
-                    Q(is_private=True, organization=company)
-                    & Q(Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user)),
-                    Q.OR,
-                )
-                q_obj.add(Q(is_private=False, organization=company), Q.OR)
-                task_qset = Task.objects.filter(q_obj).distinct('id')
-            elif GroupAndPermission.objects.filter(
-                group=group, company=company, has_permission=True, permission__slug='task_task-view'
-            ).exists():
-                task_qset = Task.objects.filter(
-                    Q(organization=user.company),
-                    Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
-                )
-            else:
-                task_qset = Task.objects.none()
-            if not GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='task',
-                permission__slug='task_view-archived',
-                has_permission=True,
-            ).exists():
-                task_qset = task_qset.exclude(status__in=[3, 4])
-            if search:
-                task_qset = task_qset.filter(q_task_filter)
-        else:
-            task_qset = Task.objects.none()
         # -------------search completed-----------------------#
         # --------------- filter start ----------------------#
         importance = self.request.query_params.get('importance', [])
@@ -2335,100 +1789,103 @@ class GlobalSearchViewSet(ListModelMixin, viewsets.GenericViewSet):
                 pw_status[n] = 2
         sort_by = self.request.query_params.get('sort_by', 0)
         sort_by = int(sort_by)
-        # get all projects based on user permission
-        if ('1' in model_list or '5' in model_list) and project_qset:
-            # filter with importance
-            if 4 not in importance:
-                project_qset = project_qset.filter(importance__in=importance)
-            # filter with tags
-            if tags:
-                project_qset = project_qset.filter(project_tags__id__in=tags)
-            # status
-            if 5 not in pw_status:
-                project_qset = project_qset.filter(status__in=pw_status)
-            docs_qset.add(Q(project_id__in=project_qset.values_list('id', flat=True).distinct('id')), Q.OR)
-            # sort by
-            if sort_by == 1:
-                project_qset = project_qset.distinct().order_by('name')
-            elif sort_by == 2:
-                project_qset = project_qset.distinct().order_by('-name')
-            else:
-                project_qset = project_qset.distinct().order_by('-pk')
-        # get all workflows based on user permission
-        if ('2' in model_list or '5' in model_list) and workflow_qset:
-            # filter with importance
-            if 4 not in importance:
-                workflow_qset = workflow_qset.filter(importance__in=importance)
-            # filter with tags
-            if tags:
-                workflow_qset = workflow_qset.filter(workflow_tags__id__in=tags)
-            # status
-            if 5 not in pw_status:
-                workflow_qset = workflow_qset.filter(status__in=pw_status)
-            docs_qset.add(Q(workflow_id__in=workflow_qset.values_list('id', flat=True).distinct('id')), Q.OR)
-            # sort by
-            if sort_by == 1:
-                workflow_qset = workflow_qset.distinct().order_by('name')
-            elif sort_by == 2:
-                workflow_qset = workflow_qset.distinct().order_by('-name')
-            else:
-                workflow_qset = workflow_qset.distinct().order_by('-pk')
-        # get all task based on user permission
-        if ('3' in model_list or '5' in model_list) and task_qset:
+        if sort_by == 1:
+            ordering = ['name']
+        elif sort_by == 2:
+            ordering = ['-name']
+        elif search:
+            ordering = ['-search_rank', '-pk']
+        else:
+            ordering = ['-pk']
+        # visible objects passing the filters, the search is looked up in the search_vector index
+        docs_qset = Q()
+        querysets = {}
+        for object_type, model_type in [('project', '1'), ('workflow', '2'), ('task', '3')]:
+            queryset = visible_objects(user, object_type)
             # filter with importance
             if 4 not in importance:
-                task_qset = task_qset.filter(importance__in=importance)
+                queryset = queryset.filter(importance__in=importance)
             # filter with tags
             if tags:
-                task_qset = task_qset.filter(task_tags__id__in=tags)
+                queryset = tagged_with(queryset, object_type, tags)
             # status
-            if 5 not in f_status:
-                task_qset = task_qset.filter(status__in=f_status)
-            docs_qset.add(Q(task_id__in=list(task_qset.values_list('id', flat=True).distinct('id'))), Q.OR)
-            # sort by
-            if sort_by == 1:
-                task_qset = task_qset.distinct().order_by('name')
-            elif sort_by == 2:
-                task_qset = task_qset.distinct().order_by('-name')
+            object_status = f_status if object_type == 'task' else pw_status
+            if 5 not in object_status:
+                queryset = queryset.filter(status__in=object_status)
+            # documents are only found through a visible parent, matching the search or not
+            docs_qset |= Q(**{object_type + '_id__in': queryset.values('id')})
+            if model_type in model_list or '5' in model_list:
+                if search:
+                    queryset = search_objects(queryset, object_type, search)
+                querysets[object_type] = queryset.order_by(*ordering)
             else:
-                task_qset = task_qset.distinct().order_by('-pk')
-        # check document related active project, task and workflow
-        # check document related active project, task and workflow
+                querysets[object_type] = VISIBILITY_MODELS[object_type].objects.none()
+        project_qset = querysets['project']
+        workflow_qset = querysets['workflow']
+        task_qset = querysets['task']
         if '4' in model_list or '5' in model_list:
-            document_qset = Attachment.objects.filter(organization=company, is_delete=False)
-            if q_document_filter:
-                document_qset = document_qset.filter(q_document_filter)
-            if docs_qset:
-                document_qset = document_qset.filter(docs_qset)  # .filter(attach_qset).distinct('id')
-        else:
-            document_qset = None
-        if ('4' in model_list or '5' in model_list) and document_qset:
-            # filter with importance
-            if 4 not in importance:
-                document_qset = document_qset.filter(
-                    Q(project__importance__in=importance)
-                    | Q(workflow__importance__in=importance)
-                    | Q(task__importance__in=importance)
-                )
+            document_qset = Attachment.objects.filter(docs_qset, organization=company, is_delete=False)
+            if search:
+                document_qset = search_objects(document_qset, 'document', search)
             # sort by
             if sort_by == 1:
-                document_qset = document_qset.distinct().order_by('document_name')
+                document_qset = document_qset.order_by('document_name')
             elif sort_by == 2:
-                document_qset = document_qset.distinct().order_by('-document_name')
+                document_qset = document_qset.order_by('-document_name')
             else:
-                document_qset = document_qset.distinct().order_by('-pk')
-
-        response = {
-            'project': GlobalSearchProjectSerializer(
-                project_qset, many=True, context={'request': request, 'task_qset': task_qset}
-            ).data,
-            'workflow': GlobalSearchWorkflowSerializer(
-                workflow_qset, many=True, context={'request': request, 'task_qset': task_qset}
-            ).data,
-            'task': GlobalSearchTaskSerializer(task_qset, many=True, context={'request': request}).data,
-            'document': AttachmentListSerializer(document_qset, many=True, context={'request': request}).data,
-        }
-        return Response(dict(response))
+                document_qset = document_qset.order_by(*ordering)
+        else:
+            document_qset = Attachment.objects.none()
+
+        context = {'request': request, 'task_qset': task_qset}
+        results = [
+            ('project', project_qset, GlobalSearchProjectSerializer, context),
+            ('workflow', workflow_qset, GlobalSearchWorkflowSerializer, context),
+            ('task', task_qset, GlobalSearchTaskSerializer, {'request': request}),
+            ('document', document_qset, AttachmentListSerializer, {'request': request}),
+        ]
+        more = request.query_params.get('more')
+        if more:
+            results = [result for result in results if result[0] == more]
+            if not results:
+                return Response({'detail': 'Unknown type: {}'.format(more)}, status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get('stream') in ['true', '1']:
+            return stream_search_results(results)
+        return Response(paginate_search_results(results, request, self))
+
+    @action(
+        detail=False,
+        methods=[
+            'get',
+        ],
+    )
+    def suggest(self, request):
+        """
+        >API for the search box typeahead, names only
+        ```
+        call this API :- projects/api/global_search/suggest/?search=cod
+        * search: text typed so far, required
+        * model_type: same values as the global search, all by default
+        * limit: number of suggestions, 10 by default, at most 50
+        returns [{id, name, type}] of the visible projects, workflows,
+        tasks and documents whose name or a tag matches, closest first
+        ```
+        """
+        search = request.GET.get('search', '').strip()
+        if not search:
+            return Response({'detail': "search is required field"}, status=status.HTTP_400_BAD_REQUEST)
+        model_list = [model_type for model_type in request.GET.get('model_type', '5').split(',') if model_type]
+        object_types = [
+            object_type
+            for object_type, model_type in [('project', '1'), ('workflow', '2'), ('task', '3'), ('document', '4')]
+            if model_type in model_list or '5' in model_list
+        ]
+        try:
+            limit = int(request.GET.get('limit', SUGGEST_LIMIT))
+        except ValueError:
+            return Response({'detail': "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+        return Response({'detail': search_suggestions(request.user, search, object_types, limit)})
 
 
 class AttachmentViewSet(viewsets.ModelViewSet):
@@ -2462,7 +1919,7 @@ class AttachmentViewSet(viewsets.ModelViewSet):
     )
     search_fields = ['document', 'document_name']
     ordering_fields = ['created_at', 'document', 'document_name', 'created_by']
-    parser_classes = (FormParser, MultiPartParser, JSONParser)
+    parser_classes = (FormParser, MultiPartParser, FastJSONParser)
     serializer_class = AttachmentCreateSerializer
     permission_classes = (
         IsAuthenticated,
@@ -2492,103 +1949,22 @@ class AttachmentViewSet(viewsets.ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         user = request.user
-        group = user.group
-        company = user.company
-        docs_qset = Q()
-        t_qset = Task.objects.none()
-        w_qset = Workflow.objects.none()
-        p_qset = Project.objects.none()
-        # check user permission for task
-        if GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='task_task-view-all'
-        ).exists():
-            q_obj = Q()
-            q_obj.add(
-                Q(is_private=True, organization=company)
-                & Q(Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user)),
-                Q.OR,
-            )
-            q_obj.add(Q(is_private=False, organization=company), Q.OR)
-            t_qset = Task.objects.filter(q_obj).distinct('id')
-        elif GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='task_task-view'
-        ).exists():
-            t_qset = Task.objects.filter(
-                Q(organization=company),
-                Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
-            ).distinct('id')
-        else:
-            pass
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            permission__slug='task_view-archived',
-            has_permission=True,
-        ).exists():
-            t_qset = t_qset.exclude(status__in=[3, 4])
-        # check user permission workflow
-        if GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='workflow_workflow-view-all'
-        ).exists():
-            w_qset = Workflow.objects.filter(organization=company)
-        elif GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='workflow_workflow-view'
-        ).exists():
-            w_qset = Workflow.objects.filter(
-                Q(organization=company),
-                Q(owner=user)
-                | Q(assigned_to_users=user)
-                | Q(created_by=user)
-                | Q(assigned_to_group__group_members=user),
-            ).distinct('id')
-        else:
-            pass
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='workflow',
-            permission__slug='workflow_view-archived',
-            has_permission=True,
-        ).exists():
-            w_qset = w_qset.exclude(status__in=[2, 3])
-        # check user permission for project
-        if GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='project_project-view-all'
-        ).exists():
-            p_qset = Project.objects.filter(organization=company)
-        elif GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='project_project-view'
-        ).exists():
-            p_qset = Project.objects.filter(
-                Q(organization=company),
-                Q(owner=user)
-                | Q(assigned_to_users=user)
-                | Q(created_by=user)
-                | Q(assigned_to_group__group_members=user),
-            ).distinct('id')
-        else:
-            pass
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='project',
-            permission__slug='project_view-archived',
-            has_permission=True,
-        ).exists():
-            p_qset = p_qset.exclude(status__in=[2, 3])
-        docs_qset.add(Q(task_id__in=t_qset.values_list('id', flat=True)[::1]), Q.OR)
-        docs_qset.add(Q(workflow_id__in=w_qset.values_list('id', flat=True)[::1]), Q.OR)
-        docs_qset.add(Q(project_id__in=p_qset.values_list('id', flat=True)[::1]), Q.OR)
-        if docs_qset:
-            docs_queryset = Attachment.objects.filter(organization=company, is_delete=False).filter(docs_qset)
-            docs_queryset = docs_queryset.order_by('-created_at')
-            queryset = self.filter_queryset(docs_queryset)
-            context = self.paginate_queryset(queryset)
-            serializer = AttachmentListSerializer(context, many=True, context={'request': request})
-            return self.get_paginated_response(serializer.data)
-        else:
-            return Response(status=status.HTTP_404_NOT_FOUND)
+        # documents of the projects, workflows and tasks the user can see
+        docs_queryset = Attachment.objects.filter(
+            Q(task_id__in=visible_objects(user, 'task').values('id'))
+            | Q(workflow_id__in=visible_objects(user, 'workflow').values('id'))
+            | Q(project_id__in=visible_objects(user, 'project').values('id')),
+            organization=user.company,
+            is_delete=False,
+        ).order_by('-created_at')
+        if field_expanded(request, 'uploaded_to'):
+            docs_queryset = docs_queryset.select_related('project', 'workflow', 'task')
+        if field_requested(request, 'created_by'):
+            docs_queryset = docs_queryset.select_related('created_by', 'uploaded_by')
+        queryset = self.filter_queryset(docs_queryset)
+        context = self.paginate_queryset(queryset)
+        serializer = AttachmentListSerializer(context, many=True, context={'request': request})
+        return self.get_paginated_response(serializer.data)
 
     def create(self, request, *args, **kwargs):
         if request.data.get('document') and (
@@ -2632,12 +2008,7 @@ class AttachmentViewSet(viewsets.ModelViewSet):
                 return Response(content, status=status.HTTP_204_NO_CONTENT)
         else:
             permission = attachment.content_type.model + "_delete-doc"
-            if GroupAndPermission.objects.filter(
-                group=request.user.group,
-                company=request.user.company,
-                has_permission=True,
-                permission__slug=permission,
-            ).exists():
+            if permission_snapshot(request.user.group, request.user.company).has(permission):
                 attachment.is_delete = True
                 attachment.save()
                 content = {"detail": "Your file has been " "successfully deleted"}
@@ -2798,36 +2169,35 @@ class AuditHistoryViewSet(viewsets.ModelViewSet):
         return Response({'detail': 'Document downloaded successfully'}, status=status.HTTP_200_OK)
 
     def list(self, request, *args, **kwargs):
-        offset_time = request.GET.get('offset_time')
-        if not offset_time:
-            return Response({'detail': "offset_time is required field"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            zone = client_zone(request.GET.get('offset_time'), request.GET.get('timezone'))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         # manual filter for model_reference and model_id
         # need to add authorization for request.user has permission to view.
         queryset = (
             self.get_queryset()
             .filter(model_reference=request.GET.get('model_type'))
             .filter(model_id=request.GET.get('model_id'))
+            .annotate(
+                local_created_at=local_datetime('created_at', zone),
+                local_old_due_date=local_datetime('old_due_date', zone),
+                local_new_due_date=local_datetime('new_due_date', zone),
+            )
             .order_by('-id')
         )
         serializer = self.get_serializer(queryset, many=True)
         response_data = {}
         response = []
-        for instance in serializer.data:
+        # the client's local times are computed by the query
+        for audit, instance in zip(serializer.instance, serializer.data):
             temp_dict = {}
-            old_due_date = None
-            new_due_date = None
-            import dateutil.parser as dt_parse
-
-            timezone = dt_parse.parse(instance['created_at']) + timedelta(minutes=int(offset_time))
-            if instance.get('old_due_date'):
-                old_due_date = dt_parse.parse(instance['old_due_date']) + timedelta(minutes=int(offset_time))
-            if instance.get('new_due_date'):
-                new_due_date = dt_parse.parse(instance['new_due_date']) + timedelta(minutes=int(offset_time))
             temp_dict['model_reference'] = instance['model_reference']
             temp_dict['model_id'] = instance['model_id']
             for key in instance['change_message']:
-                # temp_dict['change_message'] = {}
-                temp_dict['change_message'] = ReformatAuditHistory(instance, timezone, old_due_date, new_due_date, key)
+                temp_dict['change_message'] = ReformatAuditHistory(
+                    instance, audit.local_created_at, audit.local_old_due_date, audit.local_new_due_date, key
+                )
             response.append(temp_dict)
         response_data['results'] = response
         return Response(response_data)
@@ -2861,18 +2231,8 @@ class AttachmentCopyOrMoveView(APIView):
         # check if the user has upload document permission for both
         # source and destination model category
         if (
-            GroupAndPermission.objects.filter(
-                group=request.user.group,
-                company=request.user.company,
-                has_permission=True,
-                permission__slug=source_permission,
-            ).exists()
-            and GroupAndPermission.objects.filter(
-                group=request.user.group,
-                company=request.user.company,
-                has_permission=True,
-                permission__slug=destination_permission,
-            ).exists()
+            permission_snapshot(request.user.group, request.user.company).has(source_permission)
+            and permission_snapshot(request.user.group, request.user.company).has(destination_permission)
         ):
             # call helper function to check if the user has
             # access to the resources passed in request data
@@ -3002,13 +2362,11 @@ class WorkGroupViewSet(viewsets.ModelViewSet):
         for user in users:
             user_instance = User.objects.filter(id=user, company=request.user.company, is_delete=False).first()
             if user_instance:
-                workgroupmember_instance, created = WorkGroupMember.objects.get_or_create(
-                    work_group=instance, group_member=user_instance
-                )
-                if created:
-                    workgroup_assigned_notification(request.user, user_instance, instance)
-                else:
-                    pass
+                if not WorkGroupMember.objects.filter(work_group=instance, group_member=user_instance).exists():
+                    # the member is notified by the worker as added_by
+                    workgroupmember_instance = WorkGroupMember(work_group=instance, group_member=user_instance)
+                    workgroupmember_instance.added_by_id = request.user.id
+                    workgroupmember_instance.save()
             else:
                 pass
         return Response({'detail': "Group updated successfully."}, status=status.HTTP_201_CREATED)
@@ -3123,8 +2481,9 @@ class WorkGroupMemberViewSet(viewsets.ModelViewSet):
             for user in users:
                 user_instance = User.objects.filter(id=user, company=request.user.company, is_delete=False).first()
                 if user_instance:
-                    WorkGroupMember.objects.create(work_group=instance, group_member=user_instance)
-                    workgroup_assigned_notification(request.user, user_instance, instance)
+                    workgroupmember_instance = WorkGroupMember(work_group=instance, group_member=user_instance)
+                    workgroupmember_instance.added_by_id = request.user.id
+                    workgroupmember_instance.save()
                 else:
                     pass
             return Response({'detail': "Your Group created " "successfully."}, status=status.HTTP_201_CREATED)
@@ -3179,51 +2538,10 @@ class UserWorkGroupViewSet(ListModelMixin, viewsets.GenericViewSet):
 
     def list(self, request, *args, **kwargs):
         user = request.user
-        group = user.group
-        company = user.company
         queryset = self.filter_queryset(self.get_queryset())
         context = self.paginate_queryset(queryset)
         # total number of task under workflow based on my permission
-        if GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            has_permission=True,
-            permission__slug='task_task-view-all',
-        ).exists():
-            q_obj = Q()
-            q_obj.add(
-                Q(is_private=True, organization=company)
-                & Q(Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user)),
-                Q.OR,
-            )
-            q_obj.add(Q(is_private=False, organization=company), Q.OR)
-            task_queryset = Task.objects.filter(q_obj).distinct('id').values_list('id', flat=True)
-        elif GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            has_permission=True,
-            permission__slug='task_task-view',
-        ).exists():
-            task_queryset = (
-                Task.objects.filter(
-                    Q(organization=user.company),
-                    Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
-                )
-                .distinct('id')
-                .values_list('id', flat=True)
-            )
-        else:
-            task_queryset = Task.objects.none()
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            permission__slug='task_view-archived',
-            has_permission=True,
-        ).exists():
-            task_queryset = task_queryset.exclude(status__in=[3, 4])
+        task_queryset = visible_objects(user, 'task')
         serializer = UserWorkGroupListSerializer(
             context, context={'request': request, 'task_queryset': task_queryset}, many=True
         )
@@ -3247,77 +2565,17 @@ class UserWorkGroupViewSet(ListModelMixin, viewsets.GenericViewSet):
         * name of the work group *group_name*
         ```
         """
-        user = request.user
-        group = user.group
-        company = user.company
         instance_group = get_object_or_404(self.filter_queryset(self.get_queryset()), pk=pk)
-        task_queryset = Task.objects.filter(assigned_to_group=instance_group)
-        if GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            has_permission=True,
-            permission__slug='task_task-view-all',
-        ).exists():
-            q_obj = Q()
-            q_obj.add(
-                Q(is_private=True, organization=company)
-                & Q(Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user)),
-                Q.OR,
-            )
-            q_obj.add(Q(is_private=False, organization=company), Q.OR)
-            task_queryset = task_queryset.filter(q_obj).distinct('id')
-            if not GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='task',
-                permission__slug='task_view-archived',
-                has_permission=True,
-            ).exists():
-                task_queryset = task_queryset.exclude(status__in=[3, 4])
-        elif GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            has_permission=True,
-            permission__slug='task_task-view',
-        ).exists():
-            task_queryset = task_queryset.filter(
-                Q(organization=company),
-                Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
-            )
-            if not GroupAndPermission.objects.filter(
-                group=group,
-                company=company,
-                permission__permission_category='task',
-                permission__slug='task_view-archived',
-                has_permission=True,
-            ).exists():
-                task_queryset = task_queryset.exclude(status__in=[3, 4])
-        else:
-            context = {
-                'low': 0,
-                'med': 0,
-                'high': 0,
-                'all_task': 0,
-                'completed_task': 0,
-                'group_name': instance_group.name,
-            }
-            return Response(context, status=status.HTTP_200_OK)
-        accessible_task_qset = Task.objects.filter(pk__in=task_queryset.values_list('id', flat=True).distinct())
-        low = accessible_task_qset.filter(importance=1).exclude(status__in=[3, 4]).count()
-        med = accessible_task_qset.filter(importance=2).exclude(status__in=[3, 4]).count()
-        high = accessible_task_qset.filter(importance=3).exclude(status__in=[3, 4]).count()
-        all_task = accessible_task_qset.count()
-        comp_task = accessible_task_qset.filter(status__in=[3, 4]).count()
-        context = {
-            'low': low,
-            'med': med,
-            'high': high,
-            'all_task': all_task,
-            'completed_task': comp_task,
-            'group_name': instance_group.name,
-        }
+        active = ~Q(status__in=CLOSED_TASK_STATUSES)
+        context = conditional_counts(
+            visible_objects(request.user, 'task').filter(assigned_to_group=instance_group),
+            low=active & Q(importance=1),
+            med=active & Q(importance=2),
+            high=active & Q(importance=3),
+            all_task=None,
+            completed_task=Q(status__in=CLOSED_TASK_STATUSES),
+        )
+        context['group_name'] = instance_group.name
         return Response(context, status=status.HTTP_200_OK)
 
     def retrieve(self, request, *args, **kwargs):
@@ -3442,7 +2700,7 @@ class ServiceDeskAttachmentViewSet(viewsets.ModelViewSet):
         AllowAny,
         ServiceDeskAttachmentPermission,
     )
-    parser_classes = (FormParser, MultiPartParser, JSONParser)
+    parser_classes = (FormParser, MultiPartParser, FastJSONParser)
 
     def get_queryset(self):
         return None
@@ -3591,7 +2849,9 @@ class RequestPortalViewSet(viewsets.ModelViewSet):
     permission_classes = (
         IsAuthenticated,
         RequestPermission,
+        ObjectListPermission,
     )
+    object_permission_actions = ('bulk_task_creation',)
     filter_backends = (OrderingFilter,)
     ordering_fields = [
         'id',
@@ -3626,6 +2886,17 @@ class RequestPortalViewSet(viewsets.ModelViewSet):
             return PendingRequestMessageSerializer
         return RequestListSerializer
 
+    def get_permission_objects(self, request):
+        # workflows the converted tasks are created in
+        tasks_data = request.data.get('data')
+        if not isinstance(tasks_data, list):
+            return []
+        return [
+            ('workflow', task_data['workflow'])
+            for task_data in tasks_data
+            if isinstance(task_data, dict) and task_data.get('workflow')
+        ]
+
     def destroy(self, request, *args, **kwargs):
         try:
             for obj_id in self.kwargs['pk'].split(','):
@@ -5732,40 +5003,6 @@ class ProductivityReportViewSet(viewsets.ModelViewSet):
 class DashboardStatisticsViewSet(viewsets.GenericViewSet):
     permission_classes = (IsAuthenticated,)
 
-    def get_queryset(self):
-        user = self.request.user
-        company = user.company
-        group = user.group
-        if GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='task_task-view-all'
-        ).exists():
-            q_obj = Q()
-            q_obj.add(
-                Q(is_private=True, organization=company)
-                & Q(Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user)),
-                Q.OR,
-            )
-            q_obj.add(Q(is_private=False, organization=company), Q.OR)
-            queryset = Task.objects.filter(q_obj).distinct('id')
-        elif GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='task_task-view'
-        ).exists():
-            queryset = Task.objects.filter(
-                Q(organization=company),
-                Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
-            ).distinct('id')
-        else:
-            queryset = Task.objects.none()
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            permission__slug='task_view-archived',
-            has_permission=True,
-        ).exists():
-            queryset = queryset.exclude(status__in=[3, 4])
-        return queryset
-
     def get_serializer_class(self):
         return None
 
@@ -5787,28 +5024,7 @@ class DashboardStatisticsViewSet(viewsets.GenericViewSet):
           other people in groups I'm assigned to *their_task*
         ```
         """
-        user = request.user
-        queryset = self.get_queryset().values_list('id', flat=True).distinct()
-        # get my all workgorup
-        my_work_group = WorkGroup.objects.filter(group_members=user).distinct()
-        # get my all workgroup member
-        my_group_member = (
-            WorkGroup.objects.filter(id__in=my_work_group.values_list('id', flat=True))
-            .values_list('group_members__id', flat=True)
-            .distinct()
-        )
-        my_task = Task.objects.filter(id__in=queryset, assigned_to=user).count()
-        our_task = (
-            Task.objects.filter(id__in=queryset, assigned_to_group__in=my_work_group).exclude(assigned_to=user).count()
-        )
-        their_task = (
-            Task.objects.filter(id__in=queryset, assigned_to__id__in=my_group_member).exclude(assigned_to=user).count()
-        )
-        detail = {
-            'my_task': my_task,
-            'our_task': our_task,
-            'their_task': their_task,
-        }
+        detail = DashboardSummary(request.user).assigned_task()
         return Response({'detail': detail}, status=status.HTTP_200_OK)
 
     @action(
@@ -5822,6 +5038,8 @@ class DashboardStatisticsViewSet(viewsets.GenericViewSet):
         >API to get dashboard Bar Chart(Upcoming Week)
         statistic data.
         ```
+        * offset_time: client utc offset in minutes, or
+          timezone: IANA timezone name of the client
         * list of upcoming task based on date with
           count *upcoming_task*
         * list of upcoming workflow based on date with
@@ -5830,90 +5048,62 @@ class DashboardStatisticsViewSet(viewsets.GenericViewSet):
           count *upcoming_project*
         ```
         """
-        offset_time = request.GET.get('offset_time')
-        if not offset_time:
-            return Response({'detail': "offset_time is required field"}, status=status.HTTP_400_BAD_REQUEST)
-        user = request.user
-        task_queryset = self.get_queryset().exclude(status__in=[3, 4])
-        company = user.company
-        group = user.group
-        # calculate upcoming week
-        start_of_week = (
-            datetime.datetime.utcnow().replace(hour=0, minute=0, second=0)
-            + timedelta(1)
-            - timedelta(minutes=int(offset_time))
-        )
-        # get permitted project object
-        if GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='project_project-view-all'
-        ).exists():
-            project_queryset = Project.objects.filter(organization=company).exclude(status__in=[2, 3])
-        elif GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='project_project-view'
-        ).exists():
-            project_queryset = (
-                Project.objects.filter(
-                    Q(organization=company),
-                    Q(owner=user)
-                    | Q(assigned_to_users=user)
-                    | Q(created_by=user)
-                    | Q(assigned_to_group__group_members=user),
-                )
-                .exclude(status__in=[2, 3])
-                .distinct()
-            )
-        else:
-            project_queryset = Project.objects.none()
-        # get permitted workflow object
-        if GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='workflow_workflow-view-all'
-        ).exists():
-            workflow_queryset = Workflow.objects.filter(organization=company).exclude(status__in=[2, 3])
-        elif GroupAndPermission.objects.filter(
-            group=group, company=company, has_permission=True, permission__slug='workflow_workflow-view'
-        ).exists():
-            workflow_queryset = (
-                Workflow.objects.filter(
-                    Q(organization=company),
-                    Q(owner=user)
-                    | Q(assigned_to_users=user)
-                    | Q(created_by=user)
-                    | Q(assigned_to_group__group_members=user),
-                )
-                .exclude(status__in=[2, 3])
-                .distinct()
-            )
-        else:
-            workflow_queryset = Workflow.objects.none()
-        # get all upcoming task, workflow and project
-        response_data = []
-        for day in range(0, 7):
-            response_data.append(
-                {
-                    str((start_of_week + timedelta(day) + timedelta(minutes=int(offset_time))).date()): {
-                        'project': project_queryset.filter(
-                            due_date__range=[
-                                (start_of_week + timedelta(day)),
-                                start_of_week + timedelta(day) + timedelta(1),
-                            ]
-                        ).count(),
-                        'workflow': workflow_queryset.filter(
-                            due_date__range=[
-                                (start_of_week + timedelta(day)),
-                                start_of_week + timedelta(day) + timedelta(1),
-                            ]
-                        ).count(),
-                        'task': task_queryset.filter(
-                            due_date__range=[
-                                (start_of_week + timedelta(day)),
-                                start_of_week + timedelta(day) + timedelta(1),
-                            ]
-                        ).count(),
-                    }
-                }
-            )
+        try:
+            zone = client_zone(request.GET.get('offset_time'), request.GET.get('timezone'))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        response_data = DashboardSummary(request.user).upcoming_week(zone)
         return Response({'detail': response_data}, status=status.HTTP_200_OK)
 
+    @action(
+        detail=False,
+        methods=[
+            'get',
+        ],
+    )
+    def summary(self, request):
+        """
+        >API to get all the dashboard widgets in one request, permissions
+        and the visible projects, workflows and tasks are resolved once.
+        ```
+        * sections: comma separated widgets to return, all by default
+          > task: same as tasks_statistic
+          > workflow: same as workflows_statistic
+          > project: same as projects_statistic
+          > assigned_task: same as dashboard_statistic/assigned_task
+          > upcoming_week: same as dashboard_statistic/upcoming_week,
+            offset_time or timezone is required with it
+        * task, assigned_task and upcoming_week are read from the
+          user's DashboardRollup, kept up to date as objects change
+        ```
+        """
+        sections = [section.strip() for section in request.GET.get('sections', '').split(',') if section.strip()]
+        sections = sections or list(DASHBOARD_SECTIONS)
+        unknown = [section for section in sections if section not in DASHBOARD_SECTIONS]
+        if unknown:
+            return Response(
+                {'detail': 'Unknown sections: {}'.format(', '.join(unknown))}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            zone = client_zone(request.GET.get('offset_time'), request.GET.get('timezone'))
+        except ValueError as e:
+            if 'upcoming_week' in sections:
+                return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            zone = None
+        dashboard = DashboardSummary(request.user)
+        rollup = {}
+        if any(section in DASHBOARD_ROLLUP_SECTIONS for section in sections):
+            rollup = load_dashboard_rollup(request.user, zone)
+        detail = {}
+        for section in sections:
+            if section in rollup:
+                detail[section] = rollup[section]
+            elif section == 'upcoming_week':
+                detail[section] = dashboard.upcoming_week(zone)
+            else:
+                detail[section] = getattr(dashboard, section)()
+        return Response({'detail': detail}, status=status.HTTP_200_OK)
+
 
 class ShareDocumentViewSet(viewsets.GenericViewSet):
     """
@@ -5939,24 +5129,12 @@ class ShareDocumentViewSet(viewsets.GenericViewSet):
         company = user.company
         group = user.group
         queryset = Task.objects.none()
-        if GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            permission__slug__in=['task_task-view-all', 'task_task-view'],
-            has_permission=True,
-        ).exists():
+        if permission_snapshot(group, company).has_any('task_task-view-all', 'task_task-view'):
             queryset = Task.objects.filter(
                 Q(organization=user.company, is_private=True),
                 Q(assigned_to=user) | Q(created_by=user) | Q(assigned_to_group__group_members=user),
             ).distinct('id')
-        if not GroupAndPermission.objects.filter(
-            group=group,
-            company=company,
-            permission__permission_category='task',
-            permission__slug='task_view-archived',
-            has_permission=True,
-        ).exists():
+        if not permission_snapshot(group, company).has('task_view-archived'):
             queryset = queryset.exclude(status__in=[3, 4])
         docs_queryset = Attachment.objects.filter(
             organization=company, is_delete=False, task_id__in=queryset.values_list('id', flat=True)[::1]
@@ -1,4 +1,5 @@
-from authentication.models import User, GroupAndPermission
+from authentication.models import User
+from authentication.permission_snapshot import permission_snapshot
 from base.services.postmark import PostmarkInbound
 from django.http import JsonResponse
 from django.utils.decorators import method_decorator
@@ -130,10 +131,7 @@ class PostmarkWorkflowWebHook(View):
             group = user.group
             permission_category = 'workflow'
             slug = permission_category + "_" + permission_category + '-create'
-            group_permission = GroupAndPermission.objects.filter(
-                group=group, company=company,
-                permission__permission_category=permission_category,
-                permission__slug=slug, has_permission=True).exists()
+            group_permission = permission_snapshot(group, company).has(slug)
             if not group_permission:
                 return
             post_data = {
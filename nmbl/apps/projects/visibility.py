@@ -0,0 +1,81 @@
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+from .models import ObjectVisibility, Project, Task, Workflow
+
+VISIBILITY_MODELS = {
+    'project': Project,
+    'workflow': Workflow,
+    'task': Task,
+}
+
+# lookups relating a user to an object, same as the view permission filters
+VISIBILITY_LOOKUPS = {
+    'project': ('owner', 'assigned_to_users', 'created_by', 'assigned_to_group__group_members'),
+    'workflow': ('owner', 'assigned_to_users', 'created_by', 'assigned_to_group__group_members'),
+    'task': ('assigned_to', 'created_by', 'assigned_to_group__group_members'),
+}
+
+
+def _apply_visibility_changes(object_type, new_pairs, stale_pairs):
+    """
+    new_pairs and stale_pairs are sets of (object_id, user_id).
+    """
+    if stale_pairs:
+        ObjectVisibility.objects.filter(
+            reduce(or_, [Q(object_id=object_id, user_id=user_id) for object_id, user_id in stale_pairs]),
+            object_type=object_type,
+        ).delete()
+    if new_pairs:
+        ObjectVisibility.objects.bulk_create(
+            [
+                ObjectVisibility(user_id=user_id, object_type=object_type, object_id=object_id)
+                for object_id, user_id in new_pairs
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+
+def refresh_object_visibility(object_type, object_ids):
+    """
+    Recompute the related users of the given objects.
+    """
+    object_ids = [object_id for object_id in object_ids if object_id]
+    if not object_ids:
+        return
+    model = VISIBILITY_MODELS[object_type]
+    pairs = set()
+    for lookup in VISIBILITY_LOOKUPS[object_type]:
+        pairs.update(
+            model.objects.filter(id__in=object_ids, **{lookup + '__isnull': False}).values_list('id', lookup)
+        )
+    existing = set(
+        ObjectVisibility.objects.filter(object_type=object_type, object_id__in=object_ids).values_list(
+            'object_id', 'user_id'
+        )
+    )
+    _apply_visibility_changes(object_type, pairs - existing, existing - pairs)
+
+
+def refresh_user_visibility(user):
+    """
+    Recompute the objects a user is related to, used on workgroup changes.
+    """
+    for object_type, model in VISIBILITY_MODELS.items():
+        q_obj = reduce(or_, [Q(**{lookup: user}) for lookup in VISIBILITY_LOOKUPS[object_type]])
+        object_ids = set(model.objects.filter(q_obj).values_list('id', flat=True).distinct())
+        existing = set(
+            ObjectVisibility.objects.filter(user=user, object_type=object_type).values_list('object_id', flat=True)
+        )
+        _apply_visibility_changes(
+            object_type,
+            {(object_id, user.id) for object_id in object_ids - existing},
+            {(object_id, user.id) for object_id in existing - object_ids},
+        )
+
+
+def remove_object_visibility(object_type, object_id):
+    ObjectVisibility.objects.filter(object_type=object_type, object_id=object_id).delete()
@@ -31,6 +31,18 @@ app.conf.beat_schedule = {
         'task': 'projects.tasks.project_due_date_check',
         'schedule': crontab(minute=15, hour=4),
     },
+    'drain-permission-events': {
+        'task': 'authentication.tasks.drain_all_permission_events',
+        'schedule': crontab(minute='*/5'),
+    },
+    'task-counters-rollover': {
+        'task': 'projects.tasks.task_counters_rollover',
+        'schedule': crontab(minute=5, hour=0),
+    },
+    'dashboard-rollups-rollover': {
+        'task': 'projects.tasks.dashboard_rollups_rollover',
+        'schedule': crontab(minute='*/15'),
+    },
 }
 
 # @app.task(bind=True)
@@ -141,6 +141,19 @@ CHANNEL_LAYERS = {
 
 # channel_layer = channels.asgi.get_channel_layer()
 
+# Cache settings
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "redis://localhost:6379/1",
+        "KEY_FUNCTION": "django_tenants.cache.make_key",
+        "REVERSE_KEY_FUNCTION": "django_tenants.cache.reverse_key",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        },
+    },
+}
+
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
@@ -188,11 +201,15 @@ REST_FRAMEWORK = {
     'DEFAULT_MODEL_SERIALIZER_CLASS': [
         'rest_framework.serializers.ModelSerializer',
     ],
-    # 'DEFAULT_PARSER_CLASSES': [
-    #     'rest_framework.parsers.FormParser',
-    #     'rest_framework.parsers.MultiPartParser',
-    #     'rest_framework.parsers.JSONParser',
-    # ]
+    'DEFAULT_RENDERER_CLASSES': [
+        'base.api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'base.api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 AUTHENTICATION_BACKENDS = (
@@ -275,3 +292,7 @@ SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 DEFAULT_FROM_EMAIL = "no-reply@proxylegalapp.com"
 DRF_RECAPTCHA_VERIFY_ENDPOINT = "https://www.google.com/recaptcha/api/siteverify"
 
+
+# Write task/project/workflow rank rows only for users who reorder,
+# other users get lists in the default importance, due date order
+LAZY_RANK_MATERIALIZATION = os.getenv('LAZY_RANK_MATERIALIZATION', 'False') == 'True'
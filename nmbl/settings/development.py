@@ -50,6 +50,8 @@ BROKER_URL = 'redis://redisapp:6379/10'
 BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': 3600}  # 1 hour.
 CELERY_RESULT_BACKEND = 'redis://redisapp:6379/10'
 
+CACHES['default']['LOCATION'] = 'redis://redisapp:6379/1'
+
 
 CELERY_TIMEZONE = 'UTC'
 
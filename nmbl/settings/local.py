@@ -53,6 +53,18 @@ MEDIA_URL = 'http://%s.s3.amazonaws.com/images/' % AWS_STORAGE_BUCKET_NAME
 BROKER_URL = 'redis://%s:%s/%s' % (os.getenv('REDIS_HOST'), os.getenv('REDIS_PORT'), os.getenv('REDIS_CELERY_DATABASE_ID'))
 BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': 3600}  # 1 hour.
 CELERY_RESULT_BACKEND = BROKER_URL
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": 'redis://%s:%s/%s' % (os.getenv('REDIS_HOST'), os.getenv('REDIS_PORT', '6379'),
+                                          os.getenv('REDIS_CACHE_DATABASE_ID', '1')),
+        "KEY_FUNCTION": "django_tenants.cache.make_key",
+        "REVERSE_KEY_FUNCTION": "django_tenants.cache.reverse_key",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        },
+    },
+}
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 CORS_ORIGIN_ALLOW_ALL = True
 ALLOWED_HOSTS = ['*']
@@ -76,11 +88,15 @@ REST_FRAMEWORK = {
     'DEFAULT_MODEL_SERIALIZER_CLASS': [
         'rest_framework.serializers.ModelSerializer',
     ],
-    # 'DEFAULT_PARSER_CLASSES': [
-    #     'rest_framework.parsers.FormParser',
-    #     'rest_framework.parsers.MultiPartParser',
-    #     'rest_framework.parsers.JSONParser',
-    # ]
+    'DEFAULT_RENDERER_CLASSES': [
+        'base.api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'base.api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 TENANT_AWS_DICT = {